@@ -0,0 +1,36 @@
+"""spotify rate limit
+
+Revision ID: 0547eb040cd1
+Revises: f7ac779c08ac
+Create Date: 2026-10-18 15:21:37.950184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0547eb040cd1'
+down_revision: Union[str, Sequence[str], None] = 'f7ac779c08ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'spotify_rate_limit',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('blocked_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_spotify_rate_limit_id'), 'spotify_rate_limit', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_spotify_rate_limit_id'), table_name='spotify_rate_limit')
+    op.drop_table('spotify_rate_limit')
@@ -0,0 +1,45 @@
+"""listen hourly
+
+Revision ID: 1adf0feb8ed5
+Revises: 8cf0b1f6cd63
+Create Date: 2026-10-18 18:05:37.264915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1adf0feb8ed5'
+down_revision: Union[str, Sequence[str], None] = '8cf0b1f6cd63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'listen_hourly',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('play_count', sa.Integer(), nullable=False),
+        sa.Column('duration_seconds', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('user_id', 'hour'),
+    )
+    # Existing history, later changes are maintained by the writers
+    op.execute("""
+        INSERT INTO listen_hourly (user_id, hour, play_count, duration_seconds)
+        SELECT l.user_id, date_trunc('hour', l.played_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+               count(*), coalesce(sum(t.duration), 0)
+        FROM listens l
+        JOIN tracks t ON t.track_id = l.track_id
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('listen_hourly')
@@ -0,0 +1,51 @@
+"""enrichment queue
+
+Revision ID: 47ae756d1c31
+Revises: cf8efcb3a2d1
+Create Date: 2026-10-18 11:26:05.310447
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '47ae756d1c31'
+down_revision: Union[str, Sequence[str], None] = 'cf8efcb3a2d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'enrichment_queue',
+        sa.Column('entity_type', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('enqueued_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('entity_type', 'entity_id'),
+    )
+
+    # Queue everything that is already missing images or metadata
+    op.execute(
+        "INSERT INTO enrichment_queue (entity_type, entity_id, enqueued_at, attempts) "
+        "SELECT 'artist', artist_id, now(), 0 FROM artists WHERE image_url_small IS NULL"
+    )
+    op.execute(
+        "INSERT INTO enrichment_queue (entity_type, entity_id, enqueued_at, attempts) "
+        "SELECT 'album', album_id, now(), 0 FROM albums WHERE image_url_small IS NULL"
+    )
+    op.execute(
+        "INSERT INTO enrichment_queue (entity_type, entity_id, enqueued_at, attempts) "
+        "SELECT 'track', track_id, now(), 0 FROM tracks "
+        "WHERE duration IS NULL OR image_url_small IS NULL "
+        "OR NOT EXISTS (SELECT 1 FROM track_artists ta WHERE ta.track_id = tracks.track_id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('enrichment_queue')
@@ -0,0 +1,51 @@
+"""ingestion runs
+
+Revision ID: 70fe9696f13c
+Revises: 47ae756d1c31
+Create Date: 2026-10-18 12:40:52.617230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '70fe9696f13c'
+down_revision: Union[str, Sequence[str], None] = '47ae756d1c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ingestion_runs',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('token_seconds', sa.Float(), nullable=False),
+        sa.Column('fetch_seconds', sa.Float(), nullable=False),
+        sa.Column('normalize_seconds', sa.Float(), nullable=False),
+        sa.Column('write_seconds', sa.Float(), nullable=False),
+        sa.Column('items_fetched', sa.Integer(), nullable=False),
+        sa.Column('items_new', sa.Integer(), nullable=False),
+        sa.Column('items_duplicate', sa.Integer(), nullable=False),
+        sa.Column('items_failed', sa.Integer(), nullable=False),
+        sa.Column('artists_new', sa.Integer(), nullable=False),
+        sa.Column('albums_new', sa.Integer(), nullable=False),
+        sa.Column('tracks_new', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('run_id'),
+    )
+    op.create_index(op.f('ix_ingestion_runs_run_id'), 'ingestion_runs', ['run_id'], unique=False)
+    op.create_index(op.f('ix_ingestion_runs_started_at'), 'ingestion_runs', ['started_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ingestion_runs_started_at'), table_name='ingestion_runs')
+    op.drop_index(op.f('ix_ingestion_runs_run_id'), table_name='ingestion_runs')
+    op.drop_table('ingestion_runs')
@@ -0,0 +1,73 @@
+"""listen days and streaks
+
+Revision ID: 7fa55b0afeb3
+Revises: 9591c7086928
+Create Date: 2026-10-18 20:21:40.918203
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7fa55b0afeb3'
+down_revision: Union[str, Sequence[str], None] = '9591c7086928'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'listen_days',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('play_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+    )
+    op.create_table(
+        'listen_streaks',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('current_start', sa.Date(), nullable=False),
+        sa.Column('current_end', sa.Date(), nullable=False),
+        sa.Column('longest_start', sa.Date(), nullable=False),
+        sa.Column('longest_end', sa.Date(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    # Existing history in the configured time zone, later changes are maintained by the writers
+    op.get_bind().execute(sa.text("""
+        INSERT INTO listen_days (user_id, day, play_count)
+        SELECT user_id, (played_at AT TIME ZONE :tz)::date, count(*)
+        FROM listens
+        GROUP BY 1, 2
+    """), {"tz": os.getenv("APP_TIME_ZONE", "UTC")})
+    op.execute("""
+        WITH runs AS (
+            SELECT user_id, min(day) AS start_day, max(day) AS end_day
+            FROM (
+                SELECT user_id, day, day - CAST(row_number() OVER (PARTITION BY user_id ORDER BY day) AS integer) AS island
+                FROM listen_days
+            ) d
+            GROUP BY user_id, island
+        ), latest AS (
+            SELECT DISTINCT ON (user_id) user_id, start_day, end_day FROM runs ORDER BY user_id, end_day DESC
+        ), longest AS (
+            SELECT DISTINCT ON (user_id) user_id, start_day, end_day FROM runs ORDER BY user_id, end_day - start_day DESC, end_day DESC
+        )
+        INSERT INTO listen_streaks (user_id, current_start, current_end, longest_start, longest_end, updated_at)
+        SELECT l.user_id, l.start_day, l.end_day, g.start_day, g.end_day, now()
+        FROM latest l
+        JOIN longest g ON g.user_id = l.user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('listen_streaks')
+    op.drop_table('listen_days')
@@ -0,0 +1,29 @@
+"""raw payloads fetched_at index
+
+Revision ID: 8401703c4702
+Revises: 7fa55b0afeb3
+Create Date: 2026-10-18 22:41:12.604518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8401703c4702'
+down_revision: Union[str, Sequence[str], None] = '7fa55b0afeb3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The retention job deletes by fetch time
+    op.create_index(op.f('ix_raw_payloads_fetched_at'), 'raw_payloads', ['fetched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_raw_payloads_fetched_at'), table_name='raw_payloads')
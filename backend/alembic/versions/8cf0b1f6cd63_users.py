@@ -0,0 +1,104 @@
+"""users
+
+Revision ID: 8cf0b1f6cd63
+Revises: 5e4e3644ff69
+Create Date: 2026-10-18 17:24:51.803126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8cf0b1f6cd63'
+down_revision: Union[str, Sequence[str], None] = '5e4e3644ff69'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tables that get a user_id; existing rows belong to the single account of the old schema
+OWNED_TABLES = ('listens', 'spotify_tokens', 'ingestion_state', 'ingestion_runs', 'raw_payloads')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('spotify_user_id', sa.String(), nullable=True),
+        sa.Column('display_name', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.UniqueConstraint('spotify_user_id'),
+    )
+    op.create_index(op.f('ix_users_user_id'), 'users', ['user_id'], unique=False)
+
+    op.execute("""
+        INSERT INTO users (user_id, created_at)
+        SELECT 1, now()
+        WHERE EXISTS (SELECT 1 FROM listens) OR EXISTS (SELECT 1 FROM spotify_tokens)
+           OR EXISTS (SELECT 1 FROM ingestion_state) OR EXISTS (SELECT 1 FROM player_state)
+    """)
+    op.execute("SELECT setval(pg_get_serial_sequence('users', 'user_id'), COALESCE((SELECT max(user_id) FROM users), 0) + 1, false)")
+    # The old schema allowed several token rows but only ever used the first one
+    op.execute("DELETE FROM spotify_tokens WHERE id <> (SELECT min(id) FROM spotify_tokens)")
+
+    for table in OWNED_TABLES:
+        op.add_column(table, sa.Column('user_id', sa.Integer(), nullable=True))
+        op.execute(f"UPDATE {table} SET user_id = 1")
+        op.create_foreign_key(f'fk_{table}_user_id', table, 'users', ['user_id'], ['user_id'])
+
+    op.alter_column('listens', 'user_id', nullable=False)
+    op.drop_constraint('uq_listen_track_played_at', 'listens', type_='unique')
+    op.create_unique_constraint('uq_listen_user_track_played_at', 'listens', ['user_id', 'track_id', 'played_at'])
+    op.create_index('ix_listens_user_played_at', 'listens', ['user_id', 'played_at'], unique=False)
+
+    op.alter_column('spotify_tokens', 'user_id', nullable=False)
+    op.create_unique_constraint('uq_spotify_tokens_user_id', 'spotify_tokens', ['user_id'])
+
+    op.alter_column('ingestion_state', 'user_id', nullable=False)
+    op.create_unique_constraint('uq_ingestion_state_user_id', 'ingestion_state', ['user_id'])
+
+    op.create_index(op.f('ix_ingestion_runs_user_id'), 'ingestion_runs', ['user_id'], unique=False)
+    op.create_index(op.f('ix_raw_payloads_user_id'), 'raw_payloads', ['user_id'], unique=False)
+
+    # player_state was keyed by a constant account id, which is now the user
+    op.drop_index(op.f('ix_player_state_id'), table_name='player_state')
+    op.alter_column('player_state', 'id', new_column_name='user_id')
+    # Rows are only written for existing users, a serial default would invent ids that aren't one
+    op.alter_column('player_state', 'user_id', server_default=None)
+    op.execute("DROP SEQUENCE IF EXISTS player_state_id_seq")
+    op.create_foreign_key('fk_player_state_user_id', 'player_state', 'users', ['user_id'], ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Only the first account fits the single-account schema
+    for table in ('player_state', 'spotify_tokens', 'ingestion_state'):
+        op.execute(f"DELETE FROM {table} WHERE user_id <> 1")
+
+    op.drop_constraint('fk_player_state_user_id', 'player_state', type_='foreignkey')
+    op.alter_column('player_state', 'user_id', new_column_name='id')
+    op.execute("CREATE SEQUENCE player_state_id_seq OWNED BY player_state.id")
+    op.execute("SELECT setval('player_state_id_seq', COALESCE((SELECT max(id) FROM player_state), 0) + 1, false)")
+    op.alter_column('player_state', 'id', server_default=sa.text("nextval('player_state_id_seq'::regclass)"))
+    op.create_index(op.f('ix_player_state_id'), 'player_state', ['id'], unique=False)
+
+    op.drop_index(op.f('ix_raw_payloads_user_id'), table_name='raw_payloads')
+    op.drop_index(op.f('ix_ingestion_runs_user_id'), table_name='ingestion_runs')
+    op.drop_constraint('uq_ingestion_state_user_id', 'ingestion_state', type_='unique')
+    op.drop_constraint('uq_spotify_tokens_user_id', 'spotify_tokens', type_='unique')
+
+    op.drop_index('ix_listens_user_played_at', table_name='listens')
+    op.drop_constraint('uq_listen_user_track_played_at', 'listens', type_='unique')
+    # Listens of other accounts would collide on the old constraint
+    op.execute("DELETE FROM listens WHERE user_id <> 1")
+    op.create_unique_constraint('uq_listen_track_played_at', 'listens', ['track_id', 'played_at'])
+
+    for table in OWNED_TABLES:
+        op.drop_constraint(f'fk_{table}_user_id', table, type_='foreignkey')
+        op.drop_column(table, 'user_id')
+
+    op.drop_index(op.f('ix_users_user_id'), table_name='users')
+    op.drop_table('users')
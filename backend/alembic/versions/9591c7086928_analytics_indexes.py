@@ -0,0 +1,36 @@
+"""analytics indexes
+
+Revision ID: 9591c7086928
+Revises: 95f3a1a11fe4
+Create Date: 2026-10-18 19:48:51.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9591c7086928'
+down_revision: Union[str, Sequence[str], None] = '95f3a1a11fe4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Covering version of the range index, per-track counts of a range become index-only scans
+    op.drop_index('ix_listens_user_played_at', table_name='listens')
+    op.create_index('ix_listens_user_played_at', 'listens', ['user_id', 'played_at'], postgresql_include=['track_id'])
+    # The primary keys only serve track -> artist/album lookups
+    op.create_index('ix_track_artists_artist_track', 'track_artists', ['artist_id', 'track_id'])
+    op.create_index('ix_track_album_album_track', 'track_album', ['album_id', 'track_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_track_album_album_track', table_name='track_album')
+    op.drop_index('ix_track_artists_artist_track', table_name='track_artists')
+    op.drop_index('ix_listens_user_played_at', table_name='listens')
+    op.create_index('ix_listens_user_played_at', 'listens', ['user_id', 'played_at'])
@@ -0,0 +1,68 @@
+"""entity plays
+
+Revision ID: 95f3a1a11fe4
+Revises: 1adf0feb8ed5
+Create Date: 2026-10-18 19:12:08.531774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '95f3a1a11fe4'
+down_revision: Union[str, Sequence[str], None] = '1adf0feb8ed5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'entity_plays',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=10), nullable=False),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('play_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('user_id', 'entity_type', 'period', 'period_start', 'entity_id'),
+    )
+    op.create_index(
+        'ix_entity_plays_ranked', 'entity_plays',
+        ['user_id', 'entity_type', 'period', 'period_start', sa.text('play_count DESC'), 'entity_id'],
+    )
+    op.create_index('ix_listens_track_id', 'listens', ['track_id'])
+    # Existing history, later changes are maintained by the writers
+    op.execute("""
+        INSERT INTO entity_plays (user_id, entity_type, period, period_start, entity_id, play_count)
+        SELECT e.user_id, e.entity_type, p.period, p.period_start, e.entity_id, count(*)
+        FROM (
+            SELECT l.user_id, 'track' AS entity_type, l.track_id AS entity_id, (l.played_at AT TIME ZONE 'UTC')::date AS day
+            FROM listens l
+            UNION ALL
+            SELECT l.user_id, 'artist', ta.artist_id, (l.played_at AT TIME ZONE 'UTC')::date
+            FROM listens l JOIN track_artists ta ON ta.track_id = l.track_id
+            UNION ALL
+            SELECT l.user_id, 'album', tl.album_id, (l.played_at AT TIME ZONE 'UTC')::date
+            FROM listens l JOIN track_album tl ON tl.track_id = l.track_id
+        ) e
+        CROSS JOIN LATERAL (VALUES
+            ('day', e.day),
+            ('week', date_trunc('week', e.day)::date),
+            ('month', date_trunc('month', e.day)::date),
+            ('year', date_trunc('year', e.day)::date),
+            ('all', DATE '1970-01-01')
+        ) AS p(period, period_start)
+        GROUP BY 1, 2, 3, 4, 5
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_listens_track_id', table_name='listens')
+    op.drop_index('ix_entity_plays_ranked', table_name='entity_plays')
+    op.drop_table('entity_plays')
@@ -0,0 +1,41 @@
+"""listen batches
+
+Revision ID: b48a8fb628cb
+Revises: 16d8c7fdfde6
+Create Date: 2026-10-18 22:17:40.236815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b48a8fb628cb'
+down_revision: Union[str, Sequence[str], None] = '16d8c7fdfde6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'listen_batches',
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('listen_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id']),
+        sa.PrimaryKeyConstraint('version'),
+    )
+    op.create_index(op.f('ix_listen_batches_user_id'), 'listen_batches', ['user_id'], unique=False)
+    op.create_index(op.f('ix_listen_batches_created_at'), 'listen_batches', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_listen_batches_created_at'), table_name='listen_batches')
+    op.drop_index(op.f('ix_listen_batches_user_id'), table_name='listen_batches')
+    op.drop_table('listen_batches')
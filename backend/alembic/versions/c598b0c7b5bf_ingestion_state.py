@@ -0,0 +1,42 @@
+"""ingestion state
+
+Revision ID: c598b0c7b5bf
+Revises: fc338e9f3873
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c598b0c7b5bf'
+down_revision: Union[str, Sequence[str], None] = 'fc338e9f3873'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ingestion_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('last_played_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_ingestion_state_id'), 'ingestion_state', ['id'], unique=False)
+
+    # Seed the watermark from already ingested listens so the first tick doesn't re-read them
+    op.execute(
+        "INSERT INTO ingestion_state (id, last_played_at, updated_at) "
+        "SELECT 1, max(played_at), now() FROM listens"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ingestion_state_id'), table_name='ingestion_state')
+    op.drop_table('ingestion_state')
@@ -0,0 +1,41 @@
+"""import files
+
+Revision ID: cf8efcb3a2d1
+Revises: c598b0c7b5bf
+Create Date: 2026-10-18 10:03:17.881902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cf8efcb3a2d1'
+down_revision: Union[str, Sequence[str], None] = 'c598b0c7b5bf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'import_files',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_hash', sa.String(), nullable=False),
+        sa.Column('file_name', sa.String(), nullable=False),
+        sa.Column('entries_done', sa.Integer(), nullable=False),
+        sa.Column('listens_imported', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('file_hash'),
+    )
+    op.create_index(op.f('ix_import_files_id'), 'import_files', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_import_files_id'), table_name='import_files')
+    op.drop_table('import_files')
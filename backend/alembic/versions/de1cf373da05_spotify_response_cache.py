@@ -0,0 +1,41 @@
+"""spotify response cache
+
+Revision ID: de1cf373da05
+Revises: 0547eb040cd1
+Create Date: 2026-10-18 16:02:44.118390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de1cf373da05'
+down_revision: Union[str, Sequence[str], None] = '0547eb040cd1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'spotify_response_cache',
+        sa.Column('cache_key', sa.String(), nullable=False),
+        sa.Column('status', sa.Integer(), nullable=False),
+        sa.Column('etag', sa.String(), nullable=True),
+        sa.Column('body', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('negative', sa.Boolean(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('cache_key'),
+    )
+    op.create_index(op.f('ix_spotify_response_cache_expires_at'), 'spotify_response_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_spotify_response_cache_expires_at'), table_name='spotify_response_cache')
+    op.drop_table('spotify_response_cache')
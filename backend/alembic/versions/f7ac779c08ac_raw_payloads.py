@@ -0,0 +1,43 @@
+"""raw payloads
+
+Revision ID: f7ac779c08ac
+Revises: 70fe9696f13c
+Create Date: 2026-10-18 13:55:09.412876
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7ac779c08ac'
+down_revision: Union[str, Sequence[str], None] = '70fe9696f13c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'raw_payloads',
+        sa.Column('payload_id', sa.Integer(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('first_played_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_played_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('payload_id'),
+    )
+    op.create_index(op.f('ix_raw_payloads_payload_id'), 'raw_payloads', ['payload_id'], unique=False)
+    op.create_index(op.f('ix_raw_payloads_first_played_at'), 'raw_payloads', ['first_played_at'], unique=False)
+    op.create_index(op.f('ix_raw_payloads_last_played_at'), 'raw_payloads', ['last_played_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_raw_payloads_last_played_at'), table_name='raw_payloads')
+    op.drop_index(op.f('ix_raw_payloads_first_played_at'), table_name='raw_payloads')
+    op.drop_index(op.f('ix_raw_payloads_payload_id'), table_name='raw_payloads')
+    op.drop_table('raw_payloads')
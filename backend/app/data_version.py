@@ -0,0 +1,76 @@
+"""
+Version of the listening data, for caches of responses derived from it.
+
+Writers that change what the analytics endpoints return call notify_data_changed
+inside their transaction (enrichment, imports, rebuilds); new listens are announced
+on the listens channel with notify_new_listens, which does the same. Both count up
+the single row of data_version and send the new value along. The row lock is held
+until commit, so versions are committed (and notifications delivered) in order.
+
+The API's event hub passes every notification to bump, and after a reconnect, when
+notifications may have been missed, the committed version is read back. Versions
+live in the database: they are the same in every API process and never reused
+after a restart, so they can go into ETags as they are.
+"""
+import json
+import logging
+import threading
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "data_changed"
+
+NEXT_VERSION = text("""
+    INSERT INTO data_version (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET version = data_version.version + 1
+    RETURNING version
+""")
+COMMITTED_VERSION = text("SELECT coalesce(max(version), 0) FROM data_version")
+
+# None until the committed version is known, the response cache is bypassed meanwhile
+_version: Optional[int] = None
+_lock = threading.Lock()
+
+def next_version(db: Session) -> int:
+    """Counts up the data version in the caller's transaction, which holds the row until it ends."""
+    return db.execute(NEXT_VERSION).scalar_one()
+
+def notify_data_changed(db: Session, reason: str = ""):
+    """Delivered when the caller's transaction commits, nothing is announced on rollback."""
+    payload = {"version": next_version(db), "reason": reason}
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": json.dumps(payload)})
+
+def current() -> Optional[int]:
+    return _version
+
+def committed_version() -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return db.execute(COMMITTED_VERSION).scalar()
+    except Exception as e:
+        logger.warning(f"Could not read the data version: {e}")
+        return None
+    finally:
+        db.close()
+
+def bump(payload: Optional[str] = None):
+    """Event hub watcher for the listens and data_changed channels."""
+    global _version
+    try:
+        version = json.loads(payload).get("version") if payload else None
+    except ValueError:
+        version = None
+    if version is None:
+        # Reconnected (or an announcement without a version): only the database knows
+        version = committed_version()
+        with _lock:
+            _version = version
+        return
+    with _lock:
+        _version = version if _version is None else max(_version, version)
@@ -0,0 +1,235 @@
+import logging
+from typing import Dict, Any, List
+
+import requests
+from sqlalchemy import select, update, delete, func, or_, bindparam
+from sqlalchemy.orm import Session
+
+from app.data_version import notify_data_changed
+from app.database import SessionLocal
+from app.ingestion import (
+    get_image_qualities, parse_date, new_batch, normalize_item, write_batch, remember_batch_keys,
+)
+from app.models import Artist, Album, Track, EnrichmentQueue
+from app.rollups import apply_duration_changes
+from app.utils import spotify_client, upstream_cache
+from app.utils.rate_governor import PRIORITY_ENRICHMENT, SpotifyRateLimited
+from app.utils.spotify import get_valid_spotify_token
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Per entity type, so a large track backlog can't starve albums and artists
+MAX_BATCHES_PER_RUN = 20
+
+# entity type -> (model, multi-ID endpoint, response key, max IDs per request)
+# Tracks go first, enriching them can create albums and artists that need enrichment themselves.
+ENDPOINTS = {
+    "track": (Track, "/tracks", "tracks", 50),
+    "album": (Album, "/albums", "albums", 20),
+    "artist": (Artist, "/artists", "artists", 50),
+}
+
+# Answers that are cached as negative, so they are not fetched again on every request
+NEGATIVE_IF = {
+    "track": None,
+    "album": lambda obj: not obj.get("images"),
+    "artist": lambda obj: not obj.get("images"),
+}
+
+def image_columns(images: list) -> Dict[str, Any]:
+    small, medium, large = get_image_qualities(images)
+    return {"image_url_small": small, "image_url_medium": medium, "image_url_large": large}
+
+def update_changed(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+    """
+    Bulk UPDATE by primary key that leaves rows alone whose values wouldn't change.
+    Returns the number of changed rows.
+    """
+    if not rows:
+        return 0
+    table = model.__table__
+    pk = list(table.primary_key.columns)[0]
+    columns = [table.c[name] for name in rows[0] if name != pk.name]
+    stmt = (
+        update(table)
+        .where(pk == bindparam("key"))
+        .where(or_(*[column.is_distinct_from(bindparam(f"new_{column.name}")) for column in columns]))
+        .values({column.name: bindparam(f"new_{column.name}") for column in columns})
+    )
+    params = [{"key": row[pk.name], **{f"new_{column.name}": row[column.name] for column in columns}} for row in rows]
+    return db.execute(stmt, params).rowcount
+
+def apply_artists(db: Session, keys: Dict[str, int], objects: List[Dict[str, Any]]) -> int:
+    """Returns the number of changed artists."""
+    rows = [
+        {"artist_id": keys[obj["id"]], "name": obj.get("name"), **image_columns(obj.get("images", []))}
+        for obj in objects if obj and obj.get("id") in keys and obj.get("images")
+    ]
+    return update_changed(db, Artist, rows)
+
+def apply_albums(db: Session, keys: Dict[str, int], objects: List[Dict[str, Any]]):
+    """Returns the number of changed albums and the album_ids whose objects could not be parsed."""
+    rows, failed = [], []
+    for obj in objects:
+        if not obj or obj.get("id") not in keys:
+            continue
+        try:
+            rows.append({
+                "album_id": keys[obj["id"]],
+                "release_date": parse_date(obj.get("release_date"), obj.get("release_date_precision")),
+                "release_date_precision": obj.get("release_date_precision"),
+                "album_type": obj.get("album_type"),
+                "total_tracks": obj.get("total_tracks"),
+                **image_columns(obj.get("images", [])),
+            })
+        except Exception as e:
+            failed.append(keys[obj["id"]])
+            logger.error(f"Failed to parse album {obj['id']}: {e}")
+    return update_changed(db, Album, rows), failed
+
+def apply_tracks(db: Session, keys: Dict[str, int], objects: List[Dict[str, Any]]):
+    """
+    Full track objects have the same shape as recently-played tracks, so the ingestion
+    normalizer creates missing albums, artists and links (e.g. for imported tracks).
+    Returns the batch, the number of changed rows and the track_ids whose objects could not be normalized.
+    """
+    batch = new_batch()
+    failed = []
+    for obj in objects:
+        if not obj:
+            continue
+        try:
+            normalize_item(batch, {"track": obj})
+        except Exception as e:
+            if obj.get("id") in keys:
+                failed.append(keys[obj["id"]])
+            logger.error(f"Failed to normalize track {obj.get('id')}: {e}")
+    stats = write_batch(db, batch)
+    # New links move plays of imported tracks to their artists and albums
+    changed = stats["artists_new"] + stats["albums_new"] + stats["tracks_new"] + stats["links_new"]
+
+    rows = [
+        {"track_id": keys[spotify_id], "name": row["name"], "duration": row["duration"],
+         "image_url_small": row["image_url_small"], "image_url_medium": row["image_url_medium"],
+         "image_url_large": row["image_url_large"]}
+        for spotify_id, row in batch["tracks"].items() if spotify_id in keys
+    ]
+    if rows:
+        # Imported tracks get their duration only now, listened seconds of their hours change with it
+        apply_duration_changes(db, {row["track_id"]: row["duration"] for row in rows})
+        changed += update_changed(db, Track, rows)
+    return batch, changed, failed
+
+def record_failures(db: Session, entity_type: str, entity_ids: List[int]):
+    """
+    Counts a failed attempt for the queued entities and drops those that used up MAX_ATTEMPTS.
+    The others go to the back of the queue, so they don't hold up the entities behind them.
+    """
+    if not entity_ids:
+        return
+    db.execute(
+        update(EnrichmentQueue)
+        .where(EnrichmentQueue.entity_type == entity_type, EnrichmentQueue.entity_id.in_(entity_ids))
+        .values(attempts=EnrichmentQueue.attempts + 1, enqueued_at=func.now())
+    )
+    db.execute(
+        delete(EnrichmentQueue)
+        .where(EnrichmentQueue.entity_type == entity_type, EnrichmentQueue.attempts >= MAX_ATTEMPTS)
+    )
+
+def enrich_batch(db: Session, token: str, entity_type: str) -> int:
+    """Enriches the oldest queued batch of one entity type. Returns the number of dequeued entities."""
+    model, path, response_key, batch_size = ENDPOINTS[entity_type]
+    pk = list(model.__table__.primary_key.columns)[0]
+
+    queued = db.execute(
+        select(EnrichmentQueue.entity_id, model.spotify_id)
+        .join(model, pk == EnrichmentQueue.entity_id)
+        .where(EnrichmentQueue.entity_type == entity_type)
+        .order_by(EnrichmentQueue.enqueued_at)
+        .limit(batch_size)
+        .with_for_update(of=EnrichmentQueue, skip_locked=True)
+    ).all()
+    if not queued:
+        return 0
+
+    entity_ids = [row.entity_id for row in queued]
+    keys = {row.spotify_id: row.entity_id for row in queued}
+
+    # Entities answered from the upstream cache (including "no images" / unknown) cost no call
+    cached = upstream_cache.get_entities(response_key, keys)
+    objects = [entry["body"] for entry in cached.values() if entry["body"]]
+    to_fetch = [spotify_id for spotify_id in keys if spotify_id not in cached]
+
+    try:
+        if to_fetch:
+            response = spotify_client.get(path, token, endpoint=response_key, params={"ids": ",".join(to_fetch)},
+                                          priority=PRIORITY_ENRICHMENT)
+            response.raise_for_status()
+            fetched = response.json().get(response_key, [])
+            # Results come back in request order, with null for unknown IDs
+            upstream_cache.store_entities(response_key, dict(zip(to_fetch, fetched)), NEGATIVE_IF[entity_type])
+            objects.extend(obj for obj in fetched if obj)
+    except SpotifyRateLimited:
+        # Deferred, not failed: keep the batch queued for the next run
+        db.rollback()
+        raise
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to fetch {entity_type}s from Spotify: {e}")
+        record_failures(db, entity_type, entity_ids)
+        db.commit()
+        raise
+
+    batch, failed = None, []
+    if entity_type == "artist":
+        changed = apply_artists(db, keys, objects)
+    elif entity_type == "album":
+        changed, failed = apply_albums(db, keys, objects)
+    else:
+        batch, changed, failed = apply_tracks(db, keys, objects)
+
+    # Objects that could not be applied stay queued until they used up their attempts
+    done = sorted(set(entity_ids) - set(failed))
+    db.execute(
+        delete(EnrichmentQueue)
+        .where(EnrichmentQueue.entity_type == entity_type, EnrichmentQueue.entity_id.in_(done))
+    )
+    record_failures(db, entity_type, failed)
+    # Names, images and durations show up in cached API responses, a batch that changed nothing keeps them valid
+    if changed:
+        notify_data_changed(db, f"enrichment:{entity_type}")
+    db.commit()
+    if batch is not None:
+        remember_batch_keys(batch)
+
+    logger.info(f"Enriched {len(entity_ids)} {entity_type}s ({len(cached)} from cache).")
+    return len(entity_ids)
+
+def drain_enrichment_queue():
+    """
+    Background job: drains the enrichment queue using Spotify's multi-ID endpoints
+    and writes the results back in bulk.
+    """
+    db: Session = SessionLocal()
+
+    try:
+        token = get_valid_spotify_token(db)
+        for entity_type in ENDPOINTS:
+            batches = 0
+            while batches < MAX_BATCHES_PER_RUN:
+                if not enrich_batch(db, token, entity_type):
+                    break
+                batches += 1
+
+    except SpotifyRateLimited as e:
+        logger.info(f"Enrichment deferred: {e}")
+        db.rollback()
+    except requests.exceptions.RequestException:
+        db.rollback()
+    except Exception as e:
+        logger.error(f"Unexpected error during enrichment: {e}")
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,180 @@
+"""
+Postgres LISTEN/NOTIFY fan-out for the API process.
+
+One background thread holds a dedicated connection that LISTENs on every registered
+channel. Each notification goes through the channel's handler once, in that thread,
+and whatever the handler returns is pushed to every subscriber of the channel (e.g.
+an open SSE response). The number of connected clients never changes the number of
+database queries or Spotify calls. Watchers only get told that a channel fired, e.g.
+to invalidate caches, and may share a channel with its handler.
+"""
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app.database import SQLALCHEMY_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_SECONDS = 5
+POLL_TIMEOUT_SECONDS = 5
+# SSE comment sent on idle streams so proxies don't close them
+KEEPALIVE_SECONDS = int(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+def sse_event(data: Any, event: Optional[str] = None, event_id: Optional[Any] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+SSE_KEEPALIVE = ": keepalive\n\n"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+class Subscription:
+    def __init__(self, channel: str, loop: asyncio.AbstractEventLoop, max_size: int):
+        self.channel = channel
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+
+    def push(self, value: Any):
+        """Runs on the subscriber's event loop. A slow client loses its oldest events, not the newest."""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(value)
+
+    async def get(self, timeout: float) -> Any:
+        """Next event, raises asyncio.TimeoutError if nothing arrived within timeout."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+class EventHub:
+    def __init__(self):
+        self._handlers: Dict[str, Callable[[str], Any]] = {}
+        self._reconnect_handlers: Dict[str, Callable[[], Any]] = {}
+        self._watchers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.listening = False
+
+    def register(self, channel: str, handler: Callable[[str], Any], on_reconnect: Optional[Callable[[], Any]] = None):
+        """
+        handler(payload) turns a notification into the value sent to subscribers (None sends nothing).
+        on_reconnect() catches up on notifications missed while the connection was down.
+        """
+        self._handlers[channel] = handler
+        if on_reconnect:
+            self._reconnect_handlers[channel] = on_reconnect
+
+    def watch(self, channel: str, watcher: Callable[[Optional[str]], None]):
+        """
+        watcher(payload) runs before the handler on every notification of channel, and
+        watcher(None) after every (re)connect, since notifications can be missed in between.
+        """
+        self._watchers.setdefault(channel, []).append(watcher)
+
+    def _channels(self) -> List[str]:
+        return list(dict.fromkeys([*self._handlers, *self._watchers]))
+
+    def subscribe(self, channel: str, max_size: int = 16) -> Subscription:
+        """Must be called from the event loop that will consume the subscription."""
+        subscription = Subscription(channel, asyncio.get_running_loop(), max_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.get(subscription.channel, set()).discard(subscription)
+
+    def subscriber_count(self) -> Dict[str, int]:
+        with self._lock:
+            return {channel: len(subscribers) for channel, subscribers in self._subscribers.items()}
+
+    def publish(self, channel: str, value: Any):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, value)
+            except RuntimeError:
+                # Event loop already closed
+                self.unsubscribe(subscription)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-hub", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=POLL_TIMEOUT_SECONDS + 1)
+            self._thread = None
+
+    def _dispatch(self, channel: str, produce: Callable[[], Any]):
+        try:
+            value = produce()
+        except Exception as e:
+            logger.error(f"Event handler for '{channel}' failed: {e}")
+            return
+        if value is not None:
+            self.publish(channel, value)
+
+    def _notify_watchers(self, channel: str, payload: Optional[str]):
+        for watcher in self._watchers.get(channel, ()):
+            try:
+                watcher(payload)
+            except Exception as e:
+                logger.error(f"Watcher of '{channel}' failed: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(SQLALCHEMY_DATABASE_URL)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    for channel in self._channels():
+                        cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                # Before listening is set: whoever trusts the flag must not see a pre-reconnect state
+                for channel in self._watchers:
+                    self._notify_watchers(channel, None)
+                self.listening = True
+                logger.info(f"Listening for {', '.join(self._channels())}")
+
+                for channel, on_reconnect in self._reconnect_handlers.items():
+                    self._dispatch(channel, on_reconnect)
+
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], POLL_TIMEOUT_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._notify_watchers(notify.channel, notify.payload)
+                        handler = self._handlers.get(notify.channel)
+                        if handler:
+                            self._dispatch(notify.channel, lambda: handler(notify.payload))
+            except Exception as e:
+                logger.warning(f"Event listener connection lost: {e}")
+            finally:
+                self.listening = False
+                if conn is not None:
+                    conn.close()
+            self._stop.wait(RECONNECT_SECONDS)
+
+hub = EventHub()
@@ -0,0 +1,256 @@
+"""
+Imports Spotify extended streaming history exports (Streaming_History_Audio_*.json).
+
+Usage:
+    python -m app.importers.history [--user-id ID] [--workers N] [--min-ms-played MS] FILE [FILE ...]
+
+Every file is parsed with a streaming JSON parser in its own worker process.
+Entries are loaded with COPY into a temporary staging table in chunks and merged
+into tracks/listens of the account from there. Files can be imported again or overlap
+with already ingested listens. The export's ts is when the stream ended, listens carry
+its start like ingested ones do (ts - ms_played), and an entry is dropped if the account
+already has a listen of the track within DEDUPE_TOLERANCE_SECONDS of that start.
+
+Progress is committed per chunk in import_files, an interrupted import continues
+where it stopped when it is started again with the same files.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Tuple
+
+import ijson
+
+from app.data_version import notify_data_changed
+from app.database import engine, SessionLocal
+from app.rollups import ADD_TO_ROLLUP, ADD_TO_ENTITY_PLAYS, ADD_TO_LISTEN_DAYS, APP_TIME_ZONE, refresh_streaks
+from app.utils.users import resolve_user_id
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50_000
+
+# Spotify counts a stream as a play after 30 seconds
+DEFAULT_MIN_MS_PLAYED = 30_000
+# Clock slack between the export and the recently-played API
+DEDUPE_TOLERANCE_SECONDS = 10
+
+STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS staging_listens (
+        spotify_id text NOT NULL,
+        track_name text,
+        ended_at timestamptz NOT NULL,
+        ms_played integer NOT NULL
+    )
+"""
+
+# New tracks only have a name, the enrichment worker fills in duration, images, artists and albums
+MERGE_TRACKS = """
+    WITH new_tracks AS (
+        INSERT INTO tracks (spotify_id, name)
+        SELECT DISTINCT ON (spotify_id) spotify_id, coalesce(track_name, 'Unknown Track')
+        FROM staging_listens
+        ORDER BY spotify_id
+        ON CONFLICT (spotify_id) DO NOTHING
+        RETURNING track_id
+    )
+    INSERT INTO enrichment_queue (entity_type, entity_id, enqueued_at, attempts)
+    SELECT 'track', track_id, now(), 0 FROM new_tracks
+    ON CONFLICT DO NOTHING
+"""
+
+# Imported listens go into the aggregates in the same statement, streaks are refreshed once after all files.
+# The window is tight around the start, so back-to-back repeats of a track stay separate listens.
+MERGE_LISTENS = f"""
+    WITH inserted AS (
+        INSERT INTO listens (user_id, track_id, played_at)
+        SELECT %(user_id)s, t.track_id, s.played_at
+        FROM (
+            SELECT spotify_id, ended_at - make_interval(secs => ms_played / 1000.0) AS played_at
+            FROM staging_listens
+        ) s
+        JOIN tracks t ON t.spotify_id = s.spotify_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM listens l
+            WHERE l.user_id = %(user_id)s AND l.track_id = t.track_id
+              AND l.played_at BETWEEN s.played_at - make_interval(secs => %(tolerance)s)
+                                  AND s.played_at + make_interval(secs => %(tolerance)s)
+        )
+        ON CONFLICT ON CONSTRAINT uq_listen_user_track_played_at DO NOTHING
+        RETURNING user_id, track_id, played_at
+    ), rolled_up AS ({ADD_TO_ROLLUP.format(source="inserted", where="")}
+    ), counted AS ({ADD_TO_ENTITY_PLAYS.format(source="inserted", where="")}
+    ), days AS ({ADD_TO_LISTEN_DAYS.format(source="inserted", where="", tz="%(tz)s")})
+    SELECT count(*) FROM inserted
+"""
+
+SAVE_PROGRESS = """
+    INSERT INTO import_files (file_hash, file_name, entries_done, listens_imported, updated_at, completed_at)
+    VALUES (%(file_hash)s, %(file_name)s, %(entries_done)s, %(listens_imported)s, now(),
+            CASE WHEN %(completed)s THEN now() END)
+    ON CONFLICT (file_hash) DO UPDATE SET
+        entries_done = excluded.entries_done,
+        listens_imported = excluded.listens_imported,
+        updated_at = excluded.updated_at,
+        completed_at = excluded.completed_at
+"""
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_entry(entry: Dict[str, Any], min_ms_played: int):
+    """Returns a staging row for a track play, None for podcasts, local files and skipped plays."""
+    uri = entry.get("spotify_track_uri")
+    if not uri or not uri.startswith("spotify:track:"):
+        return None
+    if (entry.get("ms_played") or 0) < min_ms_played:
+        return None
+    return (uri.rsplit(":", 1)[-1], entry.get("master_metadata_track_name"), entry["ts"], entry["ms_played"])
+
+def iter_chunks(path: str, skip: int, min_ms_played: int) -> Iterator[Tuple[int, List[tuple]]]:
+    """
+    Streams the export and yields (entries consumed, rows) per chunk.
+    The first `skip` entries were committed by an earlier run and are only counted.
+    """
+    consumed = 0
+    rows = []
+    with open(path, "rb") as f:
+        for entry in ijson.items(f, "item"):
+            consumed += 1
+            if consumed <= skip:
+                continue
+            row = parse_entry(entry, min_ms_played)
+            if row:
+                rows.append(row)
+            if consumed % CHUNK_SIZE == 0:
+                yield consumed, rows
+                rows = []
+    yield consumed, rows
+
+def copy_rows(cursor, rows: List[tuple]):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert("COPY staging_listens (spotify_id, track_name, ended_at, ms_played) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def import_file(path: str, min_ms_played: int, user_id: int) -> Dict[str, Any]:
+    """Imports one export file, runs inside a worker process."""
+    name = os.path.basename(path)
+    digest = file_hash(path)
+    started = time.monotonic()
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT entries_done, listens_imported, completed_at FROM import_files WHERE file_hash = %s", (digest,))
+        progress = cursor.fetchone()
+        if progress and progress[2] is not None:
+            logger.info(f"{name}: already imported, skipping")
+            conn.rollback()
+            return {"file": name, "listens": 0, "entries": 0, "skipped": True}
+
+        entries_done, listens_imported = (progress[0], progress[1]) if progress else (0, 0)
+        if entries_done:
+            logger.info(f"{name}: resuming after {entries_done} entries")
+
+        cursor.execute(STAGING_DDL)
+        conn.commit()
+
+        resumed_from = entries_done
+        for entries_done, rows in iter_chunks(path, entries_done, min_ms_played):
+            if rows:
+                copy_rows(cursor, rows)
+                cursor.execute(MERGE_TRACKS)
+                cursor.execute(MERGE_LISTENS, {"user_id": user_id, "tz": APP_TIME_ZONE, "tolerance": DEDUPE_TOLERANCE_SECONDS})
+                listens_imported += cursor.fetchone()[0]
+                cursor.execute("TRUNCATE staging_listens")
+
+            cursor.execute(SAVE_PROGRESS, {
+                "file_hash": digest,
+                "file_name": name,
+                "entries_done": entries_done,
+                "listens_imported": listens_imported,
+                "completed": False,
+            })
+            conn.commit()
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"{name}: {entries_done} entries, {listens_imported} listens "
+                f"({(entries_done - resumed_from) / max(elapsed, 1e-6):.0f} entries/s)"
+            )
+
+        cursor.execute(SAVE_PROGRESS, {
+            "file_hash": digest,
+            "file_name": name,
+            "entries_done": entries_done,
+            "listens_imported": listens_imported,
+            "completed": True,
+        })
+        conn.commit()
+        return {"file": name, "listens": listens_imported, "entries": entries_done, "skipped": False}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import Spotify extended streaming history exports.")
+    parser.add_argument("files", nargs="+", help="Streaming_History_Audio_*.json files")
+    parser.add_argument("--user-id", type=int, default=None, help="Account to import into, defaults to the first account")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel worker processes")
+    parser.add_argument("--min-ms-played", type=int, default=DEFAULT_MIN_MS_PLAYED,
+                        help="Ignore plays shorter than this (default: 30000)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        user_id = resolve_user_id(db, args.user_id)
+    finally:
+        db.close()
+
+    started = time.monotonic()
+    total_listens = 0
+    failed = 0
+
+    # spawn gives every worker its own engine instead of sharing forked connections
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(args.files)), mp_context=context) as pool:
+        futures = {pool.submit(import_file, path, args.min_ms_played, user_id): path for path in args.files}
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                result = future.result()
+                total_listens += result["listens"]
+                logger.info(f"[{done}/{len(futures)}] {result['file']}: {result['listens']} listens imported")
+            except Exception as e:
+                failed += 1
+                logger.error(f"[{done}/{len(futures)}] {os.path.basename(path)} failed: {e}")
+
+    # Once for all files, the workers only add days
+    db = SessionLocal()
+    try:
+        refresh_streaks(db, [user_id])
+        notify_data_changed(db, "import")
+        db.commit()
+    finally:
+        db.close()
+
+    logger.info(f"Imported {total_listens} listens from {len(args.files) - failed} files in {time.monotonic() - started:.1f}s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Thread pool that keeps every account of this worker's shard fresh.
+
+A single timer heap holds the next ingest (and, for active accounts, the next player
+poll) of every account; a fixed number of threads take due tasks off it, so one
+worker polls accounts concurrently without a scheduler job per account.
+
+- New accounts start at a random offset within INGEST_STAGGER_SECONDS and every delay
+  is jittered, so accounts don't end up polling in lockstep.
+- Each account has its own schedule state (see app/ingest_schedule.py): failures,
+  429s and revoked tokens back off per account without holding up the others.
+- Only accounts that are playing or listened recently get their player polled.
+- With WORKER_SHARDS > 1 every worker only serves user_id % WORKER_SHARDS == WORKER_SHARD.
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from app.database import SessionLocal
+from app.ingest_schedule import AdaptiveIngest, CEILING_SECONDS
+from app.ingestion import ingest_recent_listens
+from app.player import poll_player_state, POLL_SECONDS as PLAYER_POLL_SECONDS
+from app.utils.users import authorized_user_ids
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("INGEST_POOL_SIZE", "8"))
+STAGGER_SECONDS = int(os.getenv("INGEST_STAGGER_SECONDS", "60"))
+JITTER = 0.1
+ACCOUNT_REFRESH_SECONDS = 60
+
+INGEST = "ingest"
+PLAYER = "player"
+REFRESH = "refresh"
+
+def jittered(delay: float) -> float:
+    return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+class Account:
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.schedule = AdaptiveIngest()
+        # Ingest and player poll of one account may run at the same time, both touch the schedule
+        self.lock = threading.Lock()
+
+class IngestPool:
+    def __init__(self, shard: int = 0, shards: int = 1, size: int = POOL_SIZE):
+        self.shard = shard
+        self.shards = shards
+        self.size = size
+        self._accounts: Dict[int, Account] = {}
+        self._heap: list = []  # (due, seq, user_id, kind), due is monotonic
+        self._due: Dict[Tuple[Optional[int], str], float] = {}
+        self._running: Set[Tuple[Optional[int], str]] = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._push(None, REFRESH, 0)
+        for number in range(self.size):
+            thread = threading.Thread(target=self._work, name=f"ingest-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"accounts": len(self._accounts), "scheduled": len(self._due), "running": len(self._running)}
+
+    def _push(self, user_id: Optional[int], kind: str, delay: float, only_earlier: bool = False):
+        """Plans a task. only_earlier never postpones a planned task and skips tasks that are running."""
+        key = (user_id, kind)
+        due = time.monotonic() + delay
+        with self._cond:
+            if only_earlier and (key in self._running or self._due.get(key, float("inf")) <= due):
+                return
+            self._due[key] = due
+            heapq.heappush(self._heap, (due, next(self._seq), user_id, kind))
+            self._cond.notify()
+
+    def _pop(self) -> Optional[Tuple[Optional[int], str]]:
+        with self._cond:
+            while not self._stop.is_set():
+                if not self._heap:
+                    self._cond.wait(1)
+                    continue
+                due, _, user_id, kind = self._heap[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(min(due - now, 1))
+                    continue
+                heapq.heappop(self._heap)
+                key = (user_id, kind)
+                # Entries that were re-planned since are skipped
+                if self._due.get(key) != due:
+                    continue
+                del self._due[key]
+                self._running.add(key)
+                return key
+        return None
+
+    def _work(self):
+        while True:
+            task = self._pop()
+            if task is None:
+                return
+            user_id, kind = task
+            try:
+                self._run(user_id, kind)
+            except Exception as e:
+                logger.error(f"{kind} task of user {user_id} failed: {e}")
+                if kind == INGEST:
+                    # Never lose an account's schedule
+                    self._push(user_id, INGEST, jittered(CEILING_SECONDS / 2))
+            finally:
+                with self._cond:
+                    self._running.discard(task)
+
+    def _run(self, user_id: Optional[int], kind: str):
+        if kind == REFRESH:
+            self.refresh_accounts()
+            self._push(None, REFRESH, ACCOUNT_REFRESH_SECONDS)
+            return
+
+        account = self._accounts.get(user_id)  # type: ignore
+        if account is None:
+            return  # logged out or moved to another shard
+
+        if kind == INGEST:
+            new_listens = ingest_recent_listens(user_id)
+            with account.lock:
+                delay = account.schedule.after_run(new_listens)
+                active = account.schedule.is_active()
+            self._push(user_id, INGEST, min(jittered(delay), CEILING_SECONDS))
+            if active:
+                self._push(user_id, PLAYER, PLAYER_POLL_SECONDS, only_earlier=True)
+
+        elif kind == PLAYER:
+            result = poll_player_state(user_id)  # type: ignore
+            with account.lock:
+                pull_forward = account.schedule.on_player_poll(result)
+                active = account.schedule.is_active()
+            if pull_forward is not None:
+                self._push(user_id, INGEST, pull_forward, only_earlier=True)
+            if active:
+                self._push(user_id, PLAYER, PLAYER_POLL_SECONDS)
+
+    def refresh_accounts(self):
+        """Picks up new logins and drops accounts without a token."""
+        db = SessionLocal()
+        try:
+            user_ids = set(authorized_user_ids(db, self.shard, self.shards))
+        finally:
+            db.close()
+
+        added = user_ids - self._accounts.keys()
+        removed = self._accounts.keys() - user_ids
+        for user_id in removed:
+            del self._accounts[user_id]
+        for user_id in added:
+            self._accounts[user_id] = Account(user_id)
+            # Staggered start, a restart doesn't poll every account at once
+            self._push(user_id, INGEST, random.uniform(0, STAGGER_SECONDS))
+
+        if added or removed:
+            logger.info(f"Accounts: {len(added)} added, {len(removed)} removed, {len(self._accounts)} total")
@@ -0,0 +1,108 @@
+"""
+Activity-adaptive ingestion schedule.
+
+Instead of a fixed interval, the next ingest is planned after every run:
+- while something is playing: shortly after the current track ends, when it shows up
+  in recently-played
+- after a run that found new listens: again after the minimum interval
+- while idle: exponential backoff
+The player of an active account is polled as well, it pulls the next ingest forward
+when a track ends or playback starts.
+
+recently-played only returns the last 50 plays and a play counts after 30 seconds,
+so no delay is ever longer than 50 * 30s: not even a session of skipped tracks can
+push a play out of the window between two ingests.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+
+from app.ingestion import PAGE_SIZE
+from app.player import extrapolated_progress
+
+MIN_INTERVAL_SECONDS = int(os.getenv("INGEST_MIN_INTERVAL_SECONDS", "60"))
+MAX_INTERVAL_SECONDS = int(os.getenv("INGEST_MAX_INTERVAL_MINUTES", "25")) * 60
+MIN_PLAY_SECONDS = 30
+CEILING_SECONDS = PAGE_SIZE * MIN_PLAY_SECONDS
+# Spotify needs a moment before a finished track appears in recently-played
+TRACK_END_GRACE_SECONDS = 15
+# An account counts as active this long after its last new listen
+ACTIVE_WINDOW = timedelta(minutes=int(os.getenv("ACTIVE_WINDOW_MINUTES", "30")))
+
+def _is_playing(state: Optional[Dict[str, Any]]) -> bool:
+    return bool(state and state.get("is_playing") and state.get("item"))
+
+def _item_uri(state: Optional[Dict[str, Any]]) -> Optional[str]:
+    return ((state or {}).get("item") or {}).get("uri")
+
+class AdaptiveIngest:
+    """Ingest schedule of one account. Only computes delays, app/ingest_pool.py runs them."""
+
+    def __init__(self):
+        self.idle_runs = 0
+        self.player_state: Optional[Dict[str, Any]] = None
+        self.player_fetched_at: Optional[datetime] = None
+        self.last_run: Optional[datetime] = None
+        self.last_new_listens: Optional[datetime] = None
+
+    def clamp(self, delay: float) -> float:
+        return max(MIN_INTERVAL_SECONDS, min(delay, MAX_INTERVAL_SECONDS, CEILING_SECONDS))
+
+    def until_track_end(self) -> Optional[float]:
+        """Seconds until the current track ends (plus grace), None if nothing is playing."""
+        state = self.player_state
+        if not _is_playing(state) or self.player_fetched_at is None:
+            return None
+        duration = state["item"].get("duration_ms")
+        progress = extrapolated_progress(state, self.player_fetched_at, datetime.now(timezone.utc))
+        if not duration or progress is None:
+            return None
+        return max(duration - progress, 0) / 1000 + TRACK_END_GRACE_SECONDS
+
+    def is_active(self) -> bool:
+        """Playing, or listened recently enough that playback may continue. Only active players are polled."""
+        if _is_playing(self.player_state):
+            return True
+        return bool(self.last_new_listens and datetime.now(timezone.utc) - self.last_new_listens < ACTIVE_WINDOW)
+
+    def after_run(self, new_listens: Optional[int]) -> float:
+        """Delay until the next run. new_listens is None if the run failed, failures back off like idle runs."""
+        now = datetime.now(timezone.utc)
+        self.last_run = now
+        if new_listens:
+            self.idle_runs = 0
+            self.last_new_listens = now
+        else:
+            self.idle_runs += 1
+
+        track_end = self.until_track_end()
+        if track_end is not None:
+            return self.clamp(track_end)
+        if new_listens:
+            return self.clamp(MIN_INTERVAL_SECONDS)
+        return self.clamp(MIN_INTERVAL_SECONDS * 2 ** min(self.idle_runs, 16))
+
+    def on_player_poll(self, result: Optional[Dict[str, Any]]) -> Optional[float]:
+        """
+        Takes a player poll result (see app.player.poll_player_state) and returns the delay
+        the next ingest should be pulled forward to, None to keep the current plan.
+        """
+        if result is None:
+            return None
+        self.player_state = result["state"]
+        self.player_fetched_at = datetime.now(timezone.utc)
+        if not result["changed"]:
+            return None
+
+        previous, state = result["previous"], result["state"]
+        if _is_playing(previous) and (_item_uri(previous) != _item_uri(state) or not _is_playing(state)):
+            # The previous track ended (or was skipped) and is about to show up in recently-played.
+            # Skipping through tracks still doesn't ingest more often than the minimum interval.
+            since_last_run = (datetime.now(timezone.utc) - self.last_run).total_seconds() if self.last_run else MIN_INTERVAL_SECONDS
+            self.idle_runs = 0
+            return max(TRACK_END_GRACE_SECONDS, MIN_INTERVAL_SECONDS - since_last_run)
+        if _is_playing(state):
+            # Playback started: stop backing off, ingest when the track is done
+            self.idle_runs = 0
+            return self.clamp(self.until_track_end() or MIN_INTERVAL_SECONDS)
+        return None
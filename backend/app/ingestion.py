@@ -1,60 +1,42 @@
 import logging
-from datetime import datetime
-from typing import Dict, Any
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 
 import requests
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
 
 from app.database import SessionLocal
 from app.models import (
-    Artist, Album, Track, Listen,
+    Artist, Album, Track, Listen, IngestionState,
+    track_artists, album_artists, track_album,
 )
-from app.utils.spotify import get_valid_spotify_token
+from app.listen_events import notify_new_listens
+from app.rollups import apply_new_listens, apply_new_links
+from app.utils import spotify_client
+from app.utils.enrichment_queue import enqueue_missing_images
+from app.utils.key_cache import dimension_keys
+from app.utils.payload_archive import archive_payloads
+from app.utils.rate_governor import PRIORITY_INGESTION
+from app.utils.run_ledger import RunRecorder
+from app.utils.spotify import get_valid_spotify_token, invalidate_spotify_token
+from app.utils.users import resolve_user_id
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_or_create(session, model, defaults=None, cache=None, **kwargs):
-    if cache:
-        spotify_id = kwargs.get('spotify_id')
-        if spotify_id:
-            cache_key = (model, spotify_id)
-            if cache_key in cache:
-                return cache[cache_key], False
-
-    instance = session.query(model).filter_by(**kwargs).first()
-    if instance:
-        if cache:
-            spotify_id = kwargs.get('spotify_id')
-            if spotify_id:
-                cache_key = f"{model.__name__}_{spotify_id}"
-                cache[cache_key] = instance
-        return instance, False
-    
-    params = {k: v for k, v in kwargs.items() if not isinstance(v, (list, tuple, dict, Session))}
-    params.update(defaults or {})
-    instance = model(**params)
-    session.add(instance)
-    
-    if cache:
-        spotify_id = kwargs.get('spotify_id')
-        if spotify_id:
-            cache_key = f"{model.__name__}_{spotify_id}"
-            cache[cache_key] = instance
-        
-    session.flush()
-
-    return instance, True
+PAGE_SIZE = 50
+MAX_PAGES = 20
 
 def get_image_qualities(images: list):
     if not images:
         return None, None, None
-    
+
     sorted_images = sorted(images, key=lambda img: img.get('height', 0))
     small = sorted_images[0].get('url')
     large = sorted_images[-1].get('url')
-    
+
     medium = small
     if len(sorted_images) >= 3:
         medium = sorted_images[1].get('url')
@@ -72,150 +54,330 @@ def parse_date(date_str: str, precision: str):
         return datetime.strptime(date_str, "%Y-%m-%d").date()
     return None
 
-def process_item(db: Session, item: Dict[str, Any], created_cache: dict):
-    try:
-        raw_track = item.get("track", {})
-        raw_album = raw_track.get("album", {})
-        raw_context = item.get("context", {})
-        played_at_str = item.get("played_at")
-
-        # 1. Parse Timestamp
-        played_at = datetime.fromisoformat(played_at_str.replace("Z", "+00:00")) # type: ignore
-
-        # 3. Process Artists
-        track_artist_ids = []
-        for a in raw_track.get("artists", []):
-            artist, _ = get_or_create(
-                db, 
-                Artist, 
-                spotify_id=a.get("id"), 
-                defaults={"name": a.get("name")},
-                cache=created_cache
-            )
-            track_artist_ids.append(artist)
-
-        album_artist_ids = []
-        for a in raw_album.get("artists", []):
-            artist, _ = get_or_create(
-                db, 
-                Artist, 
-                spotify_id=a.get("id"), 
-                defaults={"name": a.get("name")},
-                cache=created_cache
-            )
-            album_artist_ids.append(artist)
-
-       # 4. Process Album
-        s_sma, s_med, s_lrg = get_image_qualities(raw_album.get("images", []))
-        rel_date = parse_date(raw_album.get("release_date"), raw_album.get("release_date_precision"))
-        
-        album, _ = get_or_create(
-            db, Album, spotify_id=raw_album.get("id"),
-            defaults={
-                "name": raw_album.get("name"),
-                "release_date": rel_date,
-                "release_date_precision": raw_album.get("release_date_precision"),
-                "album_type": raw_album.get("album_type"),
-                "total_tracks": raw_album.get("total_tracks"),
-                "image_url_small": s_sma,
-                "image_url_medium": s_med,
-                "image_url_large": s_lrg,
-            },
-            cache=created_cache
-        )
+def parse_played_at(item: Dict[str, Any]) -> Optional[datetime]:
+    played_at_str = item.get("played_at")
+    if not played_at_str:
+        return None
+    return datetime.fromisoformat(played_at_str.replace("Z", "+00:00"))
 
-        # 5. Process Track
-        t_sma, t_med, t_lrg = get_image_qualities(raw_track.get("images", []))
-        t_sma = t_sma or s_sma
-        t_med = t_med or s_med
-        t_lrg = t_lrg or s_lrg
-
-        duration_seconds = int(raw_track.get("duration_ms", 0) / 1000)
-
-        track, _ = get_or_create(
-            db, Track, spotify_id=raw_track.get("id"),
-            defaults={
-                "name": raw_track.get("name"),
-                "duration": duration_seconds,
-                "image_url_small": t_sma,
-                "image_url_medium": t_med,
-                "image_url_large": t_lrg,
-            },
-            cache=created_cache
-        )
+def new_batch() -> Dict[str, Any]:
+    """
+    Empty in-memory batch. Dimensions are keyed by spotify_id, links are
+    (spotify_id, spotify_id) pairs and listens are keyed by (track spotify_id, played_at).
+    """
+    return {
+        "artists": {},
+        "albums": {},
+        "tracks": {},
+        "track_artists": set(),
+        "album_artists": set(),
+        "track_album": set(),
+        "listens": {},
+        "failed": 0,
+    }
 
-        # Track ↔ Artists
-        for artist in track_artist_ids:
-            if artist not in track.artists:
-                track.artists.append(artist)
+def normalize_item(batch: Dict[str, Any], item: Dict[str, Any]):
+    """
+    Adds one recently-played item to the batch.
+    Everything is parsed before the batch is touched, so a broken item never leaves partial rows behind.
+    """
+    raw_track = item.get("track") or {}
+    raw_album = raw_track.get("album") or {}
+    raw_context = item.get("context") or {}
 
-        # Album ↔ Artists
-        for artist in album_artist_ids:
-            if artist not in album.artists:
-                album.artists.append(artist)
+    if not raw_track.get("id") or not raw_album.get("id"):
+        raise ValueError(f"Item without Spotify IDs (local file?): {raw_track.get('name')}")
 
-        # Track ↔ Album
-        if album not in track.albums:
-            track.albums.append(album)
+    # 1. Parse Timestamp
+    played_at = parse_played_at(item)
 
+    # 2. Artists
+    track_artist_rows = [
+        {"spotify_id": a["id"], "name": a.get("name")}
+        for a in raw_track.get("artists", []) if a.get("id")
+    ]
+    album_artist_rows = [
+        {"spotify_id": a["id"], "name": a.get("name")}
+        for a in raw_album.get("artists", []) if a.get("id")
+    ]
 
-        # 7. Create Listen
-        new_listen = Listen(
-            track_id=track.track_id,
-            played_at=played_at,
-            context_type=raw_context.get("type")
-        )
-        db.add(new_listen)
+    # 3. Album
+    s_sma, s_med, s_lrg = get_image_qualities(raw_album.get("images", []))
+    album_row = {
+        "spotify_id": raw_album["id"],
+        "name": raw_album.get("name"),
+        "release_date": parse_date(raw_album.get("release_date"), raw_album.get("release_date_precision")),
+        "release_date_precision": raw_album.get("release_date_precision"),
+        "album_type": raw_album.get("album_type"),
+        "total_tracks": raw_album.get("total_tracks"),
+        "image_url_small": s_sma,
+        "image_url_medium": s_med,
+        "image_url_large": s_lrg,
+    }
 
-        logger.info(f"Inserted: {track.name}")
+    # 4. Track
+    t_sma, t_med, t_lrg = get_image_qualities(raw_track.get("images", []))
+    track_row = {
+        "spotify_id": raw_track["id"],
+        "name": raw_track.get("name"),
+        "duration": int(raw_track.get("duration_ms", 0) / 1000),
+        "image_url_small": t_sma or s_sma,
+        "image_url_medium": t_med or s_med,
+        "image_url_large": t_lrg or s_lrg,
+    }
 
-    except Exception as e:
-        logger.error(f"Error processing item: {e}")
-        db.rollback()
+    # 5. Merge into batch
+    for row in track_artist_rows + album_artist_rows:
+        batch["artists"].setdefault(row["spotify_id"], row)
+    batch["albums"].setdefault(album_row["spotify_id"], album_row)
+    batch["tracks"].setdefault(track_row["spotify_id"], track_row)
+
+    for row in track_artist_rows:
+        batch["track_artists"].add((track_row["spotify_id"], row["spotify_id"]))
+    for row in album_artist_rows:
+        batch["album_artists"].add((album_row["spotify_id"], row["spotify_id"]))
+    batch["track_album"].add((track_row["spotify_id"], album_row["spotify_id"]))
+
+    if played_at is not None:
+        batch["listens"].setdefault((track_row["spotify_id"], played_at), {
+            "played_at": played_at,
+            "context_type": raw_context.get("type"),
+        })
 
-def ingest_recent_listens():
+def normalize_items(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Normalizes a whole batch of recently-played items in memory."""
+    batch = new_batch()
+    for item in items:
+        try:
+            normalize_item(batch, item)
+        except Exception as e:
+            batch["failed"] += 1
+            logger.error(f"Error normalizing item: {e}")
+    return batch
+
+def upsert_dimension(db: Session, model, rows: Dict[str, dict]):
     """
-    Fetches data from Spotify API and processes it.
+    Inserts all unknown rows of a dimension in one statement and resolves every spotify_id to its primary key.
+    Keys already in the process-wide key cache cost no query at all.
+    Returns (keys, created) where created holds the primary keys of newly inserted rows.
     """
-    db: Session = SessionLocal()
-    
-    try:
-        logger.info("Fetching valid Spotify token...")
-        token = get_valid_spotify_token(db)
-        
-        logger.info("Starting Spotify Ingestion...")
-        url = "https://api.spotify.com/v1/me/player/recently-played?limit=50"
-        
-        response = requests.get( # type: ignore
-            url,
-            headers={"Authorization": f"Bearer {token}"}
+    if not rows:
+        return {}, set()
+
+    table = model.__table__
+    pk = list(table.primary_key.columns)[0]
+
+    keys = dimension_keys[model].get_many(rows)
+    unknown = [spotify_id for spotify_id in sorted(rows) if spotify_id not in keys]
+    if not unknown:
+        return keys, set()
+
+    # Sorted so concurrent writers always lock rows in the same order
+    stmt = (
+        pg_insert(table)
+        .values([rows[spotify_id] for spotify_id in unknown])
+        .on_conflict_do_nothing(index_elements=[table.c.spotify_id])
+        .returning(table.c.spotify_id, pk)
+    )
+    inserted = {spotify_id: key for spotify_id, key in db.execute(stmt)}
+    keys.update(inserted)
+
+    missing = [spotify_id for spotify_id in unknown if spotify_id not in inserted]
+    if missing:
+        existing = db.execute(select(table.c.spotify_id, pk).where(table.c.spotify_id.in_(missing)))
+        keys.update({spotify_id: key for spotify_id, key in existing})
+
+    return keys, set(inserted.values())
+
+def insert_links(db: Session, table, left_col: str, right_col: str, pairs, left_keys: dict, right_keys: dict) -> List[tuple]:
+    """Inserts association rows, skipping the ones that already exist. Returns the inserted (left, right) pairs."""
+    values = sorted({(left_keys[l], right_keys[r]) for l, r in pairs if l in left_keys and r in right_keys})
+    if not values:
+        return []
+
+    stmt = (
+        pg_insert(table)
+        .values([{left_col: l, right_col: r} for l, r in values])
+        .on_conflict_do_nothing()
+        .returning(table.c[left_col], table.c[right_col])
+    )
+    return [tuple(row) for row in db.execute(stmt)]
+
+def write_batch(db: Session, batch: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Writes a normalized batch with a constant number of statements. Listens are written for user_id
+    and added to the listening aggregates (app/rollups.py) in the same transaction.
+    Does not commit, the caller owns the transaction and calls remember_batch_keys after committing.
+    """
+    artist_keys, new_artists = upsert_dimension(db, Artist, batch["artists"])
+    album_keys, new_albums = upsert_dimension(db, Album, batch["albums"])
+    track_keys, new_tracks = upsert_dimension(db, Track, batch["tracks"])
+    batch["keys"] = {Artist: artist_keys, Album: album_keys, Track: track_keys}
+
+    # Artists embedded in track objects come without images, tracks and albums may lack them too.
+    # Queued here for everything the batch touches, so reads never have to write.
+    enqueue_missing_images(db, "artist", artist_keys.values())
+    enqueue_missing_images(db, "album", album_keys.values())
+    enqueue_missing_images(db, "track", track_keys.values())
+
+    new_track_artists = insert_links(db, track_artists, "track_id", "artist_id", batch["track_artists"], track_keys, artist_keys)
+    insert_links(db, album_artists, "album_id", "artist_id", batch["album_artists"], album_keys, artist_keys)
+    new_track_albums = insert_links(db, track_album, "track_id", "album_id", batch["track_album"], track_keys, album_keys)
+    # Tracks listened to before they were linked (imported ones) count for their artists and albums from now on.
+    # Listens of this batch are inserted below and counted through the links then.
+    apply_new_links(db, "artist", new_track_artists)
+    apply_new_links(db, "album", new_track_albums)
+
+    new_listens = []
+    if batch["listens"] and user_id is None:
+        raise ValueError("Listens need a user_id")
+    listen_rows = [
+        {"user_id": user_id, "track_id": track_keys[track_sid], **row}
+        for (track_sid, _), row in sorted(batch["listens"].items(), key=lambda kv: kv[1]["played_at"])
+        if track_sid in track_keys
+    ]
+    if listen_rows:
+        stmt = (
+            pg_insert(Listen.__table__)
+            .values(listen_rows)
+            .on_conflict_do_nothing(constraint="uq_listen_user_track_played_at")
+            .returning(Listen.__table__.c.listen_id)
         )
+        new_listens = [row.listen_id for row in db.execute(stmt)]
+        apply_new_listens(db, new_listens)
+
+    return {
+        "listen_ids": new_listens,
+        "listens_new": len(new_listens),
+        "listens_duplicate": len(listen_rows) - len(new_listens),
+        "artists_new": len(new_artists),
+        "albums_new": len(new_albums),
+        "tracks_new": len(new_tracks),
+        "links_new": len(new_track_artists) + len(new_track_albums),
+    }
+
+def get_ingestion_state(db: Session, user_id: int) -> IngestionState:
+    state = db.query(IngestionState).filter(IngestionState.user_id == user_id).first()
+    if state is None:
+        state = IngestionState(user_id=user_id)
+        db.add(state)
+    return state
+
+def fetch_recent_pages(token: str, watermark: Optional[datetime], user_id: int) -> List[Dict[str, Any]]:
+    """
+    Fetches everything played after the watermark and returns the raw response pages.
+    Follows cursors.after as long as Spotify returns full pages.
+    """
+    params = {"limit": PAGE_SIZE}
+    if watermark is not None:
+        params["after"] = int(watermark.timestamp() * 1000)
+
+    pages = []
+    for _ in range(MAX_PAGES):
+        response = spotify_client.get("/me/player/recently-played", token, endpoint="recently-played", params=params,
+                                      priority=PRIORITY_INGESTION)
+        if response.status_code == 401:
+            invalidate_spotify_token(user_id)
         response.raise_for_status()
         data = response.json()
-        items = data.get("items", [])
+        pages.append(data)
+        page = data.get("items", [])
+
+        cursor = (data.get("cursors") or {}).get("after")
+        if len(page) < PAGE_SIZE or not cursor or int(cursor) <= params.get("after", 0):
+            break
+        params["after"] = int(cursor)
+
+    return pages
+
+def remember_batch_keys(batch: Dict[str, Any]):
+    """Puts the keys resolved by write_batch into the key cache. Only call this after the commit."""
+    for model, keys in batch.get("keys", {}).items():
+        dimension_keys[model].put_many(keys)
+
+def ingest_recent_listens(user_id: Optional[int] = None) -> Optional[int]:
+    """
+    Fetches data from Spotify API and processes it for one account (the first account if None).
+    Returns the number of new listens, None on failure.
+    Only items newer than the stored watermark are processed. The whole batch is
+    normalized in memory and written in a single transaction together with the new watermark.
+    Every run that found new items or failed is recorded in ingestion_runs, idle runs write nothing.
+    """
+    db: Session = SessionLocal()
+    recorder = RunRecorder(user_id)
 
-        if not items:
+    try:
+        if user_id is None:
+            user_id = resolve_user_id(db, None)
+            recorder.run.user_id = user_id # type: ignore
+
+        with recorder.stage("token"):
+            token = get_valid_spotify_token(db, user_id)
+
+        state = get_ingestion_state(db, user_id)
+        watermark = state.last_played_at
+
+        logger.info(f"Starting Spotify Ingestion of user {user_id} after {watermark}...")
+        with recorder.stage("fetch"):
+            pages = fetch_recent_pages(token, watermark, user_id) # type: ignore
+        archive_payloads(pages, user_id)
+        items = [item for page in pages for item in page.get("items", [])]
+
+        with recorder.stage("normalize"):
+            new_items = []
+            for item in items:
+                try:
+                    played_at = parse_played_at(item)
+                except ValueError:
+                    played_at = None
+                if watermark is None or (played_at is not None and played_at > watermark):
+                    new_items.append(item)
+            batch = normalize_items(new_items)
+
+        recorder.count(items_fetched=len(items))
+        if not new_items:
             logger.info("No new listens found.")
-            return
-
-        created_cache = {}
-        for item in items:
-            try:
-                process_item(db, item, created_cache)
-                db.commit()
-            except IntegrityError:
-                db.rollback()
-                logger.info("Duplicate listen skipped")
-            except Exception as e:
-                db.rollback()
-                logger.error(f"Error processing item: {e}")
-
-        logger.info(f"Successfully processed {len(items)} items.")
+            db.rollback()
+            return 0
+
+        with recorder.stage("write"):
+            stats = write_batch(db, batch, user_id)
+            notify_new_listens(db, user_id, stats["listen_ids"])
+
+            played = [row["played_at"] for row in batch["listens"].values()]
+            if played:
+                state.last_played_at = max(played + ([watermark] if watermark else [])) # type: ignore
+                state.updated_at = datetime.now(timezone.utc) # type: ignore
+            db.commit()
+        remember_batch_keys(batch)
+
+        # Everything fetched is either new, a duplicate (watermark, within the batch or already stored) or failed
+        recorder.count(
+            items_new=stats["listens_new"],
+            items_duplicate=len(items) - batch["failed"] - stats["listens_new"],
+            items_failed=batch["failed"],
+            artists_new=stats["artists_new"],
+            albums_new=stats["albums_new"],
+            tracks_new=stats["tracks_new"],
+        )
+        recorder.save("success")
+
+        logger.info(
+            f"Processed {len(new_items)} of {len(items)} fetched items: {stats['listens_new']} new, "
+            f"{stats['listens_duplicate']} duplicates, {batch['failed']} failed."
+        )
+        return stats["listens_new"]
 
     except requests.exceptions.RequestException as e: # type: ignore
         logger.error(f"Failed to fetch from Spotify: {e}")
+        db.rollback()
+        recorder.fail(e)
+        recorder.save()
     except Exception as e:
         logger.critical(f"Unexpected error during ingestion: {e}")
         db.rollback()
+        recorder.fail(e)
+        recorder.save()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+    return None
@@ -0,0 +1,179 @@
+"""
+"New listens committed" events.
+
+Writers call notify_new_listens inside their transaction; Postgres delivers the
+NOTIFY on commit, so subscribers never see listens that were rolled back. Every
+insert is logged in listen_batches under the data version it committed with
+(see app/data_version.py), versions count up in commit order. The NOTIFY payload
+only names the version (payloads are capped at 8000 bytes), the API's event hub
+loads the batch once and fans it out to every GET /listens/stream subscriber.
+
+"<version>:<listen_id>" is the SSE event id. A client resuming with Last-Event-ID
+gets every listen committed after it, in commit order, even listens with a lower
+listen_id that committed later. Gaps of more than RESUME_LIMIT listens, or older
+than the retained batches, are not replayed: the client gets a 'reset' event and
+refetches instead.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.orm import Session, joinedload
+
+from app.data_version import next_version
+from app.database import SessionLocal
+from app.models import Listen, ListenBatch, Track
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "listens"
+# Listens replayed to a resuming client at most, longer gaps need a full refresh
+RESUME_LIMIT = 500
+# Days batches are kept for resuming clients, 0 keeps them forever
+BATCH_RETENTION_DAYS = int(os.getenv("LISTEN_BATCH_RETENTION_DAYS", "7"))
+
+# (version, listen_id) of the last listen a client or the hub has seen
+Cursor = Tuple[int, int]
+
+_last_seen: Optional[Cursor] = None
+
+def notify_new_listens(db: Session, user_id: int, listen_ids: List[int]):
+    """Announces inserted listens of an account. Delivered when the caller's transaction commits."""
+    if not listen_ids:
+        return
+    # New listens change the analytics as well, the version orders the batches by commit
+    version = next_version(db)
+    db.execute(insert(ListenBatch).values(
+        version=version, user_id=user_id, listen_ids=sorted(listen_ids), created_at=datetime.now(timezone.utc),
+    ))
+    payload = {"user_id": user_id, "version": version, "count": len(listen_ids)}
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": json.dumps(payload)})
+
+def event_id(cursor: Cursor) -> str:
+    return f"{cursor[0]}:{cursor[1]}"
+
+def parse_event_id(value: Optional[str]) -> Optional[Cursor]:
+    """Cursor of a Last-Event-ID, None if it isn't one of ours."""
+    version, separator, listen_id = (value or "").partition(":")
+    if not separator or not version.isdigit() or not listen_id.isdigit():
+        return None
+    return int(version), int(listen_id)
+
+def reset_event(cursor: Optional[Cursor]) -> Dict[str, Any]:
+    """Sent instead of listens that can't be replayed, resuming continues after cursor."""
+    return {"reset": True, "event_id": event_id(cursor) if cursor else None}
+
+def format_listen(listen: Listen) -> Dict[str, Any]:
+    """Same shape as the items of GET /listens/recent."""
+    track = listen.track
+    return {
+        "listen_id": listen.listen_id,
+        "user_id": listen.user_id,
+        "track_id": listen.track_id,
+        "played_at": listen.played_at.isoformat(),
+        "track_name": track.name if track else "Unknown Track",
+        "artist_names": ", ".join(artist.name for artist in track.artists) if track and track.artists else "Unknown Artist",
+        "cover_url": track.image_url_small if track else None,
+    }
+
+def _positions(batches: List[ListenBatch], after: Optional[Cursor]) -> List[Cursor]:
+    return [
+        (batch.version, listen_id)
+        for batch in batches for listen_id in batch.listen_ids
+        if after is None or (batch.version, listen_id) > after
+    ]
+
+def _load(db: Session, positions: List[Cursor]) -> List[Dict[str, Any]]:
+    """Listens at the positions in that order, each with its event id. Deleted listens are left out."""
+    if not positions:
+        return []
+    listens = {
+        listen.listen_id: listen
+        for listen in db.query(Listen)
+        .options(joinedload(Listen.track).selectinload(Track.artists))
+        .filter(Listen.listen_id.in_([listen_id for _, listen_id in positions]))
+        .all()
+    }
+    return [
+        {**format_listen(listens[listen_id]), "event_id": event_id((version, listen_id))}
+        for version, listen_id in positions if listen_id in listens
+    ]
+
+def load_batch(db: Session, version: int) -> List[Dict[str, Any]]:
+    batch = db.get(ListenBatch, version)
+    return _load(db, _positions([batch], None)) if batch else []
+
+def load_since(db: Session, after: Cursor, user_id: Optional[int] = None, limit: int = RESUME_LIMIT) -> Optional[List[Dict[str, Any]]]:
+    """
+    Listens committed after the cursor in commit order, of one account or all. None if they
+    can't be replayed: more than limit of them, or the cursor's batch was purged already.
+    """
+    if db.get(ListenBatch, after[0]) is None:
+        return None
+    query = db.query(ListenBatch).filter(ListenBatch.version >= after[0])
+    if user_id is not None:
+        query = query.filter(ListenBatch.user_id == user_id)
+    # Every batch after the cursor's holds at least one listen
+    positions = _positions(query.order_by(ListenBatch.version).limit(limit + 2).all(), after)
+    if len(positions) > limit:
+        return None
+    return _load(db, positions)
+
+def latest_cursor(db: Session, user_id: Optional[int] = None) -> Optional[Cursor]:
+    query = db.query(ListenBatch)
+    if user_id is not None:
+        query = query.filter(ListenBatch.user_id == user_id)
+    batch = query.order_by(ListenBatch.version.desc()).first()
+    return (batch.version, max(batch.listen_ids)) if batch else None
+
+def on_notify(payload: str) -> Optional[List[Dict[str, Any]]]:
+    """Event hub handler: loads the announced listens once for all subscribers."""
+    global _last_seen
+    info = json.loads(payload)
+    db = SessionLocal()
+    try:
+        rows = load_batch(db, info["version"])
+    finally:
+        db.close()
+    if rows:
+        _last_seen = max(_last_seen or (0, 0), parse_event_id(rows[-1]["event_id"]))  # type: ignore
+    return rows or None
+
+def on_reconnect() -> Optional[List[Dict[str, Any]]]:
+    """Event hub reconnect handler: sends whatever was committed while the connection was down."""
+    global _last_seen
+    db = SessionLocal()
+    try:
+        if _last_seen is None:
+            _last_seen = latest_cursor(db)
+            return None
+        rows = load_since(db, _last_seen)
+        if rows is None:
+            # Too much to push to every subscriber, their clients refetch instead
+            _last_seen = latest_cursor(db)
+            return [reset_event(_last_seen)]
+    finally:
+        db.close()
+    if rows:
+        _last_seen = parse_event_id(rows[-1]["event_id"])
+    return rows or None
+
+def purge_old_batches():
+    """Deletes batches older than LISTEN_BATCH_RETENTION_DAYS, clients resuming from them get a reset."""
+    if not BATCH_RETENTION_DAYS:
+        return
+    db = SessionLocal()
+    try:
+        result = db.execute(delete(ListenBatch).where(
+            ListenBatch.created_at < datetime.now(timezone.utc) - timedelta(days=BATCH_RETENTION_DAYS)
+        ))
+        db.commit()
+        logger.info(f"Purged {result.rowcount} listen batches")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not purge listen batches: {e}")
+    finally:
+        db.close()
@@ -1,17 +1,32 @@
-from datetime import timezone
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 import os
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.ingestion import ingest_recent_listens
-from app.routers import listens, albums, artists, database_stats, timezone, tracks, top, playing, auth
+from app import player, listen_events, data_version
+from app.events import hub
+from app.utils.response_cache import cache_responses
+from app.routers import listens, albums, artists, database_stats, timezone, tracks, top, playing, auth, ingestion, dashboard
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fan-out of worker notifications (player changes, new listens) to this process' clients
+    hub.register(player.CHANNEL, player.on_notify, player.on_reconnect)
+    hub.register(listen_events.CHANNEL, listen_events.on_notify, listen_events.on_reconnect)
+    # Cached analytics responses are outdated by new listens and any other data change
+    hub.watch(listen_events.CHANNEL, data_version.bump)
+    hub.watch(data_version.CHANNEL, data_version.bump)
+    hub.start()
+    yield
+    hub.stop()
+
+# Scheduled jobs (ingestion, enrichment, player polling) run in the worker process, see app/worker.py.
+app = FastAPI(lifespan=lifespan)
+
+# Added before CORS so cached responses still pass through it
+app.middleware("http")(cache_responses)
 
-app = FastAPI()
-
-INGEST_INTERVAL_MINUTES = int(os.getenv("INGEST_INTERVAL_MINUTES", "10"))
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://127.0.0.1:3000,http://localhost:5173")
 
 app.add_middleware(
@@ -24,30 +39,6 @@ app.add_middleware(
 
 logging.basicConfig(level=logging.INFO)
 
-scheduler = BackgroundScheduler()
-
-@app.on_event("startup")
-def startup_event():
-    logger = logging.getLogger("uvicorn")
-    logger.info("Starting Scheduler...")
-    
-    scheduler.add_job(
-        func=ingest_recent_listens,
-        trigger=IntervalTrigger(minutes=INGEST_INTERVAL_MINUTES),
-        id='spotify_ingest_job',
-        name='Ingest Spotify Listens',
-        replace_existing=True
-    )
-    
-    scheduler.start()
-    logger.info(f"Scheduler started. Ingesting every {INGEST_INTERVAL_MINUTES} minutes.")
-
-@app.on_event("shutdown")
-def shutdown_event():
-    logger = logging.getLogger("uvicorn")
-    logger.info("Stopping Scheduler...")
-    scheduler.shutdown()
-
 app.include_router(listens.router)
 app.include_router(albums.router)
 app.include_router(artists.router)
@@ -57,4 +48,5 @@ app.include_router(tracks.router)
 app.include_router(top.router)
 app.include_router(playing.router)
 app.include_router(auth.router)
-
+app.include_router(ingestion.router)
+app.include_router(dashboard.router)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, DateTime, Date, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, DateTime, Date, Float, Text, LargeBinary, Boolean, UniqueConstraint, Index, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -7,14 +8,18 @@ track_album = Table(
     'track_album',
     Base.metadata,
     Column('track_id', ForeignKey('tracks.track_id'), primary_key=True),
-    Column('album_id', ForeignKey('albums.album_id'), primary_key=True)
+    Column('album_id', ForeignKey('albums.album_id'), primary_key=True),
+    # Reverse key: album -> tracks
+    Index('ix_track_album_album_track', 'album_id', 'track_id'),
 )
 
 track_artists = Table(
     'track_artists',
     Base.metadata,
     Column('track_id', ForeignKey('tracks.track_id'), primary_key=True),
-    Column('artist_id', ForeignKey('artists.artist_id'), primary_key=True)
+    Column('artist_id', ForeignKey('artists.artist_id'), primary_key=True),
+    # Reverse key: artist -> tracks
+    Index('ix_track_artists_artist_track', 'artist_id', 'track_id'),
 )
 
 album_artists = Table(
@@ -73,18 +78,31 @@ class Track(Base):
     artists = relationship("Artist", secondary=track_artists, back_populates="tracks")
     albums = relationship("Album", secondary=track_album, back_populates="tracks")
 
+class User(Base):
+    __tablename__ = 'users'
+    user_id = Column(Integer, primary_key=True, index=True)
+    spotify_user_id = Column(String, unique=True, nullable=True)
+    display_name = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
 class Listen(Base):
     __tablename__ = 'listens'
 
     __table_args__ = (
         UniqueConstraint(
+            "user_id",
             "track_id",
             "played_at",
-            name="uq_listen_track_played_at"
+            name="uq_listen_user_track_played_at"
         ),
+        # Range scans of an account, covering the track so per-entity counts don't visit the heap
+        Index("ix_listens_user_played_at", "user_id", "played_at", postgresql_include=["track_id"]),
+        # Aggregate maintenance looks up the listens of tracks whose links or duration change
+        Index("ix_listens_track_id", "track_id"),
     )
 
     listen_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
     track_id = Column(Integer, ForeignKey('tracks.track_id'), nullable=False)
     played_at = Column(DateTime(timezone=True), nullable=False)
     context_type = Column(String, nullable=True)
@@ -94,7 +112,141 @@ class Listen(Base):
 class SpotifyToken(Base):
     __tablename__ = 'spotify_tokens'
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), unique=True, nullable=False)
     access_token = Column(String, nullable=False)
     refresh_token = Column(String, nullable=False)
     token_type = Column(String, default="Bearer")
-    expires_at = Column(DateTime, nullable=False)
\ No newline at end of file
+    expires_at = Column(DateTime, nullable=False)
+
+class IngestionState(Base):
+    __tablename__ = 'ingestion_state'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), unique=True, nullable=False)
+    last_played_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
+class ImportFile(Base):
+    __tablename__ = 'import_files'
+    id = Column(Integer, primary_key=True, index=True)
+    file_hash = Column(String, unique=True, nullable=False)
+    file_name = Column(String, nullable=False)
+    entries_done = Column(Integer, nullable=False, default=0)
+    listens_imported = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+class EnrichmentQueue(Base):
+    __tablename__ = 'enrichment_queue'
+    entity_type = Column(String, primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    enqueued_at = Column(DateTime(timezone=True), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+
+class IngestionRun(Base):
+    __tablename__ = 'ingestion_runs'
+    run_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=True, index=True)
+    started_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    status = Column(String, nullable=False)
+
+    token_seconds = Column(Float, nullable=False, default=0)
+    fetch_seconds = Column(Float, nullable=False, default=0)
+    normalize_seconds = Column(Float, nullable=False, default=0)
+    write_seconds = Column(Float, nullable=False, default=0)
+
+    items_fetched = Column(Integer, nullable=False, default=0)
+    items_new = Column(Integer, nullable=False, default=0)
+    items_duplicate = Column(Integer, nullable=False, default=0)
+    items_failed = Column(Integer, nullable=False, default=0)
+
+    artists_new = Column(Integer, nullable=False, default=0)
+    albums_new = Column(Integer, nullable=False, default=0)
+    tracks_new = Column(Integer, nullable=False, default=0)
+
+    error = Column(Text, nullable=True)
+
+class RawPayload(Base):
+    __tablename__ = 'raw_payloads'
+    payload_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=True, index=True)
+    fetched_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    first_played_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    last_played_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    item_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # zstd compressed JSON response
+
+class SpotifyRateLimit(Base):
+    __tablename__ = 'spotify_rate_limit'
+    id = Column(Integer, primary_key=True, index=True)
+    blocked_until = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+
+class DataVersion(Base):
+    __tablename__ = 'data_version'
+    id = Column(Integer, primary_key=True)  # single row
+    version = Column(BigInteger, nullable=False)  # see app/data_version.py
+
+# Committed listen inserts in commit order, so SSE clients can resume where they stopped (see app/listen_events.py)
+class ListenBatch(Base):
+    __tablename__ = 'listen_batches'
+    version = Column(BigInteger, primary_key=True)  # data version the insert committed with
+    user_id = Column(Integer, ForeignKey('users.user_id'), nullable=False, index=True)
+    listen_ids = Column(ARRAY(Integer), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class SpotifyResponseCache(Base):
+    __tablename__ = 'spotify_response_cache'
+    cache_key = Column(String, primary_key=True)
+    status = Column(Integer, nullable=False)
+    etag = Column(String, nullable=True)
+    body = Column(JSONB, nullable=True)
+    negative = Column(Boolean, nullable=False, default=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+class PlayerState(Base):
+    __tablename__ = 'player_state'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    state = Column(JSONB, nullable=False)  # last /me/player answer, trimmed
+    fetched_at = Column(DateTime(timezone=True), nullable=False)  # when `state` was fetched
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+    checked_at = Column(DateTime(timezone=True), nullable=False)  # last poll, changed or not
+
+# Plays and listened seconds per account and UTC hour, maintained with every listen insert (see app/rollups.py)
+class ListenHourly(Base):
+    __tablename__ = 'listen_hourly'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    play_count = Column(Integer, nullable=False, default=0)
+    duration_seconds = Column(BigInteger, nullable=False, default=0)
+
+# Plays per account, entity (track, artist or album) and UTC period, maintained with every listen insert (see app/rollups.py).
+# period is day, week (starting Monday), month, year or all (period_start 1970-01-01); top-N of one period is an index scan.
+class EntityPlays(Base):
+    __tablename__ = 'entity_plays'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    entity_type = Column(String(10), primary_key=True)
+    period = Column(String(10), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+    play_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index('ix_entity_plays_ranked', 'user_id', 'entity_type', 'period', 'period_start', play_count.desc(), 'entity_id'),
+    )
+
+# Calendar days (APP_TIME_ZONE) with listens and the streaks derived from them (see app/rollups.py)
+class ListenDay(Base):
+    __tablename__ = 'listen_days'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    day = Column(Date, primary_key=True)
+    play_count = Column(Integer, nullable=False, default=0)
+
+class ListenStreak(Base):
+    __tablename__ = 'listen_streaks'
+    user_id = Column(Integer, ForeignKey('users.user_id'), primary_key=True)
+    current_start = Column(Date, nullable=False)  # latest run of consecutive days, current while it ends today or yesterday
+    current_end = Column(Date, nullable=False)
+    longest_start = Column(Date, nullable=False)
+    longest_end = Column(Date, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
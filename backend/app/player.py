@@ -0,0 +1,221 @@
+"""
+Player state: one upstream poller, any number of readers.
+
+The worker polls /me/player of active accounts (see app/ingest_pool.py) and keeps
+the latest answer per account in the player_state table. A snapshot is rewritten only when the player actually changed;
+progress that just advanced with playback is not a change, readers extrapolate it
+from fetched_at. Every poll sends a NOTIFY, so API processes keep the snapshot in
+memory (see app/events.py) and never call Spotify per request. Only if nobody polled
+an account for a while does an API process poll it, at most once per poll interval.
+"""
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+import requests
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import PlayerState
+from app.utils import spotify_client
+from app.utils.rate_governor import SpotifyRateLimited
+from app.utils.spotify import get_valid_spotify_token, invalidate_spotify_token
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "player_state"
+POLL_SECONDS = int(os.getenv("PLAYER_POLL_SECONDS", "5"))
+STALE_SECONDS = int(os.getenv("PLAYER_STALE_SECONDS", "30"))
+# Progress further off than this from the extrapolated position means the user seeked
+SEEK_TOLERANCE_MS = 3000
+
+IDLE_STATE = {
+    "is_playing": False,
+    "item": None,
+    "device": {},
+    "shuffle_state": False,
+    "repeat_state": "off",
+}
+
+def trim_state(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Drops the market lists, they are most of the payload and nobody reads them."""
+    data = copy.deepcopy(data)
+    item = data.get("item") or {}
+    item.pop("available_markets", None)
+    (item.get("album") or {}).pop("available_markets", None)
+    return data
+
+def _identity(state: Dict[str, Any]) -> tuple:
+    item = state.get("item") or {}
+    device = state.get("device") or {}
+    context = state.get("context") or {}
+    return (
+        state.get("is_playing"),
+        item.get("uri"),
+        device.get("id"),
+        device.get("volume_percent"),
+        state.get("shuffle_state"),
+        state.get("repeat_state"),
+        context.get("uri"),
+    )
+
+def extrapolated_progress(state: Dict[str, Any], fetched_at: datetime, now: datetime) -> Optional[int]:
+    progress = state.get("progress_ms")
+    if progress is None or not state.get("is_playing"):
+        return progress
+    progress += int((now - fetched_at).total_seconds() * 1000)
+    duration = (state.get("item") or {}).get("duration_ms")
+    return min(progress, duration) if duration else progress
+
+def is_change(old: Dict[str, Any], old_fetched_at: datetime, new: Dict[str, Any], now: datetime) -> bool:
+    if _identity(old) != _identity(new):
+        return True
+    expected = extrapolated_progress(old, old_fetched_at, now)
+    actual = new.get("progress_ms")
+    if expected is None or actual is None:
+        return expected != actual
+    return abs(actual - expected) > SEEK_TOLERANCE_MS
+
+def poll_player_state(user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Fetches /me/player of an account once, stores the snapshot if it changed and notifies the API processes.
+    Returns {"changed", "state", "previous"}, or None if the poll failed.
+    """
+    db: Session = SessionLocal()
+    try:
+        token = get_valid_spotify_token(db, user_id)
+        response = spotify_client.get("/me/player", token, endpoint="player")
+        now = datetime.now(timezone.utc)
+
+        if response.status_code == 200:
+            state = trim_state(response.json())
+        elif response.status_code == 204:
+            state = dict(IDLE_STATE)
+        else:
+            if response.status_code == 401:
+                invalidate_spotify_token(user_id)
+            logger.warning(f"Player poll of user {user_id} failed - StatusCode: {response.status_code}")
+            return None
+
+        row = db.query(PlayerState).filter(PlayerState.user_id == user_id).with_for_update().first()
+        changed = row is None or is_change(row.state, row.fetched_at, state, now)
+        previous = row.state if row is not None else None
+        if row is None:
+            db.add(PlayerState(user_id=user_id, state=state, fetched_at=now, changed_at=now, checked_at=now))
+        elif changed:
+            row.state = state
+            row.fetched_at = now  # type: ignore
+            row.changed_at = now  # type: ignore
+            row.checked_at = now  # type: ignore
+        else:
+            row.checked_at = now  # type: ignore
+
+        # Delivered on commit
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": json.dumps({"user_id": user_id, "changed": changed, "checked_at": now.isoformat()})},
+        )
+        db.commit()
+        if changed:
+            logger.info(f"Player of user {user_id} changed. Playing: {state.get('is_playing')}, Item: {(state.get('item') or {}).get('name')}")
+        return {"changed": changed, "state": state, "previous": previous}
+
+    except SpotifyRateLimited as e:
+        logger.info(f"Player poll deferred: {e}")
+        db.rollback()
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Player poll failed: {e}")
+        db.rollback()
+    except Exception as e:
+        logger.error(f"Unexpected error during player poll: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    return None
+
+# --- Readers (API processes) ---
+
+# user_id -> snapshot
+_snapshots: Dict[int, Dict[str, Any]] = {}
+_refresh_locks: Dict[int, threading.Lock] = {}
+_refresh_locks_lock = threading.Lock()
+_last_fallback_poll: Dict[int, float] = {}  # monotonic
+
+def _refresh_lock(user_id: int) -> threading.Lock:
+    with _refresh_locks_lock:
+        return _refresh_locks.setdefault(user_id, threading.Lock())
+
+def load_snapshot(user_id: int) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        row = db.get(PlayerState, user_id)
+        if row is None:
+            return None
+        snapshot = {
+            "state": row.state,
+            "fetched_at": row.fetched_at,
+            "changed_at": row.changed_at,
+            "checked_at": row.checked_at,
+        }
+        _snapshots[user_id] = snapshot
+        return snapshot
+    finally:
+        db.close()
+
+def public_state(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """The snapshot in the shape of Spotify's /me/player answer, with progress as of now."""
+    state = dict(snapshot["state"])
+    state["progress_ms"] = extrapolated_progress(state, snapshot["fetched_at"], datetime.now(timezone.utc))
+    state["fetched_at"] = snapshot["fetched_at"].isoformat()
+    return state
+
+def is_stale(snapshot: Dict[str, Any]) -> bool:
+    return (datetime.now(timezone.utc) - snapshot["checked_at"]).total_seconds() > STALE_SECONDS
+
+def on_notify(payload: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Event hub handler: reloads a snapshot on changes, otherwise only notes the poll.
+    Publishes [{"user_id", "state"}], subscribers pick their account.
+    """
+    info = json.loads(payload)
+    user_id = info["user_id"]
+    cached = _snapshots.get(user_id)
+    if info.get("changed") or cached is None:
+        snapshot = load_snapshot(user_id)
+        return [{"user_id": user_id, "state": public_state(snapshot)}] if snapshot else None
+    cached["checked_at"] = datetime.fromisoformat(info["checked_at"])
+    return None
+
+def on_reconnect() -> Optional[List[Dict[str, Any]]]:
+    """Reloads every snapshot this process serves, changes may have been missed."""
+    events = []
+    for user_id in list(_snapshots):
+        snapshot = load_snapshot(user_id)
+        if snapshot:
+            events.append({"user_id": user_id, "state": public_state(snapshot)})
+    return events or None
+
+def get_snapshot(user_id: int, listening: bool) -> Optional[Dict[str, Any]]:
+    """
+    Latest snapshot of an account, from memory while the event hub is listening, otherwise from
+    the database. Polls Spotify directly (single-flight per account) only when the worker hasn't
+    polled the account for a while, e.g. because it isn't playing anything.
+    """
+    cached = _snapshots.get(user_id)
+    snapshot = cached if listening and cached is not None else load_snapshot(user_id)
+    if snapshot is not None and not is_stale(snapshot):
+        return snapshot
+
+    with _refresh_lock(user_id):
+        snapshot = load_snapshot(user_id)
+        if (snapshot is None or is_stale(snapshot)) and time.monotonic() - _last_fallback_poll.get(user_id, 0.0) >= POLL_SECONDS:
+            _last_fallback_poll[user_id] = time.monotonic()
+            poll_player_state(user_id)
+            snapshot = load_snapshot(user_id)
+    return snapshot
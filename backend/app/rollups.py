@@ -0,0 +1,614 @@
+"""
+Incrementally maintained listening aggregates.
+
+- listen_hourly: plays and listened seconds per account and UTC hour
+- entity_plays: plays per account, track/artist/album and UTC day, week, month, year
+  and all time
+- listen_days / listen_streaks: calendar days with listens in APP_TIME_ZONE and the
+  latest and longest run of consecutive days per account, recomputed whenever an
+  account gets a new day (changing APP_TIME_ZONE needs a rebuild)
+
+Every writer of listens applies its inserts in the same transaction (apply_new_listens),
+ingestion applies new track-artist/track-album links of already listened tracks
+(apply_new_links) and enrichment applies duration changes (apply_duration_changes).
+Range queries read whole hours (or days) from the aggregates and only scan raw listens
+for the partial hours (or days) at the edges of the range, so they cost the same
+however long the history gets. Series bucket the hourly rollup into local days, weeks,
+months and years on the fly (bucketed_series).
+
+Usage:
+    python -m app.rollups [--user-id ID]
+
+Rebuilds the aggregates from listens, for one account or all of them.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text, func, and_, or_, tuple_, select, union
+from sqlalchemy.orm import Session
+
+from app.data_version import notify_data_changed
+from app.database import SessionLocal
+from app.models import Listen, ListenHourly, EntityPlays, ListenStreak, Track, User, track_artists, track_album
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+# period_start of the all-time counters
+ALL_TIME = date(1970, 1, 1)
+APP_TIME_ZONE = os.getenv("APP_TIME_ZONE", "UTC")
+# Advisory lock class of the streak refresh, the second key is the user_id
+STREAK_LOCK_CLASS = 0x53545245
+
+# UTC hour a listen falls into, independent of the session time zone
+HOUR_BUCKET_SQL = "date_trunc('hour', {} AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+
+ADD_TO_ROLLUP = f"""
+    INSERT INTO listen_hourly (user_id, hour, play_count, duration_seconds)
+    SELECT l.user_id, {HOUR_BUCKET_SQL.format("l.played_at")}, count(*), coalesce(sum(t.duration), 0)
+    FROM {{source}} l
+    JOIN tracks t ON t.track_id = l.track_id
+    {{where}}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (user_id, hour) DO UPDATE SET
+        play_count = listen_hourly.play_count + excluded.play_count,
+        duration_seconds = listen_hourly.duration_seconds + excluded.duration_seconds
+"""
+
+# UTC day of a listen
+DAY_SQL = "({} AT TIME ZONE 'UTC')::date"
+
+# Every period a day counts towards
+PERIODS_SQL = """
+    CROSS JOIN LATERAL (VALUES
+        ('day', {day}),
+        ('week', date_trunc('week', {day})::date),
+        ('month', date_trunc('month', {day})::date),
+        ('year', date_trunc('year', {day})::date),
+        ('all', DATE '1970-01-01')
+    ) AS p(period, period_start)
+"""
+
+ADD_TO_ENTITY_PLAYS = f"""
+    INSERT INTO entity_plays (user_id, entity_type, period, period_start, entity_id, play_count)
+    SELECT e.user_id, e.entity_type, p.period, p.period_start, e.entity_id, count(*)
+    FROM (
+        SELECT l.user_id, 'track' AS entity_type, l.track_id AS entity_id, {DAY_SQL.format("l.played_at")} AS day
+        FROM {{source}} l {{where}}
+        UNION ALL
+        SELECT l.user_id, 'artist', ta.artist_id, {DAY_SQL.format("l.played_at")}
+        FROM {{source}} l JOIN track_artists ta ON ta.track_id = l.track_id {{where}}
+        UNION ALL
+        SELECT l.user_id, 'album', tl.album_id, {DAY_SQL.format("l.played_at")}
+        FROM {{source}} l JOIN track_album tl ON tl.track_id = l.track_id {{where}}
+    ) e
+    {PERIODS_SQL.format(day="e.day")}
+    GROUP BY 1, 2, 3, 4, 5
+    ORDER BY 1, 2, 3, 4, 5
+    ON CONFLICT (user_id, entity_type, period, period_start, entity_id) DO UPDATE SET
+        play_count = entity_plays.play_count + excluded.play_count
+"""
+
+# Calendar days in the configured time zone, {tz} is the parameter placeholder of the caller
+ADD_TO_LISTEN_DAYS = """
+    INSERT INTO listen_days (user_id, day, play_count)
+    SELECT l.user_id, (l.played_at AT TIME ZONE {tz})::date, count(*)
+    FROM {source} l
+    {where}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        play_count = listen_days.play_count + excluded.play_count
+"""
+
+APPLY_NEW_LISTENS = [
+    text(template.format(source="listens", where="WHERE l.listen_id = ANY(:listen_ids)"))
+    for template in (ADD_TO_ROLLUP, ADD_TO_ENTITY_PLAYS)
+]
+# xmax is 0 for inserted rows, only accounts with a new day need their streaks recomputed
+APPLY_NEW_DAYS = text(
+    ADD_TO_LISTEN_DAYS.format(source="listens", where="WHERE l.listen_id = ANY(:listen_ids)", tz=":tz")
+    + " RETURNING user_id, (xmax = 0) AS created"
+)
+
+LOCK_STREAKS = text("""
+    SELECT pg_advisory_xact_lock(:lock_class, user_id)
+    FROM unnest(CAST(:user_ids AS integer[])) AS user_id
+    ORDER BY user_id
+""")
+
+# Runs of consecutive days (gaps and islands), then the latest and the longest run per account
+REFRESH_STREAKS = text("""
+    WITH runs AS (
+        SELECT user_id, min(day) AS start_day, max(day) AS end_day
+        FROM (
+            SELECT user_id, day, day - CAST(row_number() OVER (PARTITION BY user_id ORDER BY day) AS integer) AS island
+            FROM listen_days
+            WHERE user_id = ANY(:user_ids)
+        ) d
+        GROUP BY user_id, island
+    ), latest AS (
+        SELECT DISTINCT ON (user_id) user_id, start_day, end_day
+        FROM runs
+        ORDER BY user_id, end_day DESC
+    ), longest AS (
+        SELECT DISTINCT ON (user_id) user_id, start_day, end_day
+        FROM runs
+        ORDER BY user_id, end_day - start_day DESC, end_day DESC
+    )
+    INSERT INTO listen_streaks (user_id, current_start, current_end, longest_start, longest_end, updated_at)
+    SELECT l.user_id, l.start_day, l.end_day, g.start_day, g.end_day, now()
+    FROM latest l
+    JOIN longest g ON g.user_id = l.user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        current_start = excluded.current_start,
+        current_end = excluded.current_end,
+        longest_start = excluded.longest_start,
+        longest_end = excluded.longest_end,
+        updated_at = excluded.updated_at
+""")
+
+# A track that was listened to before it got linked to its artists/albums (e.g. imported tracks)
+APPLY_NEW_LINKS = text(f"""
+    INSERT INTO entity_plays (user_id, entity_type, period, period_start, entity_id, play_count)
+    SELECT l.user_id, CAST(:entity_type AS varchar), p.period, p.period_start, c.entity_id, count(*)
+    FROM unnest(CAST(:track_ids AS integer[]), CAST(:entity_ids AS integer[])) AS c(track_id, entity_id)
+    JOIN listens l ON l.track_id = c.track_id
+    {PERIODS_SQL.format(day=DAY_SQL.format("l.played_at"))}
+    GROUP BY l.user_id, p.period, p.period_start, c.entity_id
+    ORDER BY l.user_id, p.period, p.period_start, c.entity_id
+    ON CONFLICT (user_id, entity_type, period, period_start, entity_id) DO UPDATE SET
+        play_count = entity_plays.play_count + excluded.play_count
+""")
+
+# Runs before the tracks are updated, the difference to the stored duration goes into every hour the track was played in
+APPLY_DURATION_CHANGES = text(f"""
+    UPDATE listen_hourly h
+    SET duration_seconds = h.duration_seconds + d.seconds
+    FROM (
+        SELECT l.user_id, {HOUR_BUCKET_SQL.format("l.played_at")} AS hour,
+               sum(coalesce(c.duration, 0) - coalesce(t.duration, 0)) AS seconds
+        FROM unnest(CAST(:track_ids AS integer[]), CAST(:durations AS integer[])) AS c(track_id, duration)
+        JOIN tracks t ON t.track_id = c.track_id
+        JOIN listens l ON l.track_id = c.track_id
+        WHERE c.duration IS DISTINCT FROM t.duration
+        GROUP BY 1, 2
+    ) d
+    WHERE h.user_id = d.user_id AND h.hour = d.hour
+""")
+
+GRANULARITIES = ("hour", "day", "week", "month", "year")
+
+# Buckets of a range in a time zone, including empty ones. Listens outside [first, last)
+# are bucketed directly, the whole hours inside it come from the hourly rollup.
+BUCKETED_SERIES = text("""
+    WITH counted AS (
+        SELECT date_trunc(:granularity, l.played_at AT TIME ZONE :tz) AS bucket,
+               count(*) AS plays, coalesce(sum(t.duration), 0) AS seconds
+        FROM listens l
+        JOIN tracks t ON t.track_id = l.track_id
+        WHERE l.user_id = :user_id
+          AND ((l.played_at >= :start AND l.played_at < :first) OR (l.played_at >= :last AND l.played_at <= :end))
+        GROUP BY 1
+        UNION ALL
+        SELECT date_trunc(:granularity, hour AT TIME ZONE :tz), sum(play_count), sum(duration_seconds)
+        FROM listen_hourly
+        WHERE user_id = :user_id AND hour >= :first AND hour < :last
+        GROUP BY 1
+    )
+    SELECT s.bucket AT TIME ZONE :tz AS start, coalesce(sum(c.plays), 0) AS plays, coalesce(sum(c.seconds), 0) AS seconds
+    FROM generate_series(
+        date_trunc(:granularity, CAST(:start AS timestamptz) AT TIME ZONE :tz),
+        date_trunc(:granularity, CAST(:end AS timestamptz) AT TIME ZONE :tz),
+        CAST(:step AS interval)
+    ) AS s(bucket)
+    LEFT JOIN counted c ON c.bucket = s.bucket
+    GROUP BY s.bucket
+    ORDER BY s.bucket
+""")
+
+def apply_new_listens(db: Session, listen_ids: List[int]):
+    """Adds freshly inserted listens to the aggregates. Call in the inserting transaction."""
+    if listen_ids:
+        for statement in APPLY_NEW_LISTENS:
+            db.execute(statement, {"listen_ids": listen_ids})
+        rows = db.execute(APPLY_NEW_DAYS, {"listen_ids": listen_ids, "tz": APP_TIME_ZONE})
+        refresh_streaks(db, sorted({row.user_id for row in rows if row.created}))
+
+def refresh_streaks(db: Session, user_ids: List[int]):
+    """
+    Recomputes the streaks of accounts from listen_days. The lock makes a concurrent refresh
+    wait for this transaction, its statement then sees the days this one added.
+    """
+    if user_ids:
+        params = {"lock_class": STREAK_LOCK_CLASS, "user_ids": user_ids}
+        db.execute(LOCK_STREAKS, params)
+        db.execute(REFRESH_STREAKS, params)
+
+def apply_new_links(db: Session, entity_type: str, pairs: List[Tuple[int, int]]):
+    """Counts the existing listens of newly linked (track_id, artist_id/album_id) pairs for the artist/album."""
+    if pairs:
+        db.execute(APPLY_NEW_LINKS, {
+            "entity_type": entity_type,
+            "track_ids": [track_id for track_id, _ in pairs],
+            "entity_ids": [entity_id for _, entity_id in pairs],
+        })
+
+def apply_duration_changes(db: Session, durations: Dict[int, Optional[int]]):
+    """Moves the rollup to new track durations (track_id -> seconds). Call before updating the tracks."""
+    if durations:
+        track_ids = list(durations)
+        db.execute(APPLY_DURATION_CHANGES, {"track_ids": track_ids, "durations": [durations[t] for t in track_ids]})
+
+def rebuild(db: Session, user_id: Optional[int] = None):
+    """Recomputes the aggregates from listens. Writers wait for the rebuild, so nothing is counted twice."""
+    tables = (("listen_hourly", ADD_TO_ROLLUP), ("entity_plays", ADD_TO_ENTITY_PLAYS), ("listen_days", ADD_TO_LISTEN_DAYS))
+    for table, template in tables:
+        db.execute(text(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE"))
+        if user_id is None:
+            db.execute(text(f"DELETE FROM {table}"))
+            db.execute(text(template.format(source="listens", where="", tz=":tz")), {"tz": APP_TIME_ZONE})
+        else:
+            db.execute(text(f"DELETE FROM {table} WHERE user_id = :user_id"), {"user_id": user_id})
+            db.execute(
+                text(template.format(source="listens", where="WHERE l.user_id = :user_id", tz=":tz")),
+                {"user_id": user_id, "tz": APP_TIME_ZONE},
+            )
+
+    user_ids = [user_id] if user_id is not None else [row.user_id for row in db.query(User.user_id)]
+    db.query(ListenStreak).filter(ListenStreak.user_id.in_(user_ids)).delete(synchronize_session=False)
+    refresh_streaks(db, user_ids)
+
+# --- Range queries ---
+
+def _utc(value: datetime) -> datetime:
+    """Naive datetimes are taken as UTC."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def full_hours(start: datetime, end: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """[first, last) of the whole hours inside [start, end], None if there are none."""
+    first = _floor_hour(start)
+    if first < start:
+        first += HOUR
+    last = _floor_hour(end)
+    return (first, last) if first < last else None
+
+def full_days(start: datetime, end: datetime) -> Optional[Tuple[datetime, datetime]]:
+    """[first, last) of the whole UTC days inside [start, end], None if there are none."""
+    first = _floor_hour(start).replace(hour=0)
+    if first < start:
+        first += DAY
+    last = _floor_hour(end).replace(hour=0)
+    return (first, last) if first < last else None
+
+def _edges(start: datetime, end: datetime, inner: Optional[Tuple[datetime, datetime]]):
+    """Filter for the raw listens the aggregates don't cover: [start, end] without [inner) (or everything)."""
+    if inner is None:
+        return Listen.played_at.between(start, end)
+    return or_(
+        and_(Listen.played_at >= start, Listen.played_at < inner[0]),
+        and_(Listen.played_at >= inner[1], Listen.played_at <= end),
+    )
+
+def previous_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """The range of the same length right before [start, end], for period-over-period comparisons."""
+    return start - (end - start), start - timedelta(microseconds=1)
+
+def compared_ranges(start: datetime, end: datetime, compare: Optional[str]) -> List[Tuple[datetime, datetime]]:
+    """[start, end] followed by the range it is compared with (compare=previous), if any."""
+    return [(start, end), previous_range(start, end)] if compare == "previous" else [(start, end)]
+
+def range_totals_many(db: Session, user_id: int, ranges: List[Tuple[datetime, datetime]]) -> List[Dict[str, int]]:
+    """
+    Plays and listened seconds of several ranges, one query on the rollup and one on the edge listens.
+    Both aggregate conditionally (FILTER) over the union of the ranges, so overlapping ranges are read once.
+    """
+    ranges = [(_utc(start), _utc(end)) for start, end in ranges]
+    spans = [full_hours(start, end) for start, end in ranges]
+    edges = [_edges(start, end, hours) for (start, end), hours in zip(ranges, spans)]
+
+    raw = db.query(*[
+        column
+        for condition in edges
+        for column in (func.count(Listen.listen_id).filter(condition), func.coalesce(func.sum(Track.duration).filter(condition), 0))
+    ]).select_from(Listen).join(
+        Track, Listen.track_id == Track.track_id
+    ).filter(
+        Listen.user_id == user_id, or_(*edges)
+    ).one()
+    totals = [{"plays": int(raw[2 * i]), "seconds": int(raw[2 * i + 1])} for i in range(len(ranges))]
+
+    rolled = [(i, hours) for i, hours in enumerate(spans) if hours is not None]
+    if rolled:
+        conditions = [and_(ListenHourly.hour >= hours[0], ListenHourly.hour < hours[1]) for _, hours in rolled]
+        row = db.query(*[
+            column
+            for condition in conditions
+            for column in (
+                func.coalesce(func.sum(ListenHourly.play_count).filter(condition), 0),
+                func.coalesce(func.sum(ListenHourly.duration_seconds).filter(condition), 0),
+            )
+        ]).filter(
+            ListenHourly.user_id == user_id, or_(*conditions)
+        ).one()
+        for position, (i, _) in enumerate(rolled):
+            totals[i]["plays"] += int(row[2 * position])
+            totals[i]["seconds"] += int(row[2 * position + 1])
+
+    return totals
+
+def range_totals(db: Session, user_id: int, start: datetime, end: datetime) -> Dict[str, int]:
+    """Plays and listened seconds in [start, end]."""
+    return range_totals_many(db, user_id, [(start, end)])[0]
+
+def hourly_series(db: Session, user_id: int, start: datetime, end: datetime) -> List[Dict[str, object]]:
+    """Plays and listened seconds per UTC hour in [start, end], hours without listens are left out."""
+    start, end = _utc(start), _utc(end)
+    hours = full_hours(start, end)
+    buckets: Dict[datetime, Dict[str, object]] = {}
+
+    bucket = func.timezone('UTC', func.date_trunc('hour', func.timezone('UTC', Listen.played_at))).label('hour')
+    raw = db.query(
+        bucket, func.count(Listen.listen_id), func.coalesce(func.sum(Track.duration), 0)
+    ).join(
+        Track, Listen.track_id == Track.track_id
+    ).filter(
+        Listen.user_id == user_id, _edges(start, end, hours)
+    ).group_by(bucket)
+    rows = list(raw)
+
+    if hours is not None:
+        rows += db.query(
+            ListenHourly.hour, ListenHourly.play_count, ListenHourly.duration_seconds
+        ).filter(
+            ListenHourly.user_id == user_id, ListenHourly.hour >= hours[0], ListenHourly.hour < hours[1]
+        ).all()
+
+    for hour, plays, seconds in rows:
+        entry = buckets.setdefault(hour, {"hour": hour, "plays": 0, "seconds": 0})
+        entry["plays"] += int(plays)  # type: ignore
+        entry["seconds"] += int(seconds or 0)  # type: ignore
+    return [buckets[hour] for hour in sorted(buckets)]
+
+def _whole_hour_offsets(tz: str, start: datetime, end: datetime) -> bool:
+    """Whether UTC hours fall into a single local hour of tz (not e.g. Asia/Kolkata, +05:30)."""
+    zone = ZoneInfo(tz)
+    return all(moment.astimezone(zone).utcoffset() % HOUR == timedelta(0) for moment in (start, end))
+
+def bucketed_series(
+    db: Session, user_id: int, start: datetime, end: datetime, granularity: str, tz: str = APP_TIME_ZONE
+) -> List[Dict[str, object]]:
+    """
+    Plays and listened seconds per local hour, day, week (from Monday), month or year of tz,
+    one entry for every bucket touching [start, end] (empty ones included). start is the
+    bucket's first moment.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity}")
+    start, end = _utc(start), _utc(end)
+    # Hourly rows can only be bucketed in zones whose offset is a whole number of hours
+    hours = full_hours(start, end) if _whole_hour_offsets(tz, start, end) else None
+    first, last = hours or (end, end)
+    rows = db.execute(BUCKETED_SERIES, {
+        "user_id": user_id, "start": start, "end": end, "first": first, "last": last,
+        "granularity": granularity, "step": f"1 {granularity}", "tz": tz,
+    })
+    return [{"start": row.start, "plays": int(row.plays), "seconds": int(row.seconds)} for row in rows]
+
+def period_cover(first: date, last: date) -> List[Tuple[str, date]]:
+    """Whole years, months, weeks and days that together cover the days [first, last)."""
+    cover = []
+    day = first
+    while day < last:
+        year_end = date(day.year + 1, 1, 1)
+        month_end = date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+        week_end = day + timedelta(days=7)
+        if day.month == 1 and day.day == 1 and year_end <= last:
+            cover.append(("year", day))
+            day = year_end
+        elif day.day == 1 and month_end <= last:
+            cover.append(("month", day))
+            day = month_end
+        elif day.weekday() == 0 and week_end <= last:
+            cover.append(("week", day))
+            day = week_end
+        else:
+            cover.append(("day", day))
+            day += DAY
+    return cover
+
+def _spans_history(db: Session, user_id: int, start: datetime, end: datetime) -> bool:
+    """Whether [start, end] contains every listen of the account, the all-time counters answer those."""
+    first, last = db.query(func.min(ListenHourly.hour), func.max(ListenHourly.hour)).filter(ListenHourly.user_id == user_id).one()
+    return first is None or (start <= first and end >= last + HOUR)
+
+def _raw_entities(entity_type: str, *columns):
+    """Select of `columns` over listens joined to the entity they count for. Returns (select, entity column)."""
+    if entity_type == "track":
+        return select(Listen.track_id, *columns).select_from(Listen), Listen.track_id
+    link = track_artists if entity_type == "artist" else track_album
+    column = link.c.artist_id if entity_type == "artist" else link.c.album_id
+    return select(column, *columns).select_from(Listen).join(link, link.c.track_id == Listen.track_id), column
+
+def _raw_entity_counts(db: Session, user_id: int, entity_type: str, condition) -> Dict[int, int]:
+    query, column = _raw_entities(entity_type, func.count())
+    return dict(db.execute(query.where(Listen.user_id == user_id, condition).group_by(column)).all())
+
+def _period_counts(
+    db: Session,
+    user_id: int,
+    entity_type: str,
+    cover: List[Tuple[str, date]],
+    limit: Optional[int] = None,
+    entity_ids: Optional[List[int]] = None,
+) -> Dict[int, int]:
+    """Play counts summed over the periods of cover, the `limit` highest or those of entity_ids."""
+    query = db.query(EntityPlays.entity_id)
+    if len(cover) == 1:
+        # A single period is read in rank order straight from ix_entity_plays_ranked
+        period, period_start = cover[0]
+        total = EntityPlays.play_count
+        query = query.add_columns(total).filter(EntityPlays.period == period, EntityPlays.period_start == period_start)
+    else:
+        total = func.sum(EntityPlays.play_count)
+        query = query.add_columns(total).filter(
+            tuple_(EntityPlays.period, EntityPlays.period_start).in_(cover)
+        ).group_by(EntityPlays.entity_id)
+    query = query.filter(EntityPlays.user_id == user_id, EntityPlays.entity_type == entity_type)
+    if entity_ids is not None:
+        query = query.filter(EntityPlays.entity_id.in_(entity_ids))
+    if limit is not None:
+        query = query.order_by(total.desc(), EntityPlays.entity_id).limit(limit)
+    return {entity_id: int(count) for entity_id, count in query.all()}
+
+def _ranked(counts: Dict[int, int], limit: int) -> List[Tuple[int, int]]:
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+def top_entities(db: Session, user_id: int, entity_type: str, start: datetime, end: datetime, limit: int) -> List[Tuple[int, int]]:
+    """
+    The `limit` most played tracks, artists or albums in [start, end] as (entity_id, plays).
+    Whole UTC days come from the counters, only the partial days at the edges scan listens.
+    """
+    start, end = _utc(start), _utc(end)
+    if _spans_history(db, user_id, start, end):
+        return _ranked(_period_counts(db, user_id, entity_type, [("all", ALL_TIME)], limit=limit), limit)
+
+    days = full_days(start, end)
+    edges = _raw_entity_counts(db, user_id, entity_type, _edges(start, end, days))
+    if days is None:
+        return _ranked(edges, limit)
+
+    cover = period_cover(days[0].date(), days[1].date())
+    # An entity below the top limit + len(edges) of the counters can't be lifted into the top limit by the edges
+    counts = _period_counts(db, user_id, entity_type, cover, limit=limit + len(edges))
+    missing = [entity_id for entity_id in edges if entity_id not in counts]
+    if missing:
+        counts.update(_period_counts(db, user_id, entity_type, cover, entity_ids=missing))
+    for entity_id, plays in edges.items():
+        counts[entity_id] = counts.get(entity_id, 0) + plays
+    return _ranked(counts, limit)
+
+def read_streak(db: Session, user_id: int) -> Dict[str, Any]:
+    """Current and longest streak in days. The current one counts while its last day is today or yesterday."""
+    streak = db.get(ListenStreak, user_id)
+    if streak is None:
+        return {"streak": 0, "current_start": None, "longest_streak": 0, "longest_start": None, "longest_end": None}
+
+    today = datetime.now(ZoneInfo(APP_TIME_ZONE)).date()
+    current = (streak.current_end - streak.current_start).days + 1 if streak.current_end >= today - DAY else 0
+    return {
+        "streak": current,
+        "current_start": streak.current_start.isoformat() if current else None,
+        "longest_streak": (streak.longest_end - streak.longest_start).days + 1,
+        "longest_start": streak.longest_start.isoformat(),
+        "longest_end": streak.longest_end.isoformat(),
+    }
+
+def entity_counts_many(
+    db: Session, user_id: int, entity_type: str, ranges: List[Tuple[datetime, datetime]], entity_ids: List[int]
+) -> List[Dict[int, int]]:
+    """
+    Play counts of entity_ids in several ranges: one query on the counters and one on the edge
+    listens, both aggregating conditionally (FILTER) over the union of the ranges.
+    """
+    counts: List[Dict[int, int]] = [{} for _ in ranges]
+    if not entity_ids:
+        return counts
+
+    covers, edges = [], []
+    for start, end in ranges:
+        start, end = _utc(start), _utc(end)
+        if _spans_history(db, user_id, start, end):
+            covers.append([("all", ALL_TIME)])
+            edges.append(None)
+        else:
+            days = full_days(start, end)
+            covers.append(period_cover(days[0].date(), days[1].date()) if days else [])
+            edges.append(_edges(start, end, days))
+
+    counted = [(i, tuple_(EntityPlays.period, EntityPlays.period_start).in_(cover)) for i, cover in enumerate(covers) if cover]
+    if counted:
+        rows = db.query(
+            EntityPlays.entity_id, *[func.coalesce(func.sum(EntityPlays.play_count).filter(condition), 0) for _, condition in counted]
+        ).filter(
+            EntityPlays.user_id == user_id,
+            EntityPlays.entity_type == entity_type,
+            EntityPlays.entity_id.in_(entity_ids),
+            or_(*[condition for _, condition in counted]),
+        ).group_by(EntityPlays.entity_id).all()
+        for entity_id, *values in rows:
+            for (i, _), plays in zip(counted, values):
+                counts[i][entity_id] = counts[i].get(entity_id, 0) + int(plays)
+
+    scanned = [(i, condition) for i, condition in enumerate(edges) if condition is not None]
+    if scanned:
+        query, column = _raw_entities(entity_type, *[func.count().filter(condition) for _, condition in scanned])
+        rows = db.execute(query.where(
+            Listen.user_id == user_id, column.in_(entity_ids), or_(*[condition for _, condition in scanned])
+        ).group_by(column)).all()
+        for entity_id, *values in rows:
+            for (i, _), plays in zip(scanned, values):
+                counts[i][entity_id] = counts[i].get(entity_id, 0) + int(plays)
+
+    return counts
+
+def count_entities(db: Session, user_id: int, entity_type: str, start: datetime, end: datetime) -> int:
+    """Distinct tracks, artists or albums played in [start, end], counters for whole days, listens for the edges."""
+    start, end = _utc(start), _utc(end)
+    if _spans_history(db, user_id, start, end):
+        cover, edges = [("all", ALL_TIME)], None
+    else:
+        days = full_days(start, end)
+        cover = period_cover(days[0].date(), days[1].date()) if days else []
+        edges = _edges(start, end, days)
+
+    parts = []
+    if cover:
+        parts.append(select(EntityPlays.entity_id).where(
+            EntityPlays.user_id == user_id,
+            EntityPlays.entity_type == entity_type,
+            tuple_(EntityPlays.period, EntityPlays.period_start).in_(cover),
+        ))
+    if edges is not None:
+        query, _ = _raw_entities(entity_type)
+        parts.append(query.where(Listen.user_id == user_id, edges))
+    # UNION drops the duplicates, so every entity is counted once
+    entity_ids = (union(*parts) if len(parts) > 1 else parts[0].distinct()).subquery()
+    return db.execute(select(func.count()).select_from(entity_ids)).scalar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the listening aggregates from listens.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only this account (default: all accounts)")
+    args = parser.parse_args(argv)
+
+    started = time.monotonic()
+    db = SessionLocal()
+    try:
+        rebuild(db, args.user_id)
+        notify_data_changed(db, "rebuild")
+        db.commit()
+        hours = db.query(func.count()).select_from(ListenHourly).scalar()
+        counters = db.query(func.count()).select_from(EntityPlays).scalar()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    logger.info(f"Rebuilt listen_hourly ({hours} hours) and entity_plays ({counters} counters) in {time.monotonic() - started:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import requests
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import os
 
 from app.database import get_db
-from app.models import SpotifyToken
-from app.utils.spotify import get_valid_spotify_token
+from app.models import SpotifyToken, User
+from app.utils import spotify_client, upstream_cache
+from app.utils.rate_governor import SpotifyRateLimited
+from app.utils.spotify import get_valid_spotify_token, cache_spotify_token, invalidate_spotify_token
+from app.utils.users import get_user_id, set_session, clear_session
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI", "http://localhost:5173/callback")
+# Spotify account that owns the history of a pre-multi-account install, if its stored token no longer works
+LEGACY_SPOTIFY_USER_ID = os.getenv("LEGACY_SPOTIFY_USER_ID")
 
 SCOPES = "user-read-recently-played user-read-currently-playing user-read-playback-state user-library-read"
 
+def profile_scope(user_id: int) -> str:
+    """Cache scope of an account's profile."""
+    return f"account:{user_id}"
+
 class CodeRequest(BaseModel):
     code: str
 
@@ -35,11 +44,14 @@ def login():
     return {"auth_url": auth_url}
 
 @router.post("/logout")
-def logout(db: Session = Depends(get_db)):
-    """Deletes the stored Spotify token."""
+def logout(response: Response, user_id: int = Depends(get_user_id), db: Session = Depends(get_db)):
+    """Deletes the stored Spotify token of the session's account and ends the session. Its listen history is kept."""
     try:
-        db.query(SpotifyToken).delete()
+        db.query(SpotifyToken).filter(SpotifyToken.user_id == user_id).delete()
         db.commit()
+        invalidate_spotify_token(user_id)
+        upstream_cache.invalidate(upstream_cache.cache_key(profile_scope(user_id), "/me"))
+        clear_session(response)
         return {"message": "Logged out successfully"}
     except Exception as e:
         db.rollback()
@@ -48,10 +60,11 @@ def logout(db: Session = Depends(get_db)):
 
 
 @router.post("/callback")
-def callback(request: CodeRequest, db: Session = Depends(get_db)):
+def callback(request: CodeRequest, response: Response, db: Session = Depends(get_db)):
     """
     Frontend sends the 'code' here. 
-    Backend swaps 'code' for 'access_token' and 'refresh_token'.
+    Backend swaps 'code' for 'access_token' and 'refresh_token'
+    and starts a session (signed cookie) for the token's account.
     """
     payload = {
         "grant_type": "authorization_code",
@@ -61,34 +74,73 @@ def callback(request: CodeRequest, db: Session = Depends(get_db)):
         "client_secret": CLIENT_SECRET,
     }
 
-    response = requests.post("https://accounts.spotify.com/api/token", data=payload)
-    data = response.json()
+    token_response = spotify_client.post_token(payload)
+    data = token_response.json()
 
     if "error" in data:
         raise HTTPException(status_code=400, detail="Failed to get token from Spotify")
 
     expires_at = datetime.now() + timedelta(seconds=data.get("expires_in", 3600))
 
-    existing_token = db.query(SpotifyToken).first()
+    # Find out whose token this is, every Spotify account gets its own user
+    profile_response = spotify_client.get("/me", data["access_token"], endpoint="me")
+    if profile_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to read Spotify profile")
+    profile = profile_response.json()
+
+    user = get_or_create_user(db, profile["id"], profile.get("display_name"))
+
+    existing_token = db.query(SpotifyToken).filter(SpotifyToken.user_id == user.user_id).first()
     
     if existing_token:
         existing_token.access_token = data["access_token"]
         existing_token.refresh_token = data["refresh_token"]
         existing_token.expires_at = expires_at # type: ignore
     else:
-        new_token = SpotifyToken(
+        existing_token = SpotifyToken(
+            user_id=user.user_id,
             access_token=data["access_token"],
             refresh_token=data["refresh_token"],
             expires_at=expires_at
         )
-        db.add(new_token)
+        db.add(existing_token)
     
+    cache_spotify_token(existing_token)
+    user_id = user.user_id
     db.commit()
+    set_session(response, user_id) # type: ignore
     
-    return {"message": "Authentication successful"}
+    return {"message": "Authentication successful", "user_id": user_id}
+
+def legacy_owner(db: Session, user_id: int) -> Optional[str]:
+    """Spotify id of the account whose token a migrated user still holds, None if it can't be read."""
+    if LEGACY_SPOTIFY_USER_ID:
+        return LEGACY_SPOTIFY_USER_ID
+    try:
+        token = get_valid_spotify_token(db, user_id)
+        response = spotify_client.get("/me", token, endpoint="me")
+    except Exception:
+        return None
+    return response.json().get("id") if response.status_code == 200 else None
+
+def get_or_create_user(db: Session, spotify_user_id: str, display_name: str) -> User:
+    user = db.query(User).filter(User.spotify_user_id == spotify_user_id).first()
+    if user is None:
+        # The account of a single-account install was migrated without a Spotify id. Only its
+        # owner may claim it, any other Spotify account gets a user of its own.
+        legacy = db.query(User).filter(User.spotify_user_id.is_(None)).order_by(User.user_id).first()
+        if legacy is not None and legacy_owner(db, legacy.user_id) == spotify_user_id: # type: ignore
+            user = legacy
+    if user is None:
+        user = User(created_at=datetime.now(timezone.utc))
+        db.add(user)
+    user.spotify_user_id = spotify_user_id # type: ignore
+    user.display_name = display_name # type: ignore
+    db.flush()
+    return user
 
 @router.get("/me")
-def get_user_profile(db: Session = Depends(get_db)):
+def get_user_profile(user_id: int = Depends(get_user_id), db: Session = Depends(get_db)):
     """
     Check if user is authenticated and fetches their Profile.
     - Checks for valid token in DB.
@@ -97,24 +149,27 @@ def get_user_profile(db: Session = Depends(get_db)):
     """
     try:
         # 1. Get/Refresh valid token (This effectively "checks" the login status)
-        token = get_valid_spotify_token(db)
+        token = get_valid_spotify_token(db, user_id)
         
         # 2. Call Spotify API to get Profile Data
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get("https://api.spotify.com/v1/me", headers=headers)
+        status, data = upstream_cache.cached_get("/me", token, endpoint="me", scope=profile_scope(user_id))
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             return {
                 "name": data.get("display_name", "User"),
                 # Spotify returns an array of images, we take the first one
                 "image": data.get("images", [{}])[0].get("url"),
-                "id": data.get("id")
+                "id": data.get("id"),
+                "user_id": user_id,
             }
         
         # If Spotify says 401, the token was revoked/invalid
+        if status == 401:
+            invalidate_spotify_token(user_id)
         raise HTTPException(status_code=401, detail="Invalid Token")
         
+    except SpotifyRateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
     except Exception as e:
         # Handles: "No token found in DB", "Refresh Failed", etc.
         raise HTTPException(status_code=401, detail="User not authenticated")
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text
+from sqlalchemy.orm import Session, joinedload
+
+from app.database import get_db
+from app.listen_events import format_listen
+from app.models import Listen, Track
+from app.rollups import hourly_series, range_totals, count_entities, read_streak
+from app.routers.database_stats import count_entries
+from app.routers.listens import format_activity
+from app.utils.users import get_user_id
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+@router.get("/summary")
+def get_dashboard_summary(
+    start: str = Query(..., description="Start datetime in ISO format"),
+    end: str = Query(..., description="End datetime in ISO format"),
+    previous_start: Optional[str] = Query(None, description="Start of the range to compare with"),
+    previous_end: Optional[str] = Query(None, description="End of the range to compare with"),
+    recent_limit: int = Query(10, ge=0, le=500),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Everything the dashboard shows for one range in one round trip: plays, minutes, artists,
+    hourly activity, streak, recent listens and estimated database size (plus plays, minutes and artists
+    of previous_start/previous_end if given). All parts are read from one snapshot, so they
+    always agree with each other. Ranges are answered from the rollups, listens are only
+    scanned for the partial edge hours and days.
+    """
+    try:
+        start_dt = datetime.fromisoformat(start)
+        end_dt = datetime.fromisoformat(end)
+
+        # get_user_id already used the session, the snapshot starts with a fresh transaction
+        db.commit()
+        db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+
+        # Totals are the sum of the hourly series, the range is only read once
+        activity = hourly_series(db, user_id, start_dt, end_dt)
+        seconds = sum(r["seconds"] for r in activity)  # type: ignore
+        summary = {
+            "plays_count": sum(r["plays"] for r in activity),  # type: ignore
+            "minutes_listened": int(seconds // 60),
+            "artist_count": count_entities(db, user_id, "artist", start_dt, end_dt),
+            "activity": format_activity(activity),
+            "streak": read_streak(db, user_id),
+            "total_entries": count_entries(db),
+            "total_entries_estimated": True,
+        }
+
+        if previous_start and previous_end:
+            previous_start_dt = datetime.fromisoformat(previous_start)
+            previous_end_dt = datetime.fromisoformat(previous_end)
+            totals = range_totals(db, user_id, previous_start_dt, previous_end_dt)
+            summary["previous"] = {
+                "plays_count": totals["plays"],
+                "minutes_listened": totals["seconds"] // 60,
+                "artist_count": count_entities(db, user_id, "artist", previous_start_dt, previous_end_dt),
+            }
+
+        listens = (
+            db.query(Listen)
+            .options(joinedload(Listen.track).selectinload(Track.artists))
+            .filter(Listen.user_id == user_id)
+            .order_by(Listen.played_at.desc())
+            .limit(recent_limit)
+            .all()
+        ) if recent_limit else []
+        summary["recent"] = [format_listen(listen) for listen in listens]
+
+        return summary
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
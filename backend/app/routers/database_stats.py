@@ -1,29 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.database import get_db, Base
+from app.database import get_db
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Listening data and its catalog; queues, ledgers, caches and rollups aren't entries
+DOMAIN_TABLES = ["listens", "tracks", "artists", "albums", "track_artists", "track_album"]
+
+# reltuples is the planner's row estimate kept up to date by (auto)vacuum and analyze,
+# -1 for a table that was never analyzed (e.g. right after install)
+ESTIMATED_ROWS = """
+    SELECT c.relname, c.reltuples
+    FROM pg_class c
+    WHERE c.oid = ANY(CAST(:tables AS regclass[]))
+"""
+
+def count_entries(db: Session) -> int:
+    """
+    Estimated number of rows across the domain tables, read from the catalog instead of counted.
+    Tables without an estimate yet are counted, they are new and small.
+    """
+    total = 0
+    for table, estimate in db.execute(text(ESTIMATED_ROWS), {"tables": DOMAIN_TABLES}).all():
+        if estimate < 0:
+            total += db.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+        else:
+            total += int(estimate)
+    return total
+
 @router.get("/database-stats")
 def get_database_stats(db: Session = Depends(get_db)):
     """
-    Returns the total number of rows across ALL tables in the database.
-    Includes association tables (e.g., track_artists).
+    Returns the number of rows across the domain tables (listens, the catalog and its
+    association tables, e.g. track_artists). It is the planner's estimate, not an exact
+    count, which total_entries_estimated says.
     """
     try:
-        total_entries = 0
-        
-        # Iterate through every table defined in Base.metadata
-        for table in Base.metadata.tables.values():
-            # Query count for this specific table
-            count = db.query(func.count()).select_from(table).scalar()
-            total_entries += count
-
-        return {"total_entries": total_entries}
+        return {"total_entries": count_entries(db), "total_entries_estimated": True}
 
     except Exception as e:
         logger.error(f"Error calculating database stats: {e}")
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import IngestionRun
+from app.schemas import IngestionRunOut
+from app.utils.key_cache import key_cache_stats
+from app.utils.users import get_user_id
+
+router = APIRouter(prefix="/ingestion", tags=["ingestion"])
+
+@router.get("/runs", response_model=list[IngestionRunOut])
+def get_ingestion_runs(
+    limit: int = Query(50, ge=1, le=1000),
+    status: str = Query(None, description="Only runs with this status (success, failed)"),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """Most recent ingestion runs of the session's account with per-stage timings and item counters."""
+    try:
+        query = db.query(IngestionRun).filter(IngestionRun.user_id == user_id)
+        if status:
+            query = query.filter(IngestionRun.status == status)
+        return query.order_by(IngestionRun.started_at.desc()).limit(limit).all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/key-cache")
+def get_key_cache_stats():
+    """
+    Size and hit/miss counters of the spotify_id -> primary key cache per dimension.
+    Counters are per process.
+    """
+    return key_cache_stats()
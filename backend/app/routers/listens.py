@@ -1,19 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, logger
+import asyncio
+import base64
+import csv
+import io
+import json
+from typing import Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, logger
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from app.database import get_db
-from datetime import datetime, timedelta
+from app import listen_events
+from app.database import get_db, SessionLocal
+from app.events import hub, sse_event, KEEPALIVE_SECONDS, SSE_KEEPALIVE, SSE_HEADERS
+from app.listen_events import format_listen, notify_new_listens
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from app.schemas import ListenCreate
-from app.models import Listen, Track, Artist, track_artists
+from app.models import Listen, Track, Artist, Album, track_artists, track_album
+from app.rollups import (
+    APP_TIME_ZONE, apply_new_listens, range_totals_many, compared_ranges, bucketed_series, hourly_series, read_streak,
+    count_entities,
+)
+from app.utils.users import get_user_id
 
 router = APIRouter(prefix="/listens", tags=["listens"])
 
+COMPARE_DESCRIPTION = "previous: also return the range of the same length right before, and the delta"
+CURSOR_DESCRIPTION = "Only listens older than this opaque cursor, as returned in `next`"
+
+# Rows fetched per round trip of the export's server-side cursor
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ["listen_id", "played_at", "track_id", "spotify_id", "track_name", "artist_names", "album_names", "duration"]
+
+def with_comparison(key: str, values: list, ranges: list) -> dict:
+    """{key: value} of the range, plus the compared range and the delta if there is one."""
+    result = {key: values[0]}
+    if len(values) > 1:
+        previous_start, previous_end = ranges[1]
+        result["previous"] = {"start": previous_start.isoformat(), "end": previous_end.isoformat(), key: values[1]}
+        result["delta"] = values[0] - values[1]
+    return result
+
 @router.post("/")
-def create_listen(listen: ListenCreate, db: Session = Depends(get_db)):
+def create_listen(listen: ListenCreate, user_id: int = Depends(get_user_id), db: Session = Depends(get_db)):
     """Log a new listen manually."""
     try:
-        db_listen = Listen(track_id=listen.track_id, played_at=listen.played_at)
+        db_listen = Listen(user_id=user_id, track_id=listen.track_id, played_at=listen.played_at)
         db.add(db_listen)
+        db.flush()
+        apply_new_listens(db, [db_listen.listen_id])
+        notify_new_listens(db, user_id, [db_listen.listen_id])
         db.commit()
         db.refresh(db_listen)
         return {"listen_id": db_listen.listen_id}
@@ -25,25 +62,141 @@ def create_listen(listen: ListenCreate, db: Session = Depends(get_db)):
 def get_listens_count(
     start: str = Query(..., description="Start datetime in ISO format"),
     end: str = Query(..., description="End datetime in ISO format"),
+    compare: Optional[Literal["previous"]] = Query(None, description=COMPARE_DESCRIPTION),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
-    """Count listens in a time range."""
+    """Count listens in a time range. Compared ranges are evaluated in the same queries."""
     try:
         start_datetime = datetime.fromisoformat(start)
         end_datetime = datetime.fromisoformat(end)
 
-        plays_count = db.query(Listen).filter(
-            Listen.played_at.between(start_datetime, end_datetime)
-        ).count()
+        ranges = compared_ranges(start_datetime, end_datetime, compare)
+        totals = range_totals_many(db, user_id, ranges)
 
-        return {"plays_count": plays_count}
+        return with_comparison("plays_count", [t["plays"] for t in totals], ranges)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def encode_cursor(listen: Listen) -> str:
+    """(played_at, listen_id) as URL-safe base64, so the "+" of the UTC offset survives query strings."""
+    raw = f"{listen.played_at.isoformat()},{listen.listen_id}".encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for anything encode_cursor didn't produce."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    played_at, _, listen_id = raw.rpartition(",")
+    return datetime.fromisoformat(played_at), int(listen_id)
+
+@router.get("")
+def get_listens(
+    before: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    limit: int = Query(50, ge=1, le=500),
+    user_id: int = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Listen history, newest first, one page at a time. Pages are cut on (played_at, listen_id)
+    instead of an offset, so every page is an index range scan however deep it is, and listens
+    arriving meanwhile don't shift the pages. `next` is the cursor of the following page.
+    """
+    try:
+        cursor = decode_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {before}")
+    try:
+        query = (
+            db.query(Listen)
+            .options(joinedload(Listen.track).selectinload(Track.artists))
+            .filter(Listen.user_id == user_id)
+        )
+        if cursor:
+            played_at, listen_id = cursor
+            # Spelled out instead of a row comparison so played_at stays an index condition
+            query = query.filter(
+                Listen.played_at <= played_at,
+                or_(Listen.played_at < played_at, and_(Listen.played_at == played_at, Listen.listen_id < listen_id)),
+            )
+        listens = query.order_by(Listen.played_at.desc(), Listen.listen_id.desc()).limit(limit).all()
+
+        page = {
+            "listens": [format_listen(listen) for listen in listens],
+            "next": encode_cursor(listens[-1]) if len(listens) == limit else None,
+        }
+
+
+        return page
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def export_query(user_id: int):
+    """All listens of an account, oldest first, with their track, artist and album names."""
+    def names(model, link, onclause):
+        return (
+            select(func.string_agg(model.name, aggregate_order_by(literal_column("', '"), model.name)))
+            .select_from(link.join(model, onclause))
+            .where(link.c.track_id == Listen.track_id)
+            .scalar_subquery()
+        )
+
+    return (
+        select(
+            Listen.listen_id, Listen.played_at, Listen.track_id, Track.spotify_id, Track.name.label("track_name"),
+            names(Artist, track_artists, track_artists.c.artist_id == Artist.artist_id).label("artist_names"),
+            names(Album, track_album, track_album.c.album_id == Album.album_id).label("album_names"),
+            Track.duration,
+        )
+        .select_from(Listen)
+        .join(Track, Track.track_id == Listen.track_id)
+        .where(Listen.user_id == user_id)
+        .order_by(Listen.played_at, Listen.listen_id)
+    )
+
+def export_batches(user_id: int):
+    """Rows in batches of EXPORT_BATCH_SIZE from a server-side cursor, never the whole history at once."""
+    db = SessionLocal()
+    try:
+        result = db.execute(export_query(user_id).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield [{**row._asdict(), "played_at": row.played_at.isoformat()} for row in rows]
+    finally:
+        db.close()
+
+def ndjson_export(user_id: int):
+    for rows in export_batches(user_id):
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+def csv_export(user_id: int):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for rows in export_batches(user_id):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+@router.get("/export")
+def export_listens(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    user_id: int = Depends(get_user_id),
+):
+    """
+    Full listen history of an account as NDJSON or CSV, oldest first. Rows are streamed from a
+    server-side cursor batch by batch, memory stays constant however long the history is.
+    """
+    chunks = ndjson_export(user_id) if format == "ndjson" else csv_export(user_id)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="listens-{user_id}.{format}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
 @router.get("/recent")
 def get_recent_listens(
     limit: int = Query(50, ge=1, le=500), 
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Get the most recent listens with track and artist info."""
@@ -51,108 +204,127 @@ def get_recent_listens(
         listens = (
             db.query(Listen)
             .options(joinedload(Listen.track).selectinload(Track.artists))
+            .filter(Listen.user_id == user_id)
             .order_by(Listen.played_at.desc())
             .limit(limit)
             .all()
         )
 
-        formatted_listens = []
-        for listen in listens:
-            track = listen.track
-            track_name = track.name if track else "Unknown Track"
-            cover_url = track.image_url_small if track else None           
-            artist_names = "Unknown Artist"
-            if track and track.artists:
-                artist_names = ", ".join(artist.name for artist in track.artists)
-
-            formatted_listens.append({
-                "listen_id": listen.listen_id,
-                "track_id": listen.track_id,
-                "played_at": listen.played_at.isoformat(), 
-                "track_name": track_name,
-                "artist_names": artist_names,
-                "cover_url": cover_url,
-            })
+        formatted_listens = [format_listen(listen) for listen in listens]
+
 
         return {"listens": formatted_listens}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
-@router.get("/streak")
-def get_listening_streak(db: Session = Depends(get_db)):
+@router.get("/stream")
+async def stream_listens(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id (Last-Event-ID header takes precedence)"),
+    user_id: int = Depends(get_user_id),
+):
     """
-    Optimized streak calculation.
-    Fetches all distinct dates in one query, then calculates streak in Python.
+    Server-sent events: one 'listen' event per newly committed listen, in commit order.
+    A reconnecting client sends Last-Event-ID and first gets the listens it missed; if
+    those can't be replayed it gets a 'reset' event and has to refetch.
     """
-    try:
-        dates = db.query(
-            func.date(Listen.played_at).label('listen_date')
-        ).distinct().order_by(
-            func.date(Listen.played_at).desc()
-        ).all()
+    cursor = listen_events.parse_event_id(request.headers.get("last-event-id") or last_event_id)
+    subscription = hub.subscribe(listen_events.CHANNEL, max_size=64)
 
-        if not dates:
-            return {"streak": 0}
+    def missed_listens():
+        db = SessionLocal()
+        try:
+            rows = listen_events.load_since(db, cursor, user_id)  # type: ignore
+            return rows, (listen_events.latest_cursor(db, user_id) if rows is None else None)
+        finally:
+            db.close()
 
-        unique_dates = [d.listen_date for d in dates]
-        
-        current_streak = 0
-        today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
-
-        if unique_dates[0] == today or unique_dates[0] == yesterday:
-            current_streak = 1
-            for i in range(len(unique_dates) - 1):
-                if unique_dates[i] - unique_dates[i+1] == timedelta(days=1):
-                    current_streak += 1
-                else:
-                    break
-        
-        return {"streak": current_streak}
+    async def events():
+        last_sent = cursor
+        try:
+            # Subscribed before loading, so nothing committed in between is lost; duplicates are skipped below
+            if cursor is not None:
+                backlog, latest = await run_in_threadpool(missed_listens)
+                if backlog is None:
+                    yield sse_event({}, event="reset", event_id=listen_events.event_id(latest) if latest else None)
+                    last_sent = max(cursor, latest) if latest else cursor
+                for row in backlog or []:
+                    yield sse_event(row, event="listen", event_id=row["event_id"])
+                    last_sent = listen_events.parse_event_id(row["event_id"])
+            while not await request.is_disconnected():
+                try:
+                    rows = await subscription.get(KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield SSE_KEEPALIVE
+                    continue
+                for row in rows:
+                    if row.get("reset"):
+                        yield sse_event({}, event="reset", event_id=row["event_id"])
+                        continue
+                    position = listen_events.parse_event_id(row["event_id"])
+                    if row["user_id"] != user_id or (last_sent is not None and position <= last_sent):  # type: ignore
+                        continue
+                    yield sse_event(row, event="listen", event_id=row["event_id"])
+                    last_sent = position
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/streak")
+def get_listening_streak(user_id: int = Depends(get_user_id), db: Session = Depends(get_db)):
+    """
+    Current streak of consecutive days with listens (in APP_TIME_ZONE), plus the longest one and its dates.
+    Read from listen_streaks, which is maintained whenever an account gets a new listening day.
+    """
+    try:
+        return read_streak(db, user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def format_activity(series: list, key: str = "hour") -> list:
+    return [
+        {
+            # Send raw ISO time (UTC)
+            "timestamp": r[key].isoformat(),
+            "minutes": int(r["seconds"] / 60)
+        }
+        for r in series
+    ]
+
 @router.get("/activity")
 def get_activity_stats(
     start: str = Query(...),
     end: str = Query(...),
+    granularity: Optional[Literal["hour", "day", "week", "month", "year"]] = Query(
+        None, description="Size of the buckets, leave out for the listened UTC hours only"
+    ),
+    tz: Optional[str] = Query(None, description="IANA time zone of the buckets, defaults to APP_TIME_ZONE"),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """
-    Returns minutes listened grouped by HOUR.
-    The frontend handles aggregating these hours into days, weeks, or months.
-    This solves timezone alignment issues.
+    Returns minutes listened per hour, day, week, month or year in the time zone tz,
+    bucketed in the database with one entry per bucket (empty ones included), so the
+    payload grows with the number of bars, not the hours covered. Timestamps are the
+    bucket starts in UTC. Whole hours come from the hourly rollup, only the partial
+    edge hours scan listens.
+    Without granularity the response keeps its original shape: only the UTC hours
+    with listens, no gap filling, the frontend aggregates them itself.
     """
+    try:
+        zone = tz or APP_TIME_ZONE
+        ZoneInfo(zone)
+    except (ValueError, ZoneInfoNotFoundError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone {tz}")
     try:
         start_dt = datetime.fromisoformat(start)
         end_dt = datetime.fromisoformat(end)
 
-        # Always group by Hour for maximum granularity
-        truncated_time = func.date_trunc('hour', Listen.played_at).label('timestamp')
-
-        results = db.query(
-            truncated_time,
-            func.sum(Track.duration).label('total_seconds')
-        ).join(
-            Track, Listen.track_id == Track.track_id
-        ).filter(
-            Listen.played_at.between(start_dt, end_dt)
-        ).group_by(
-            truncated_time
-        ).order_by(
-            truncated_time
-        ).all()
-
-        data = [
-            {
-                # Send raw ISO time
-                "timestamp": r.timestamp.isoformat(),
-                "minutes": int(r.total_seconds / 60) if r.total_seconds else 0
-            }
-            for r in results
-        ]
-        
-        return {"activity": data}
+        if granularity is None:
+            return {"activity": format_activity(hourly_series(db, user_id, start_dt, end_dt))}
+        series = bucketed_series(db, user_id, start_dt, end_dt, granularity, zone)
+        return {"granularity": granularity, "time_zone": zone, "activity": format_activity(series, "start")}
     except Exception as e:
         logger.error(f"Error fetching activity: {e}") # type: ignore
         raise HTTPException(status_code=500, detail=str(e))
@@ -162,19 +334,18 @@ def get_activity_stats(
 def get_minutes_listened(
     start: str = Query(...),
     end: str = Query(...),
+    compare: Optional[Literal["previous"]] = Query(None, description=COMPARE_DESCRIPTION),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     try:
         start_datetime = datetime.fromisoformat(start)
         end_datetime = datetime.fromisoformat(end)
 
-        total_duration_seconds = db.query(Listen, Track).join(
-            Track, Listen.track_id == Track.track_id
-        ).filter(
-            Listen.played_at.between(start_datetime, end_datetime)
-        ).with_entities(func.sum(Track.duration)).scalar() or 0
+        ranges = compared_ranges(start_datetime, end_datetime, compare)
+        totals = range_totals_many(db, user_id, ranges)
 
-        return {"minutes_listened": int(total_duration_seconds // 60)}
+        return with_comparison("minutes_listened", [t["seconds"] // 60 for t in totals], ranges)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -184,27 +355,18 @@ def get_minutes_listened(
 def get_listened_artists(
     start: str = Query(..., description="Start datetime in ISO format"),
     end: str = Query(..., description="End datetime in ISO format"),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """
     Count unique artists listened to in a time range.
-    Matches the frontend useListenedArtists hook.
+    Whole days come from the play counters, only the partial edge days scan listens.
     """
     try:
         start_datetime = datetime.fromisoformat(start)
         end_datetime = datetime.fromisoformat(end)
 
-        # Join: Listen -> Track -> track_artists (association) -> Artist
-        # Count distinct Artist IDs found in this range
-        artist_count = db.query(func.count(func.distinct(Artist.artist_id))).join(
-            track_artists, Artist.artist_id == track_artists.c.artist_id
-        ).join(
-            Track, Track.track_id == track_artists.c.track_id
-        ).join(
-            Listen, Listen.track_id == Track.track_id
-        ).filter(
-            Listen.played_at.between(start_datetime, end_datetime)
-        ).scalar()
+        artist_count = count_entities(db, user_id, "artist", start_datetime, end_datetime)
 
         return {"artist_count": artist_count}
     except Exception as e:
@@ -1,10 +1,14 @@
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-import requests
-from app.database import get_db
-from app.utils.spotify import get_valid_spotify_token
+from app import player
+from app.events import hub, sse_event, KEEPALIVE_SECONDS, SSE_KEEPALIVE, SSE_HEADERS
+from app.utils import spotify_client
+from app.utils.rate_governor import governor
+from app.utils.users import get_user_id
 
 load_dotenv()
 
@@ -14,82 +18,70 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/currently-playing")
-def get_currently_playing(db: Session = Depends(get_db)):
+def get_currently_playing(user_id: int = Depends(get_user_id)):
     """
-    Removed manual `db = SessionLocal()` creation.
-    FastAPI now handles opening and closing the session automatically.
+    Latest player state, served from the snapshot kept up to date by the worker's poller.
+    Progress is extrapolated to now, so no Spotify call is made per request.
     """
     try:
-        token = get_valid_spotify_token(db)
-        if not token:
-            raise HTTPException(status_code=500, detail="Server configuration error: Token missing")
-
-        url = "https://api.spotify.com/v1/me/player" 
-        headers = {"Authorization": f"Bearer {token}"}
-    
-        response = requests.get(url, headers=headers)
+        snapshot = player.get_snapshot(user_id, hub.listening)
+        if snapshot is None:
+            raise HTTPException(status_code=503, detail="Player state not available yet")
+        return player.public_state(snapshot)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Could not read player state")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if response.status_code == 200:
-            data = response.json()
-            logger.info(f"Full State fetched. Device: {data.get('device', {}).get('name')}, Shuffle: {data.get('shuffle_state')}")
-            return data
+@router.get("/currently-playing/stream")
+async def stream_currently_playing(request: Request, user_id: int = Depends(get_user_id)):
+    """
+    Server-sent events: the current player state right away, then every change.
+    All subscribers share the single upstream poller.
+    """
+    subscription = hub.subscribe(player.CHANNEL, max_size=16)
 
-        elif response.status_code == 204:
-            return {
-                "is_playing": False,
-                "item": None,
-                "device": {},
-                "shuffle_state": False,
-                "repeat_state": "off"
-            }
-        
-        else:
-            logger.error(f"Error: {response.status_code}")
-            return {"error": f"Failed - StatusCode: {response.status_code}"}
+    async def events():
+        try:
+            snapshot = await run_in_threadpool(player.get_snapshot, user_id, hub.listening)
+            if snapshot is not None:
+                yield sse_event(player.public_state(snapshot), event="player")
+            while not await request.is_disconnected():
+                try:
+                    changes = await subscription.get(KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield SSE_KEEPALIVE
+                    continue
+                for event in changes:
+                    if event["user_id"] == user_id:
+                        yield sse_event(event["state"], event="player")
+        finally:
+            hub.unsubscribe(subscription)
 
-    except requests.exceptions.RequestException as e:
-        logger.exception("Network error")
-        raise HTTPException(status_code=503, detail="Spotify API unreachable")
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @router.get("/check-rate-limit")
-def check_rate_limit(db: Session = Depends(get_db)):
+def check_rate_limit():
     """
     Checks if the Spotify API rate limit has been reached.
+    Answered from the rate governor's state (429s seen by any process), without calling Spotify.
     Returns:
         is_reached (bool): True if rate limited
         wait_time_minutes (float): Minutes to wait before retry
+        tokens_available (float): Remaining client-side budget
     """
     try:
-        token = get_valid_spotify_token(db)
-        
-        headers = {"Authorization": f"Bearer {token}"}
-
-        response = requests.get("https://api.spotify.com/v1/me", headers=headers)
-
-        if response.status_code == 429:
-            retry_after_seconds = int(response.headers.get("Retry-After", 60))
-            wait_minutes = round(retry_after_seconds / 60.0, 2)
-            
-            return {
-                "is_reached": True,
-                "wait_time_minutes": wait_minutes
-            }
-        
-        elif response.status_code == 200:
-            return {
-                "is_reached": False,
-                "wait_time_minutes": 0
-            }
-        
-        elif response.status_code == 401:
-            raise HTTPException(status_code=500, detail="Authentication failed. Please login again.")
-            
-        else:
-            return {
-                "is_reached": False,
-                "wait_time_minutes": 0,
-                "note": f"Unexpected status code: {response.status_code}"
-            }
-
+        state = governor.state()
+        return {
+            "is_reached": state["is_reached"],
+            "wait_time_minutes": round(state["wait_time_seconds"] / 60.0, 2),
+            "tokens_available": state["tokens_available"],
+        }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/spotify-stats")
+def get_spotify_stats():
+    """Call counts, errors, retries and latencies of Spotify calls made by this process, per endpoint."""
+    return spotify_client.call_stats()
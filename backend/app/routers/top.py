@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, distinct
@@ -5,24 +6,39 @@ from app.database import get_db
 from datetime import datetime
 from app.models import (
     Album, 
-    Listen, 
     Artist, 
     Track, 
     track_artists, 
-    track_album, 
     album_artists
 )
-from app.utils.spotify import enrich_artist_images 
+from app.rollups import top_entities, entity_counts_many, compared_ranges
+from app.utils.users import get_user_id
 
 router = APIRouter(prefix="/top", tags=["top"])
 
+COMPARE_DESCRIPTION = "previous: add each entry's play count in the range of the same length right before, and the delta"
+
 PLACEHOLDER_IMAGE_URL = "https://dummyimage.com/100/fff/0011ff.png&text=Image+Not+Found"
 
+def add_comparison(db: Session, user_id: int, entity_type: str, result: list, id_key: str, ranges: list) -> list:
+    """Adds the play count in the compared range (compare=previous) and the delta to every entry."""
+    if len(ranges) < 2:
+        return result
+    previous = entity_counts_many(db, user_id, entity_type, ranges[1:], [entry[id_key] for entry in result])[0]
+    for entry in result:
+        entry["previous_listen_count"] = previous.get(entry[id_key], 0)
+        entry["delta"] = entry["listen_count"] - entry["previous_listen_count"]
+    return result
+
+# Ranking comes from the play counters (app/rollups.py), names and images are loaded for the top entries only
+
 @router.get("/top-artists")
 def get_top_artists(
     start: str = Query(..., description="Start datetime in ISO format"),
     end: str = Query(..., description="End datetime in ISO format"),
     limit: int = Query(10, description="Number of top artists to return"),
+    compare: Optional[Literal["previous"]] = Query(None, description=COMPARE_DESCRIPTION),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Get the top artists within a time range."""
@@ -30,26 +46,15 @@ def get_top_artists(
         start_datetime = datetime.fromisoformat(start)
         end_datetime = datetime.fromisoformat(end)
 
-        top_artists_data = (
-            db.query(
-                Artist, 
-                func.count(Listen.listen_id).label("listen_count")
-            )
-            .join(track_artists, Artist.artist_id == track_artists.c.artist_id)
-            .join(Track, Track.track_id == track_artists.c.track_id)
-            .join(Listen, Listen.track_id == Track.track_id)
-            .filter(Listen.played_at.between(start_datetime, end_datetime))
-            .group_by(Artist)
-            .order_by(func.count(Listen.listen_id).desc())
-            .limit(limit)
-            .all()
-        )
+        ranked = top_entities(db, user_id, "artist", start_datetime, end_datetime, limit)
+        artists = {
+            artist.artist_id: artist
+            for artist in db.query(Artist).filter(Artist.artist_id.in_([artist_id for artist_id, _ in ranked])).all()
+        }
+        top_artists_data = [(artists[artist_id], listen_count) for artist_id, listen_count in ranked if artist_id in artists]
     
         result = []
         for artist, listen_count in top_artists_data:
-            
-            enrich_artist_images(artist, db)
-
             result.append({
                 "artist_id": artist.artist_id,
                 "name": artist.name,
@@ -57,6 +62,8 @@ def get_top_artists(
                 "listen_count": listen_count
             })
 
+        add_comparison(db, user_id, "artist", result, "artist_id", compared_ranges(start_datetime, end_datetime, compare))
+
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -66,6 +73,8 @@ def get_top_tracks(
     start: str = Query(..., description="Start datetime in ISO format"),
     end: str = Query(..., description="End datetime in ISO format"),
     limit: int = Query(10, description="Number of top tracks to return"),
+    compare: Optional[Literal["previous"]] = Query(None, description=COMPARE_DESCRIPTION),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Get the top tracks within a time range."""
@@ -73,23 +82,23 @@ def get_top_tracks(
         start_datetime = datetime.fromisoformat(start)
         end_datetime = datetime.fromisoformat(end)
 
-        top_tracks = (
-            db.query(
+        ranked = top_entities(db, user_id, "track", start_datetime, end_datetime, limit)
+        tracks = {
+            track.track_id: track
+            for track in db.query(
                 Track.track_id,
                 Track.name,
                 Track.image_url_small.label("small"),
-                func.count(distinct(Listen.listen_id)).label("listen_count"),
                 func.string_agg(distinct(Artist.name), ", ").label("artist_name")
             )
-            .join(track_artists, Track.track_id == track_artists.c.track_id)
-            .join(Artist, Artist.artist_id == track_artists.c.artist_id)
-            .join(Listen, Listen.track_id == Track.track_id)
-            .filter(Listen.played_at.between(start_datetime, end_datetime))
+            .outerjoin(track_artists, Track.track_id == track_artists.c.track_id)
+            .outerjoin(Artist, Artist.artist_id == track_artists.c.artist_id)
+            .filter(Track.track_id.in_([track_id for track_id, _ in ranked]))
             .group_by(Track.track_id, Track.name, Track.image_url_small)
-            .order_by(func.count(distinct(Listen.listen_id)).desc())
-            .limit(limit)
             .all()
-        )
+        }
+        top_tracks = [tracks[track_id] for track_id, _ in ranked if track_id in tracks]
+        listen_counts = dict(ranked)
 
         result = [
             {
@@ -97,11 +106,13 @@ def get_top_tracks(
                 "name": track.name,
                 "cover_url": track.small or "YOUR_PLACEHOLDER_IMAGE_URL_HERE",
                 "artist_name": track.artist_name or "Unknown Artist",
-                "listen_count": track.listen_count
+                "listen_count": listen_counts[track.track_id]
             }
             for track in top_tracks
         ]
 
+        add_comparison(db, user_id, "track", result, "track_id", compared_ranges(start_datetime, end_datetime, compare))
+
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -112,6 +123,8 @@ def get_top_albums(
     start: str = Query(..., description="Start datetime in ISO format"),
     end: str = Query(..., description="End datetime in ISO format"),
     limit: int = Query(10, description="Number of top albums to return"),
+    compare: Optional[Literal["previous"]] = Query(None, description=COMPARE_DESCRIPTION),
+    user_id: int = Depends(get_user_id),
     db: Session = Depends(get_db)
 ):
     """Get the top albums within a time range."""
@@ -119,24 +132,23 @@ def get_top_albums(
         start_datetime = datetime.fromisoformat(start)
         end_datetime = datetime.fromisoformat(end)
 
-        top_albums = (
-            db.query(
+        ranked = top_entities(db, user_id, "album", start_datetime, end_datetime, limit)
+        albums = {
+            album.album_id: album
+            for album in db.query(
                 Album.album_id,
                 Album.name,
                 Album.image_url_small.label("small") , 
-                func.count(distinct(Listen.listen_id)).label("listen_count"),
                 func.string_agg(distinct(Artist.name), ", ").label("artist_name")
             )
-            .join(album_artists, Album.album_id == album_artists.c.album_id)
-            .join(Artist, Artist.artist_id == album_artists.c.artist_id)
-            .join(track_album, Album.album_id == track_album.c.album_id)
-            .join(Listen, Listen.track_id == track_album.c.track_id)
-            .filter(Listen.played_at.between(start_datetime, end_datetime))
+            .outerjoin(album_artists, Album.album_id == album_artists.c.album_id)
+            .outerjoin(Artist, Artist.artist_id == album_artists.c.artist_id)
+            .filter(Album.album_id.in_([album_id for album_id, _ in ranked]))
             .group_by(Album.album_id, Album.name, Album.image_url_small)
-            .order_by(func.count(distinct(Listen.listen_id)).desc())
-            .limit(limit)
             .all()
-        )
+        }
+        top_albums = [albums[album_id] for album_id, _ in ranked if album_id in albums]
+        listen_counts = dict(ranked)
 
         result = [
             {
@@ -144,11 +156,13 @@ def get_top_albums(
                 "name": album.name,
                 "cover_url": album.small or "YOUR_PLACEHOLDER_IMAGE_URL_HERE",
                 "artist_name": album.artist_name or "Unknown Artist",
-                "listen_count": album.listen_count
+                "listen_count": listen_counts[album.album_id]
             }
             for album in top_albums
         ]
 
+        add_comparison(db, user_id, "album", result, "album_id", compared_ranges(start_datetime, end_datetime, compare))
+
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -99,4 +99,24 @@ class TopAlbum(BaseModel):
     listen_count: int
     artist_name: str
 
+class IngestionRunOut(BaseModel):
+    run_id: int
+    user_id: Optional[int] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    status: str
+    token_seconds: float
+    fetch_seconds: float
+    normalize_seconds: float
+    write_seconds: float
+    items_fetched: int
+    items_new: int
+    items_duplicate: int
+    items_failed: int
+    artists_new: int
+    albums_new: int
+    tracks_new: int
+    error: Optional[str] = None
 
+    class Config:
+        from_attributes = True
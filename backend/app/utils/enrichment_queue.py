@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from typing import Iterable
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models import Artist, Album, Track, EnrichmentQueue
+from app.utils import upstream_cache
+
+ENTITY_TYPES = ("artist", "album", "track")
+
+# entity type -> (model, endpoint its Spotify objects are cached under)
+MODELS = {
+    "artist": (Artist, "artists"),
+    "album": (Album, "albums"),
+    "track": (Track, "tracks"),
+}
+
+def enqueue_enrichment(db: Session, entity_type: str, entity_ids: Iterable[int]):
+    """
+    Queues entities for the background enrichment worker.
+    Already queued entities are ignored. Does not commit.
+    """
+    if entity_type not in ENTITY_TYPES:
+        raise ValueError(f"Unknown entity type: {entity_type}")
+
+    ids = sorted(set(entity_ids))
+    if not ids:
+        return
+
+    now = datetime.now(timezone.utc)
+    stmt = (
+        pg_insert(EnrichmentQueue.__table__)
+        .values([
+            {"entity_type": entity_type, "entity_id": entity_id, "enqueued_at": now, "attempts": 0}
+            for entity_id in ids
+        ])
+        .on_conflict_do_nothing()
+    )
+    db.execute(stmt)
+
+def enqueue_missing_images(db: Session, entity_type: str, entity_ids: Iterable[int]):
+    """
+    Queues those of the entities that have no image yet, i.e. everything a read would show
+    with a placeholder. Entities whose Spotify object is still cached are skipped: the answer
+    was applied already or is negative (unknown ID, no images), fetching it again changes nothing.
+    Already queued entities are ignored. Does not commit.
+    """
+    ids = sorted(set(entity_ids))
+    if not ids:
+        return
+    model, endpoint = MODELS[entity_type]
+    pk = list(model.__table__.primary_key.columns)[0]
+
+    missing = db.query(pk, model.spotify_id).filter(pk.in_(ids), model.image_url_small.is_(None)).all()
+    if not missing:
+        return
+    cached = upstream_cache.get_entities(endpoint, [row.spotify_id for row in missing])
+    enqueue_enrichment(db, entity_type, [row[0] for row in missing if row.spotify_id not in cached])
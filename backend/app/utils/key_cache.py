@@ -0,0 +1,84 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Hashable, Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Artist, Album, Track
+
+KEY_CACHE_SIZE = int(os.getenv("KEY_CACHE_SIZE", "100000"))
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: Hashable, value: Any):
+        self.put_many({key: value})
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, items: Dict[Hashable, Any]):
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+# spotify_id -> primary key, one cache per dimension, shared by everything in this process
+dimension_keys: Dict[type, LRUCache] = {
+    Artist: LRUCache(KEY_CACHE_SIZE),
+    Album: LRUCache(KEY_CACHE_SIZE),
+    Track: LRUCache(KEY_CACHE_SIZE),
+}
+
+def warm_key_cache(db: Session):
+    """Loads the most recently created keys of every dimension, up to the cache size."""
+    for model, cache in dimension_keys.items():
+        pk = list(model.__table__.primary_key.columns)[0]
+        rows = db.execute(
+            select(model.__table__.c.spotify_id, pk).order_by(pk.desc()).limit(cache.max_size)
+        ).all()
+        # Oldest first so the newest keys end up as most recently used
+        cache.put_many({spotify_id: key for spotify_id, key in reversed(rows)})
+
+def key_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {model.__tablename__: cache.stats() for model, cache in dimension_keys.items()}
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Iterator, Optional
+
+import zstandard
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import RawPayload
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_LEVEL = 9
+# Payloads can be replayed for this long, 0 keeps them forever
+RETENTION_DAYS = int(os.getenv("RAW_PAYLOAD_RETENTION_DAYS", "90"))
+
+def compress_payload(data: Dict[str, Any]) -> bytes:
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(raw)
+
+def decompress_payload(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zstandard.ZstdDecompressor().decompress(blob))
+
+def archive_payloads(pages: List[Dict[str, Any]], user_id: int):
+    """
+    Stores raw recently-played responses, one row per page.
+    Committed on its own before processing, so a failing batch can always be replayed later.
+    Empty pages are not stored.
+    """
+    rows = []
+    fetched_at = datetime.now(timezone.utc)
+    for page in pages:
+        if not page.get("items"):
+            continue
+        played = [
+            datetime.fromisoformat(item["played_at"].replace("Z", "+00:00"))
+            for item in page["items"] if item.get("played_at")
+        ]
+        rows.append(RawPayload(
+            user_id=user_id,
+            fetched_at=fetched_at,
+            first_played_at=min(played) if played else None,
+            last_played_at=max(played) if played else None,
+            item_count=len(page["items"]),
+            payload=compress_payload(page),
+        ))
+    if not rows:
+        return
+
+    db = SessionLocal()
+    try:
+        db.add_all(rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not archive raw payloads: {e}")
+    finally:
+        db.close()
+
+def iter_archived_payloads(
+    db: Session, user_id: int, start: Optional[datetime], end: Optional[datetime],
+) -> Iterator[Dict[str, Any]]:
+    """Yields an account's archived responses overlapping [start, end] in fetch order."""
+    query = db.query(RawPayload.payload).filter(RawPayload.user_id == user_id)
+    if start is not None:
+        query = query.filter(RawPayload.last_played_at >= start)
+    if end is not None:
+        query = query.filter(RawPayload.first_played_at <= end)
+    for (blob,) in query.order_by(RawPayload.fetched_at, RawPayload.payload_id).yield_per(100):
+        yield decompress_payload(blob)
+
+def purge_old_payloads():
+    """Deletes responses fetched longer than RAW_PAYLOAD_RETENTION_DAYS ago."""
+    if not RETENTION_DAYS:
+        return
+    db = SessionLocal()
+    try:
+        result = db.execute(delete(RawPayload).where(
+            RawPayload.fetched_at < datetime.now(timezone.utc) - timedelta(days=RETENTION_DAYS)
+        ))
+        db.commit()
+        logger.info(f"Purged {result.rowcount} raw payloads")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not purge raw payloads: {e}")
+    finally:
+        db.close()
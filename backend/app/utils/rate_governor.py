@@ -0,0 +1,144 @@
+"""
+Client-side budget for Spotify Web API calls.
+
+A token bucket shared by all Spotify traffic of the process. Lower priority classes
+may only spend while a growing share of the bucket is left, so ingestion always
+has budget before enrichment, and enrichment before interactive/cosmetic calls.
+A 429 blocks everything until Retry-After has passed; the block is also written to
+the database so the other processes (API, worker) back off as well.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any
+
+import requests
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import SessionLocal
+from app.models import SpotifyRateLimit
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INGESTION = 0
+PRIORITY_ENRICHMENT = 1
+PRIORITY_INTERACTIVE = 2
+
+RATE_PER_SECOND = float(os.getenv("SPOTIFY_RATE_PER_SECOND", "3"))
+BUCKET_CAPACITY = float(os.getenv("SPOTIFY_BUCKET_CAPACITY", "30"))
+
+# Share of the bucket that has to stay untouched for each priority class
+RESERVED_SHARE = {
+    PRIORITY_INGESTION: 0.0,
+    PRIORITY_ENRICHMENT: 0.25,
+    PRIORITY_INTERACTIVE: 0.5,
+}
+
+# Ingestion waits for budget at most this long, everything else is deferred right away
+MAX_WAIT_SECONDS = 60
+SHARED_STATE_REFRESH_SECONDS = 10
+
+class SpotifyRateLimited(requests.exceptions.RequestException):
+    """Raised instead of sending a request that is over budget or inside a Retry-After window."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Spotify rate limit, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+class RateGovernor:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # monotonic
+        self.shared_checked = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _sync_shared_state(self):
+        """Picks up Retry-After windows recorded by other processes, at most every few seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self.shared_checked < SHARED_STATE_REFRESH_SECONDS:
+                return
+            self.shared_checked = now
+
+        db = SessionLocal()
+        try:
+            row = db.get(SpotifyRateLimit, 1)
+            if row and row.blocked_until:
+                remaining = (row.blocked_until - datetime.now(timezone.utc)).total_seconds()
+                if remaining > 0:
+                    with self._lock:
+                        self.blocked_until = max(self.blocked_until, time.monotonic() + remaining)
+        except Exception as e:
+            logger.warning(f"Could not read shared rate limit state: {e}")
+        finally:
+            db.close()
+
+    def acquire(self, priority: int):
+        """Takes one token. Waits only for ingestion, lower priorities raise SpotifyRateLimited."""
+        waited = 0.0
+        while True:
+            self._sync_shared_state()
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    reserve = RESERVED_SHARE[priority] * self.capacity
+                    if self.tokens - 1 >= reserve:
+                        self.tokens -= 1
+                        return
+                    delay = (reserve + 1 - self.tokens) / self.rate
+
+            if priority != PRIORITY_INGESTION or waited + delay > MAX_WAIT_SECONDS:
+                raise SpotifyRateLimited(delay)
+            time.sleep(delay)
+            waited += delay
+
+    def note_rate_limited(self, retry_after: float):
+        """Records a 429 from Spotify, locally and for the other processes."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.tokens = 0
+
+        blocked_until = datetime.now(timezone.utc) + timedelta(seconds=retry_after)
+        db = SessionLocal()
+        try:
+            stmt = pg_insert(SpotifyRateLimit.__table__).values(
+                id=1, blocked_until=blocked_until, updated_at=datetime.now(timezone.utc)
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={"blocked_until": stmt.excluded.blocked_until, "updated_at": stmt.excluded.updated_at},
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Could not store shared rate limit state: {e}")
+        finally:
+            db.close()
+
+    def state(self) -> Dict[str, Any]:
+        self._sync_shared_state()
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait_seconds = max(self.blocked_until - now, 0.0)
+            return {
+                "is_reached": wait_seconds > 0,
+                "wait_time_seconds": round(wait_seconds, 1),
+                "tokens_available": round(self.tokens, 1),
+                "capacity": self.capacity,
+            }
+
+governor = RateGovernor(RATE_PER_SECOND, BUCKET_CAPACITY)
@@ -0,0 +1,136 @@
+"""
+Cache of analytics responses between data changes.
+
+Successful GET responses of CACHED_PATHS are kept in memory, keyed by the session's
+account, path and normalized query string and tagged with the data version they were computed at
+(see app.data_version). The version moves whenever ingestion, enrichment or an
+import commits, entries of an older version are never served, so repeat requests
+between two ingests don't touch Postgres. The ETag is derived from key and version
+only, both are the same in every API process and across restarts, so whichever
+process gets a matching If-None-Match answers it with 304. Bodies of at least
+COMPRESS_MIN_BYTES are sent gzip (or brotli, if installed) compressed, once
+compressed per entry.
+
+Changes can go unnoticed while the event hub has no LISTEN connection, the cache is
+bypassed until it is back. Entries also expire after RESPONSE_CACHE_TTL_SECONDS and
+at midnight, when the current streak can end without any data change.
+"""
+import gzip
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+
+from fastapi import Request
+from starlette.responses import Response
+
+from app import data_version
+from app.events import hub
+from app.rollups import APP_TIME_ZONE
+from app.utils.key_cache import LRUCache
+from app.utils.users import SESSION_COOKIE, session_user_id
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+CACHED_PATHS = {
+    "/listens/count",
+    "/listens/minutes",
+    "/listens/activity",
+    "/listens/artists",
+    "/listens/streak",
+    "/top/top-artists",
+    "/top/top-tracks",
+    "/top/top-albums",
+    "/dashboard/summary",
+}
+# Preferred first
+ENCODINGS = ["br", "gzip"] if brotli else ["gzip"]
+# Clients may keep the body but have to revalidate it, which is cheap. Shared caches may not keep it.
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding, Cookie"}
+
+_entries = LRUCache(RESPONSE_CACHE_SIZE)
+
+def request_key(request: Request, user_id: int) -> str:
+    """Account, path and query parameters in a fixed order, so equal requests share an entry."""
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{user_id}:{request.url.path}?{query}"
+
+def _expires_at() -> float:
+    tz = ZoneInfo(APP_TIME_ZONE)
+    midnight = datetime.combine(datetime.now(tz).date() + timedelta(days=1), datetime.min.time(), tz)
+    return min(time.time() + RESPONSE_CACHE_TTL_SECONDS, midnight.timestamp())
+
+def _etag(key: str, version: int) -> str:
+    return '"' + hashlib.sha1(f"{version}|{key}".encode()).hexdigest()[:20] + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    return etag in tags or "*" in tags
+
+def _encoding(request: Request, size: int) -> Optional[str]:
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("accept-encoding", "").split(",")}
+    return next((encoding for encoding in ENCODINGS if encoding in accepted), None)
+
+def _compress(entry: Dict[str, Any], encoding: str) -> bytes:
+    if encoding not in entry["encoded"]:
+        body = entry["body"]
+        entry["encoded"][encoding] = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, 6)
+    return entry["encoded"][encoding]
+
+def _respond(request: Request, entry: Dict[str, Any]) -> Response:
+    headers = {**CACHE_HEADERS, "ETag": entry["etag"]}
+    if _not_modified(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    body = entry["body"]
+    encoding = _encoding(request, len(body))
+    if encoding:
+        body = _compress(entry, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, headers={**headers, "Content-Type": entry["content_type"]})
+
+async def cache_responses(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    """HTTP middleware, answers repeated GETs of CACHED_PATHS from memory."""
+    if request.method != "GET" or request.url.path not in CACHED_PATHS or not hub.listening:
+        return await call_next(request)
+
+    # Without a session the endpoint answers 401, there is nothing to cache
+    user_id = session_user_id(request.cookies.get(SESSION_COOKIE))
+    if user_id is None:
+        return await call_next(request)
+
+    key = request_key(request, user_id)
+    # Read before computing: a change committed meanwhile leaves the entry already outdated
+    version = data_version.current()
+    if version is None:
+        return await call_next(request)
+    entry = _entries.get(key)
+    if entry and entry["version"] == version and entry["expires_at"] > time.time():
+        return _respond(request, entry)
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+    entry = {
+        "version": version,
+        "etag": _etag(key, version),
+        "body": body,
+        "content_type": response.headers.get("content-type", "application/json"),
+        "encoded": {},
+        "expires_at": _expires_at(),
+    }
+    _entries.put(key, entry)
+    return _respond(request, entry)
@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete
+
+from app.database import SessionLocal
+from app.models import IngestionRun
+
+logger = logging.getLogger(__name__)
+
+# 0 keeps every run
+RUN_RETENTION_DAYS = int(os.getenv("INGESTION_RUN_RETENTION_DAYS", "30"))
+
+STAGES = ("token", "fetch", "normalize", "write")
+
+class RunRecorder:
+    """
+    Collects per-stage timings and counters of one ingestion run.
+    The run is saved in its own session, so it survives a rollback of the ingestion transaction.
+    """
+
+    def __init__(self, user_id: Optional[int] = None):
+        self.run = IngestionRun(
+            user_id=user_id,
+            started_at=datetime.now(timezone.utc),
+            status="running",
+            **{f"{stage}_seconds": 0.0 for stage in STAGES},
+            items_fetched=0, items_new=0, items_duplicate=0, items_failed=0,
+            artists_new=0, albums_new=0, tracks_new=0,
+        )
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            column = f"{name}_seconds"
+            setattr(self.run, column, getattr(self.run, column) + time.perf_counter() - started)
+
+    def count(self, **counters):
+        for name, value in counters.items():
+            setattr(self.run, name, value)
+
+    def fail(self, error: Exception):
+        self.run.status = "failed" # type: ignore
+        self.run.error = f"{type(error).__name__}: {error}" # type: ignore
+
+    def save(self, status: str = None):
+        if status and self.run.status == "running":
+            self.run.status = status # type: ignore
+        self.run.finished_at = datetime.now(timezone.utc) # type: ignore
+
+        db = SessionLocal()
+        try:
+            db.add(self.run)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Could not save ingestion run: {e}")
+        finally:
+            db.close()
+
+def purge_old_runs():
+    """Deletes runs older than INGESTION_RUN_RETENTION_DAYS."""
+    if not RUN_RETENTION_DAYS:
+        return
+    db = SessionLocal()
+    try:
+        result = db.execute(delete(IngestionRun).where(
+            IngestionRun.started_at < datetime.now(timezone.utc) - timedelta(days=RUN_RETENTION_DAYS)
+        ))
+        db.commit()
+        logger.info(f"Purged {result.rowcount} ingestion runs")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not purge ingestion runs: {e}")
+    finally:
+        db.close()
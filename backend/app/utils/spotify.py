@@ -1,89 +1,107 @@
 import os
-import requests
-from app.models import Artist, SpotifyToken
+import threading
+from typing import Dict, Optional, Tuple
+from app.models import SpotifyToken
+from app.utils import spotify_client
+from app.utils.users import default_user_id
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
-def get_valid_spotify_token(db: Session) -> str:
+# Tokens are refreshed this long before they actually expire
+REFRESH_MARGIN = timedelta(seconds=60)
+
+# In-process copies of the access tokens: user_id -> (access_token, expires_at)
+_cached_tokens: Dict[int, Tuple[str, datetime]] = {}
+# One refresh lock per account, so accounts don't wait for each other's refreshes
+_token_locks: Dict[int, threading.Lock] = {}
+_token_locks_lock = threading.Lock()
+
+def _token_lock(user_id: int) -> threading.Lock:
+    with _token_locks_lock:
+        return _token_locks.setdefault(user_id, threading.Lock())
+
+def _is_fresh(expires_at: datetime) -> bool:
+    return expires_at.replace(tzinfo=None) > datetime.now() + REFRESH_MARGIN
+
+def cache_spotify_token(token_record: SpotifyToken):
+    """Remembers a token that was just written, e.g. by the login callback."""
+    _cached_tokens[token_record.user_id] = (token_record.access_token, token_record.expires_at) # type: ignore
+
+def invalidate_spotify_token(user_id: Optional[int] = None):
+    """
+    Drops the in-process token of an account (all accounts if None). The next call re-reads the DB.
+    Call this when Spotify rejects the token, another process may have rotated it.
     """
-    Retrieves a valid access token.
-    If expired, it automatically refreshes it.
+    if user_id is None:
+        _cached_tokens.clear()
+    else:
+        _cached_tokens.pop(user_id, None)
+
+def get_valid_spotify_token(db: Session, user_id: Optional[int] = None) -> str:
+    """
+    Retrieves a valid access token of an account (the first account if None).
+    Served from memory until shortly before expiry. Concurrent refreshes in this process
+    are coalesced into a single request, and the row lock serializes refreshes across processes.
     Returns the access token string.
     """
-    token_record = db.query(SpotifyToken).first()
-    
-    if not token_record:
-        raise Exception("No Spotify token found. Please login first.")
+    if user_id is None:
+        user_id = default_user_id(db)
+        if user_id is None:
+            raise Exception("No Spotify token found. Please login first.")
+
+    cached = _cached_tokens.get(user_id)
+    if cached and _is_fresh(cached[1]):
+        return cached[0]
+
+    with _token_lock(user_id):
+        # Another thread may have refreshed while we were waiting
+        cached = _cached_tokens.get(user_id)
+        if cached and _is_fresh(cached[1]):
+            return cached[0]
+
+        token_record = db.query(SpotifyToken).filter(SpotifyToken.user_id == user_id).with_for_update().first()
 
-    now = datetime.now()
+        if not token_record:
+            db.rollback()
+            raise Exception("No Spotify token found. Please login first.")
+
+        if _is_fresh(token_record.expires_at): # type: ignore
+            # Still valid, or already rotated by another process
+            cached = (token_record.access_token, token_record.expires_at)
+            db.commit()
+            _cached_tokens[user_id] = cached # type: ignore
+            return cached[0] # type: ignore
+
+        print(f"Token of user {user_id} expired. Refreshing...")
 
-    if token_record.expires_at.replace(tzinfo=None) <= now + timedelta(seconds=60):
-        print("Token expired. Refreshing...")
-        
         payload = {
             "grant_type": "refresh_token",
             "refresh_token": token_record.refresh_token,
             "client_id": CLIENT_ID,
             "client_secret": CLIENT_SECRET,
         }
-        
-        response = requests.post("https://accounts.spotify.com/api/token", data=payload)
-        
+
+        response = spotify_client.post_token(payload)
+
         if response.status_code != 200:
+            db.rollback()
             raise Exception(f"Failed to refresh token: {response.text}")
-            
+
         data = response.json()
-        
+
         token_record.access_token = data["access_token"]
-        
+
         if "refresh_token" in data:
             token_record.refresh_token = data["refresh_token"]
-            
+
         token_record.expires_at = datetime.now() + timedelta(seconds=data.get("expires_in", 3600)) # type: ignore
-        
+
+        # Read before the commit expires the record
+        refreshed = (token_record.access_token, token_record.expires_at)
         db.commit()
-        
-    return token_record.access_token # type: ignore
+        _cached_tokens[user_id] = refreshed # type: ignore
 
-def enrich_artist_images(artist: Artist, db: Session):
-    """
-    Checks if artist has images. If not, fetches from Spotify, updates DB.
-    """
-    if getattr(artist, "image_url_small", None):
-        return
-
-    try:
-        token = get_valid_spotify_token(db)
-        if token is None:
-            print("No Spotify token available, skipping image fetch.")
-            return
-
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"https://api.spotify.com/v1/artists/{artist.spotify_id}", headers=headers)
-        
-        if response.status_code == 200:
-            data = response.json()
-            images = data.get("images", [])
-            
-            if images:
-                images.sort(key=lambda x: x.get('height', 0), reverse=True)
-                
-                large_url = images[0]['url'] if len(images) > 0 else None
-                medium_url = images[len(images)//2]['url'] if len(images) > 1 else None
-                small_url = images[-1]['url'] if len(images) > 0 else None
-
-                setattr(artist, "image_url_large", large_url)
-                setattr(artist, "image_url_medium", medium_url)
-                setattr(artist, "image_url_small", small_url)
-                
-                db.commit()
-                print(f"Fetched and saved images for artist: {artist.name}")
-        else:
-            print(f"Failed to fetch artist {artist.spotify_id}: {response.status_code}")
-
-    except Exception as e:
-        print(f"Error fetching artist images: {e}")
-        pass
\ No newline at end of file
+        return refreshed[0] # type: ignore
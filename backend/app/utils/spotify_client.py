@@ -0,0 +1,160 @@
+"""
+Shared HTTP client for every call to Spotify.
+
+One keep-alive connection pool for the whole process, per-endpoint timeouts,
+retries with jittered exponential backoff on connection errors, 429 and 5xx
+(honoring Retry-After), and per-endpoint latency counters. Web API calls spend
+budget from the rate governor in their priority class, see rate_governor.py.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.rate_governor import governor, PRIORITY_INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+API_BASE = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", "20"))
+MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+# Longer Retry-After values are not slept through, the response is returned to the caller
+MAX_RETRY_AFTER_SECONDS = 60
+DEFAULT_RETRY_AFTER_SECONDS = 5
+SLOW_CALL_SECONDS = 2.0
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUTS = {
+    "player": 5,
+    "me": 5,
+    "token": 10,
+    "recently-played": 15,
+    "tracks": 15,
+    "albums": 15,
+    "artists": 15,
+}
+DEFAULT_READ_TIMEOUT = 10
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=0)
+_session.mount("https://", _adapter)
+
+_stats: Dict[str, Dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+def _record(endpoint: str, seconds: float, status: Optional[int], retried: bool):
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {
+            "calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+        })
+        stats["calls"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if status is None or status >= 400:
+            stats["errors"] += 1
+        if retried:
+            stats["retries"] += 1
+
+    if seconds >= SLOW_CALL_SECONDS:
+        logger.warning(f"Slow Spotify call: {endpoint} took {seconds:.2f}s (status {status})")
+
+def call_stats() -> Dict[str, Dict[str, float]]:
+    """Per-endpoint call counts and latencies of this process."""
+    with _stats_lock:
+        return {
+            endpoint: {
+                **stats,
+                "avg_seconds": stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0,
+            }
+            for endpoint, stats in _stats.items()
+        }
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        return None
+
+def request(
+    method: str,
+    url: str,
+    endpoint: str,
+    token: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    data: Optional[Dict[str, Any]] = None,
+    retries: int = MAX_RETRIES,
+    priority: Optional[int] = PRIORITY_INTERACTIVE,
+    headers: Optional[Dict[str, str]] = None,
+) -> requests.Response:
+    """
+    Sends a request through the shared pool.
+    Every attempt spends budget from the rate governor in the given priority class (None bypasses it).
+    Connection errors are re-raised once retries are exhausted, error responses are returned as is.
+    Raises SpotifyRateLimited when the call has to be deferred.
+    """
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    timeout = (CONNECT_TIMEOUT, READ_TIMEOUTS.get(endpoint, DEFAULT_READ_TIMEOUT))
+
+    attempt = 0
+    while True:
+        if priority is not None:
+            governor.acquire(priority)
+
+        delay = 0.0
+        started = time.perf_counter()
+        try:
+            response = _session.request(method, url, params=params, data=data, headers=headers, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _record(endpoint, time.perf_counter() - started, None, attempt > 0)
+            if attempt >= retries:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Spotify {endpoint} failed ({e}), retrying in {delay:.1f}s")
+        else:
+            _record(endpoint, time.perf_counter() - started, response.status_code, attempt > 0)
+            if response.status_code == 429:
+                retry_after = retry_after_seconds(response)
+                # The governor blocks further calls (including our retry) until the window has passed
+                governor.note_rate_limited(retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_SECONDS)
+                if attempt >= retries or priority is None or (retry_after or 0) > MAX_RETRY_AFTER_SECONDS:
+                    return response
+                logger.warning(f"Spotify {endpoint} returned 429, retry after {retry_after}s")
+            elif response.status_code >= 500:
+                if attempt >= retries:
+                    return response
+                delay = backoff_delay(attempt)
+                logger.warning(f"Spotify {endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+            else:
+                return response
+
+        time.sleep(delay)
+        attempt += 1
+
+def get(path: str, token: str, endpoint: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+    """GET against the Web API, e.g. get("/me/player", token, endpoint="player")."""
+    return request("GET", f"{API_BASE}{path}", endpoint, token=token, params=params, **kwargs)
+
+def post_token(data: Dict[str, Any]) -> requests.Response:
+    """
+    POST to the accounts service token endpoint (code exchange and refresh).
+    The accounts service is not part of the Web API quota, so it bypasses the governor.
+    """
+    return request("POST", TOKEN_URL, "token", data=data, priority=None)
@@ -0,0 +1,216 @@
+"""
+Cache for Spotify GET responses.
+
+Entries live in a bounded in-memory LRU and, unless UPSTREAM_CACHE_PERSIST=false,
+in the spotify_response_cache table so they survive restarts and are shared
+between processes. Every resource has its own TTL. 404s and "empty" answers
+(e.g. an artist without images) are cached as negative entries so they are not
+refetched on every request. Expired entries with an ETag are revalidated with
+If-None-Match instead of being downloaded again.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Callable, Iterable, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import SessionLocal
+from app.models import SpotifyResponseCache
+from app.utils import spotify_client
+from app.utils.key_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("UPSTREAM_CACHE_SIZE", "10000"))
+PERSIST = os.getenv("UPSTREAM_CACHE_PERSIST", "true").lower() == "true"
+
+DAY = 24 * 3600
+# endpoint -> seconds a positive answer stays fresh
+TTLS = {
+    "me": 3600,
+    "artists": 7 * DAY,
+    "albums": 30 * DAY,
+    "tracks": 30 * DAY,
+}
+DEFAULT_TTL = 3600
+NEGATIVE_TTL = DAY
+# Expired rows are kept this long for ETag revalidation before they are purged
+STALE_RETENTION = timedelta(days=30)
+
+_memory = LRUCache(CACHE_SIZE)
+
+def cache_key(scope: str, path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params)) if params else ""
+    return f"{scope}:{path}?{query}" if query else f"{scope}:{path}"
+
+def entity_key(endpoint: str, spotify_id: str) -> str:
+    """Single entities are keyed like GET /v1/{endpoint}/{id}, however they were fetched."""
+    return cache_key("", f"/{endpoint}/{spotify_id}")
+
+def _ttl(endpoint: str, negative: bool) -> int:
+    return NEGATIVE_TTL if negative else TTLS.get(endpoint, DEFAULT_TTL)
+
+def _entry(status: int, body: Any, etag: Optional[str], negative: bool, endpoint: str) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "body": body,
+        "etag": etag,
+        "negative": negative,
+        "expires_at": time.time() + _ttl(endpoint, negative),
+    }
+
+def is_fresh(entry: Dict[str, Any]) -> bool:
+    return entry["expires_at"] > time.time()
+
+def load(keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Looks keys up in memory first, then in the database. Returns fresh and stale entries."""
+    keys = list(keys)
+    found = _memory.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if not missing or not PERSIST:
+        return found
+
+    db = SessionLocal()
+    try:
+        rows = db.query(SpotifyResponseCache).filter(SpotifyResponseCache.cache_key.in_(missing)).all()
+        loaded = {
+            row.cache_key: {
+                "status": row.status,
+                "body": row.body,
+                "etag": row.etag,
+                "negative": row.negative,
+                "expires_at": row.expires_at.timestamp(),
+            }
+            for row in rows
+        }
+    except Exception as e:
+        logger.warning(f"Could not read upstream cache: {e}")
+        loaded = {}
+    finally:
+        db.close()
+
+    _memory.put_many(loaded)
+    found.update(loaded)
+    return found
+
+def store(entries: Dict[str, Dict[str, Any]]):
+    if not entries:
+        return
+    _memory.put_many(entries)
+    if not PERSIST:
+        return
+
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        stmt = pg_insert(SpotifyResponseCache.__table__).values([
+            {
+                "cache_key": key,
+                "status": entry["status"],
+                "etag": entry["etag"],
+                "body": entry["body"],
+                "negative": entry["negative"],
+                "expires_at": datetime.fromtimestamp(entry["expires_at"], timezone.utc),
+                "updated_at": now,
+            }
+            for key, entry in sorted(entries.items())
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["cache_key"],
+            set_={column: stmt.excluded[column] for column in ("status", "etag", "body", "negative", "expires_at", "updated_at")},
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not write upstream cache: {e}")
+    finally:
+        db.close()
+
+def invalidate(key: str):
+    _memory.pop(key)
+    if not PERSIST:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(delete(SpotifyResponseCache).where(SpotifyResponseCache.cache_key == key))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not invalidate upstream cache: {e}")
+    finally:
+        db.close()
+
+def cached_get(
+    path: str,
+    token: str,
+    endpoint: str,
+    params: Optional[Dict[str, Any]] = None,
+    scope: str = "",
+    negative_if: Optional[Callable[[Any], bool]] = None,
+    **kwargs,
+) -> Tuple[int, Any]:
+    """
+    GET through the cache. Returns (status, body); body is None for non-200 answers.
+    Errors other than 404 are never cached.
+    """
+    key = cache_key(scope, path, params)
+    entry = load([key]).get(key)
+    if entry and is_fresh(entry):
+        return entry["status"], entry["body"]
+
+    headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") else None
+    response = spotify_client.get(path, token, endpoint=endpoint, params=params, headers=headers, **kwargs)
+
+    if response.status_code == 304 and entry:
+        entry = {**entry, "expires_at": time.time() + _ttl(endpoint, entry["negative"])}
+        store({key: entry})
+        return entry["status"], entry["body"]
+
+    if response.status_code == 200:
+        body = response.json()
+        negative = bool(negative_if and negative_if(body))
+        store({key: _entry(200, body, response.headers.get("ETag"), negative, endpoint)})
+        return 200, body
+
+    if response.status_code == 404:
+        store({key: _entry(404, None, None, True, endpoint)})
+
+    return response.status_code, None
+
+def get_entities(endpoint: str, spotify_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Fresh cached entities by spotify_id. Negative entries are included with body None."""
+    keys = {entity_key(endpoint, spotify_id): spotify_id for spotify_id in spotify_ids}
+    return {
+        keys[key]: entry
+        for key, entry in load(keys).items()
+        if is_fresh(entry)
+    }
+
+def store_entities(endpoint: str, objects: Dict[str, Any], negative_if: Optional[Callable[[Any], bool]] = None):
+    """Caches entities fetched through a multi-ID endpoint. None means Spotify doesn't know the ID."""
+    store({
+        entity_key(endpoint, spotify_id): (
+            _entry(404, None, None, True, endpoint) if obj is None
+            else _entry(200, obj, None, bool(negative_if and negative_if(obj)), endpoint)
+        )
+        for spotify_id, obj in objects.items()
+    })
+
+def purge_expired():
+    """Deletes rows that expired longer ago than the revalidation window."""
+    if not PERSIST:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(delete(SpotifyResponseCache).where(
+            SpotifyResponseCache.expires_at < datetime.now(timezone.utc) - STALE_RETENTION
+        ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not purge upstream cache: {e}")
+    finally:
+        db.close()
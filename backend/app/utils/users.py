@@ -0,0 +1,96 @@
+"""
+Accounts and the session that binds a browser to one of them.
+
+/auth/callback sets SESSION_COOKIE, "<user_id>.<issued at>.<signature>", signed with
+HMAC-SHA256 under SESSION_SECRET. Requests without a valid, unexpired session are
+rejected with 401; the account is never taken from the request itself.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from typing import List, Optional
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models import User, SpotifyToken
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "spotihost_session"
+SESSION_MAX_AGE_SECONDS = int(os.getenv("SESSION_MAX_AGE_DAYS", "30")) * 24 * 3600
+SESSION_COOKIE_SECURE = os.getenv("SESSION_COOKIE_SECURE", "false").lower() == "true"
+SESSION_COOKIE_SAMESITE = os.getenv("SESSION_COOKIE_SAMESITE", "lax")
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    # Still safe, but sessions don't survive a restart and aren't shared between processes
+    logger.warning("SESSION_SECRET is not set, using a random secret for this process")
+    SESSION_SECRET = secrets.token_hex(32)
+
+def default_user_id(db: Session) -> Optional[int]:
+    """The first account, used by CLIs and jobs when no user is given (single-account setups)."""
+    return db.query(func.min(User.user_id)).scalar()
+
+def _signature(message: str) -> str:
+    digest = hmac.new(SESSION_SECRET.encode(), message.encode(), hashlib.sha256).digest()  # type: ignore
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def session_token(user_id: int) -> str:
+    message = f"{user_id}.{int(time.time())}"
+    return f"{message}.{_signature(message)}"
+
+def session_user_id(token: Optional[str]) -> Optional[int]:
+    """The account of a session token, None if it is missing, forged or expired."""
+    if not token:
+        return None
+    message, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature, _signature(message)):
+        return None
+    user_id, _, issued_at = message.partition(".")
+    try:
+        if time.time() - int(issued_at) > SESSION_MAX_AGE_SECONDS:
+            return None
+        return int(user_id)
+    except ValueError:
+        return None
+
+def set_session(response: Response, user_id: int):
+    response.set_cookie(
+        SESSION_COOKIE, session_token(user_id), max_age=SESSION_MAX_AGE_SECONDS,
+        httponly=True, secure=SESSION_COOKIE_SECURE, samesite=SESSION_COOKIE_SAMESITE,  # type: ignore
+    )
+
+def clear_session(response: Response):
+    response.delete_cookie(
+        SESSION_COOKIE, httponly=True, secure=SESSION_COOKIE_SECURE, samesite=SESSION_COOKIE_SAMESITE,  # type: ignore
+    )
+
+def get_user_id(request: Request, db: Session = Depends(get_db)) -> int:
+    """Dependency resolving the account of the request's session."""
+    user_id = session_user_id(request.cookies.get(SESSION_COOKIE))
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Not logged in. Please login first.")
+    if db.get(User, user_id) is None:
+        raise HTTPException(status_code=401, detail="Unknown account. Please login again.")
+    return user_id
+
+def resolve_user_id(db: Session, user_id: Optional[int]) -> int:
+    """Account of a CLI or job: the given one or the first one. Raises ValueError if there is none."""
+    if user_id is None:
+        user_id = default_user_id(db)
+    if user_id is None or db.get(User, user_id) is None:
+        raise ValueError(f"Unknown user {user_id}")
+    return user_id
+
+def authorized_user_ids(db: Session, shard: int = 0, shards: int = 1) -> List[int]:
+    """Accounts with a stored token, optionally only those of one shard (user_id % shards == shard)."""
+    query = db.query(SpotifyToken.user_id)
+    if shards > 1:
+        query = query.filter(SpotifyToken.user_id % shards == shard)
+    return [row.user_id for row in query.order_by(SpotifyToken.user_id)]
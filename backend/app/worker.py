@@ -0,0 +1,196 @@
+"""
+Background worker that owns all background work: per-account ingestion and player
+polling (see app/ingest_pool.py), enrichment and purging of caches, ingestion runs
+and raw payloads.
+
+Usage:
+    WORKER_SHARD=0 WORKER_SHARDS=1 python -m app.worker
+
+Accounts are split into WORKER_SHARDS shards by user_id. Any number of workers can
+run per shard; a Postgres advisory lock per shard elects exactly one leader, the
+others stay on standby and take over as soon as the leader's database session goes
+away. Jobs that are not per account run on the leader of shard 0. API processes run
+no jobs and scale freely.
+"""
+import logging
+import os
+import signal
+import sys
+import threading
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import text
+
+from app.database import SessionLocal, engine
+from app.enrichment import drain_enrichment_queue
+from app.ingest_pool import IngestPool
+from app.ingest_schedule import MIN_INTERVAL_SECONDS, MAX_INTERVAL_SECONDS
+from app.listen_events import purge_old_batches
+from app.utils import upstream_cache
+from app.utils.payload_archive import purge_old_payloads
+from app.utils.run_ledger import purge_old_runs
+from app.utils.key_cache import warm_key_cache, key_cache_stats
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger(__name__)
+
+ENRICH_INTERVAL_SECONDS = int(os.getenv("ENRICH_INTERVAL_SECONDS", "30"))
+LEADER_CHECK_SECONDS = int(os.getenv("LEADER_CHECK_SECONDS", "15"))
+WORKER_SHARD = int(os.getenv("WORKER_SHARD", "0"))
+WORKER_SHARDS = int(os.getenv("WORKER_SHARDS", "1"))
+
+# Arbitrary but fixed key, shared by every worker of this deployment (plus the shard)
+LEADER_LOCK_KEY = 0x53504F54
+
+class LeaderLock:
+    """Session-level advisory lock held on a dedicated connection for as long as we lead."""
+
+    def __init__(self, key: int):
+        self.key = key
+        self.connection = None
+
+    def try_acquire(self) -> bool:
+        connection = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def still_held(self) -> bool:
+        """The lock lives as long as the session, so a live connection means we still hold it."""
+        if self.connection is None:
+            return False
+        try:
+            self.connection.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"Leader connection lost: {e}")
+            self.release()
+            return False
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+        except Exception:
+            pass
+        finally:
+            self.connection.invalidate()
+            self.connection.close()
+            self.connection = None
+
+def build_scheduler() -> BackgroundScheduler:
+    """Jobs that are not per account. Only the leader of shard 0 runs them."""
+    scheduler = BackgroundScheduler()
+
+    scheduler.add_job(
+        func=drain_enrichment_queue,
+        trigger=IntervalTrigger(seconds=ENRICH_INTERVAL_SECONDS),
+        id='spotify_enrichment_job',
+        name='Enrich Spotify Metadata',
+        replace_existing=True,
+        max_instances=1,
+    )
+
+    scheduler.add_job(
+        func=upstream_cache.purge_expired,
+        trigger=IntervalTrigger(hours=24),
+        id='upstream_cache_purge_job',
+        name='Purge Expired Spotify Responses',
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        func=purge_old_runs,
+        trigger=IntervalTrigger(hours=24),
+        id='ingestion_runs_purge_job',
+        name='Purge Old Ingestion Runs',
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        func=purge_old_payloads,
+        trigger=IntervalTrigger(hours=24),
+        id='raw_payloads_purge_job',
+        name='Purge Old Raw Payloads',
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        func=purge_old_batches,
+        trigger=IntervalTrigger(hours=24),
+        id='listen_batches_purge_job',
+        name='Purge Old Listen Batches',
+        replace_existing=True
+    )
+
+    return scheduler
+
+def warm_caches():
+    db = SessionLocal()
+    try:
+        warm_key_cache(db)
+        logger.info(f"Key cache warmed: {key_cache_stats()}")
+    except Exception as e:
+        logger.error(f"Could not warm key cache: {e}")
+    finally:
+        db.close()
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    lock = LeaderLock(LEADER_LOCK_KEY + WORKER_SHARD)
+    pool = None
+    scheduler = None
+
+    def stop_leading():
+        nonlocal pool, scheduler
+        if pool is not None:
+            pool.stop()
+            pool = None
+        if scheduler is not None:
+            scheduler.shutdown(wait=True)
+            scheduler = None
+
+    logger.info(f"Worker of shard {WORKER_SHARD}/{WORKER_SHARDS} started, waiting for leadership...")
+    while not stop.is_set():
+        try:
+            if pool is None:
+                if lock.try_acquire():
+                    warm_caches()
+                    pool = IngestPool(WORKER_SHARD, WORKER_SHARDS)
+                    pool.start()
+                    if WORKER_SHARD == 0:
+                        scheduler = build_scheduler()
+                        scheduler.start()
+                    logger.info(
+                        f"Elected leader of shard {WORKER_SHARD}. Ingesting every {MIN_INTERVAL_SECONDS}s "
+                        f"to {MAX_INTERVAL_SECONDS}s per account depending on activity."
+                    )
+            elif not lock.still_held():
+                stop_leading()
+                logger.warning("Lost leadership, ingestion stopped.")
+            else:
+                logger.debug(f"Ingest pool: {pool.stats()}")
+        except Exception as e:
+            logger.error(f"Leader election failed: {e}")
+
+        stop.wait(LEADER_CHECK_SECONDS)
+
+    logger.info("Stopping worker...")
+    stop_leading()
+    lock.release()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,8 +7,12 @@ while ! nc -z $DB_HOST $DB_PORT; do
 done
 echo "Database is ready."
 
-echo "Initializing database schema..."
-python init_db.py
+# Any other command (the migrate service, the worker) runs as is. Migrations run once
+# in the migrate service, backend and worker only start after it completed.
+if [ "$#" -gt 0 ]; then
+  echo "Starting: $*"
+  exec "$@"
+fi
 
 echo "Starting Backend..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
@@ -0,0 +1,13 @@
+import os
+
+from sqlalchemy.engine import make_url
+
+# app.database builds its engine from DB_* at import time. Tests never use the application
+# database: point it at the test database if there is one, otherwise leave it unreachable.
+if os.getenv("TEST_DATABASE_URL"):
+    url = make_url(os.environ["TEST_DATABASE_URL"])
+    defaults = {"DB_USER": url.username, "DB_PASSWORD": url.password, "DB_HOST": url.host, "DB_PORT": url.port, "DB_NAME": url.database}
+else:
+    defaults = {"DB_USER": "test", "DB_PASSWORD": "test", "DB_HOST": "localhost", "DB_PORT": 5432, "DB_NAME": "test"}
+for name, value in defaults.items():
+    os.environ.setdefault(name, str(value if value is not None else ""))
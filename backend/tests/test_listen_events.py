@@ -0,0 +1,81 @@
+"""
+Resuming /listens/stream from a Last-Event-ID against a real database.
+
+Skipped unless TEST_DATABASE_URL names a dedicated, disposable database. Everything
+runs in one transaction that is rolled back at the end.
+"""
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app import listen_events
+from app.models import Base
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+@pytest.fixture
+def db():
+    engine = create_engine(TEST_DATABASE_URL)  # type: ignore
+    connection = engine.connect()
+    transaction = connection.begin()
+    Base.metadata.create_all(connection)
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+def add_listens(db: Session, user_id: int, track_id: int, count: int) -> list:
+    return list(db.execute(text("""
+        INSERT INTO listens (user_id, track_id, played_at)
+        SELECT :user_id, :track_id, :start + (g + (SELECT count(*) FROM listens WHERE user_id = :user_id)) * interval '3 minutes'
+        FROM generate_series(1, :count) g
+        RETURNING listen_id
+    """), {"user_id": user_id, "track_id": track_id, "count": count, "start": datetime(2026, 1, 1, tzinfo=timezone.utc)}).scalars())
+
+@pytest.fixture
+def account(db):
+    user_id = db.execute(text("INSERT INTO users (display_name, created_at) VALUES ('stream', now()) RETURNING user_id")).scalar_one()
+    track_id = db.execute(text("INSERT INTO tracks (spotify_id, name) VALUES ('stream-track', 'T') RETURNING track_id")).scalar_one()
+    return user_id, track_id
+
+def test_resume_follows_commit_order_not_listen_ids(db, account):
+    user_id, track_id = account
+    # Two writers draw ids, the one with the lower ids commits second
+    early_ids = add_listens(db, user_id, track_id, 2)
+    late_ids = add_listens(db, user_id, track_id, 2)
+    listen_events.notify_new_listens(db, user_id, late_ids)
+    seen = listen_events.latest_cursor(db, user_id)
+    listen_events.notify_new_listens(db, user_id, early_ids)
+
+    rows = listen_events.load_since(db, seen, user_id)
+
+    assert [row["listen_id"] for row in rows] == early_ids
+    assert listen_events.parse_event_id(rows[-1]["event_id"]) == listen_events.latest_cursor(db, user_id)
+
+def test_gap_over_the_limit_is_not_replayed(db, account):
+    user_id, track_id = account
+    listen_events.notify_new_listens(db, user_id, add_listens(db, user_id, track_id, 1))
+    seen = listen_events.latest_cursor(db, user_id)
+    for _ in range(3):
+        listen_events.notify_new_listens(db, user_id, add_listens(db, user_id, track_id, 2))
+
+    assert listen_events.load_since(db, seen, user_id, limit=5) is None
+    assert len(listen_events.load_since(db, seen, user_id, limit=6)) == 6
+
+def test_purged_cursor_is_not_replayed(db, account):
+    user_id, track_id = account
+    listen_events.notify_new_listens(db, user_id, add_listens(db, user_id, track_id, 1))
+    seen = listen_events.latest_cursor(db, user_id)
+    listen_events.notify_new_listens(db, user_id, add_listens(db, user_id, track_id, 1))
+    db.execute(text("DELETE FROM listen_batches WHERE version = :version"), {"version": seen[0]})
+
+    assert listen_events.load_since(db, seen, user_id) is None
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+from app import replay
+
+def test_date_only_bounds_are_utc_and_comparable(monkeypatch):
+    calls = []
+
+    def fake_replay(start, end, dry_run, user_id):
+        calls.append((start, end))
+        return {"payloads": 0, "items": 0, "failed": 0, "listens_new": 0, "listens_duplicate": 0}, {}
+
+    monkeypatch.setattr(replay, "replay", fake_replay)
+    assert replay.main(["--start", "2026-01-01", "--end", "2026-01-31T12:00:00+01:00"]) == 0
+
+    start, end = calls[0]
+    assert start == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert end == datetime(2026, 1, 31, 11, tzinfo=timezone.utc)
+    assert replay.in_window({"played_at": "2026-01-15T08:00:00.000Z"}, start, end)
+    assert not replay.in_window({"played_at": "2025-12-31T23:59:59.000Z"}, start, end)
@@ -9,7 +9,7 @@ const LoginButton: React.FC = () => {
 
   const fetchUser = async () => {
     try {
-      const response = await fetch(`${API_URL}/auth/me`);
+      const response = await fetch(`${API_URL}/auth/me`, { credentials: "include" });
       if (response.ok) {
         const data = await response.json();
         setUser(data);
@@ -1,31 +1,29 @@
 import { type FC } from "react";
 import { FaUsers } from "react-icons/fa";
 import StatBlock from "../ui/StatBlock";
-import { useListenedArtists } from "../../hooks/useListenedArtists";
+import { type DashboardSummary } from "../../hooks/useDashboardSummary";
 
 interface StatsArtistsBlockProps {
-  startDate: string;
-  endDate: string;
-  selectedRange: string;
+  summary: DashboardSummary | null;
+  loading: boolean;
+  error: string | null;
 }
 
 const StatsArtistsBlock: FC<StatsArtistsBlockProps> = ({
-  startDate,
-  endDate,
-  selectedRange,
+  summary,
+  loading,
+  error,
 }) => {
-  const { artistCount, previousArtistCount, loading, error } =
-    useListenedArtists(startDate, endDate, selectedRange);
-
   if (loading) {
     return <StatBlock icon={<FaUsers />} title="Loading.." value="" />;
   }
 
-  if (error) {
+  if (error || !summary) {
     return <StatBlock icon={<FaUsers />} title="Error" value="" />;
   }
 
-  const change = artistCount - previousArtistCount;
+  const artistCount = summary.artist_count;
+  const change = artistCount - (summary.previous?.artist_count ?? artistCount);
 
   return (
     <StatBlock
@@ -1,24 +1,31 @@
+import { type FC } from "react";
 import { FaDatabase } from "react-icons/fa";
 import StatBlock from "../ui/StatBlock";
-import useDatabaseStats from "../../hooks/useDatabaseStats";
+import { type DashboardSummary } from "../../hooks/useDashboardSummary";
 
-const StatsDatabaseEntriesBlock = () => {
-  const {
-    totalEntries: databaseTotalEntries,
-    loading: isDatabaseEntriesLoading,
-    error: databaseEntriesError,
-  } = useDatabaseStats();
+interface StatsDatabaseEntriesBlockProps {
+  summary: DashboardSummary | null;
+  loading: boolean;
+  error: string | null;
+}
 
+const StatsDatabaseEntriesBlock: FC<StatsDatabaseEntriesBlockProps> = ({
+  summary,
+  loading,
+  error,
+}) => {
   return (
     <StatBlock
       icon={<FaDatabase />}
       title="Database Size"
       value={
-        databaseEntriesError
+        error || (!loading && !summary)
           ? "Error"
-          : isDatabaseEntriesLoading
+          : loading || !summary
           ? "Loading .."
-          : databaseTotalEntries.toString() + " Entries"
+          : (summary.total_entries_estimated ? "~" : "") +
+            summary.total_entries.toString() +
+            " Entries"
       }
     />
   );
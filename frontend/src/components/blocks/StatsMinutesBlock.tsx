@@ -1,28 +1,30 @@
 import { type FC } from "react";
 import { FaClock } from "react-icons/fa";
 import StatBlock from "../ui/StatBlock";
-import { useMinutesListened } from "../../hooks/useMinutesListened";
+import { type DashboardSummary } from "../../hooks/useDashboardSummary";
 import { minutesToHours } from "../../utils/utils";
 
 interface StatsMinutesBlockProps {
-  startDate: string;
-  endDate: string;
+  summary: DashboardSummary | null;
+  loading: boolean;
+  error: string | null;
 }
 
 const StatsMinutesBlock: FC<StatsMinutesBlockProps> = ({
-  startDate,
-  endDate,
+  summary,
+  loading,
+  error,
 }) => {
-  const { value, loading, error } = useMinutesListened(startDate, endDate);
-
   if (loading) {
     return <StatBlock icon={<FaClock />} title="Loading.." value="" />;
   }
 
-  if (error) {
+  if (error || !summary) {
     return <StatBlock icon={<FaClock />} title="Error" value="" />;
   }
 
+  const value = summary.minutes_listened;
+
   return (
     <StatBlock
       icon={<FaClock />}
@@ -1,34 +1,29 @@
 import { type FC } from "react";
 import { FaPlay } from "react-icons/fa";
 import StatBlock from "../ui/StatBlock";
-import { usePlaysCount } from "../../hooks/usePlaysCount";
+import { type DashboardSummary } from "../../hooks/useDashboardSummary";
 
 interface StatsPlaysBlockProps {
-  startDate: string;
-  endDate: string;
-  selectedRange: string;
+  summary: DashboardSummary | null;
+  loading: boolean;
+  error: string | null;
 }
 
 const StatsPlaysBlock: FC<StatsPlaysBlockProps> = ({
-  startDate,
-  endDate,
-  selectedRange,
+  summary,
+  loading,
+  error,
 }) => {
-  const { listensCount, previousPlaysCount, loading, error } = usePlaysCount(
-    startDate,
-    endDate,
-    selectedRange
-  );
-
   if (loading) {
     return <StatBlock icon={<FaPlay />} title="Loading.." value="" />;
   }
 
-  if (error) {
+  if (error || !summary) {
     return <StatBlock icon={<FaPlay />} title="Error" value="" />;
   }
 
-  const change = listensCount - previousPlaysCount;
+  const listensCount = summary.plays_count;
+  const change = listensCount - (summary.previous?.plays_count ?? listensCount);
 
   return (
     <StatBlock
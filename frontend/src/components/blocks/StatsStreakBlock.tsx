@@ -1,16 +1,24 @@
 import { type FC } from "react";
 import { FaFire } from "react-icons/fa";
 import StatBlock from "../ui/StatBlock";
-import { useListeningStreak } from "../../hooks/useListeningStreak";
+import { type DashboardSummary } from "../../hooks/useDashboardSummary";
 
-const StatsStreakBlock: FC = () => {
-  const { streak, loading, error } = useListeningStreak();
+interface StatsStreakBlockProps {
+  summary: DashboardSummary | null;
+  loading: boolean;
+  error: string | null;
+}
 
+const StatsStreakBlock: FC<StatsStreakBlockProps> = ({
+  summary,
+  loading,
+  error,
+}) => {
   if (loading) {
     return <StatBlock icon={<FaFire />} title="Loading.." value="" />;
   }
 
-  if (error) {
+  if (error || !summary) {
     return <StatBlock icon={<FaFire />} title="Error" value="" />;
   }
 
@@ -18,7 +26,8 @@ const StatsStreakBlock: FC = () => {
     <StatBlock
       icon={<FaFire />}
       title="Listening Streak"
-      value={streak.toString()}
+      value={summary.streak.streak.toString()}
+      label={`(longest ${summary.streak.longest_streak})`}
     />
   );
 };
@@ -2,7 +2,7 @@ import React, { createContext, useContext, useState, useEffect } from "react";
 import { getBrowserTimeZone, toUtcIso } from "../utils/time";
 
 // Define VITE_API_URL to avoid hardcoded URLs
-const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
 type DateRangeKey = "1d" | "1w" | "4w" | "3m" | "6m" | "1y" | "alltime";
 
@@ -51,14 +51,23 @@ export const DateRangeProvider: React.FC<{ children: React.ReactNode }> = ({
       });
   }, []);
 
+  // Whole hours: the range stays the same for an hour, so repeated requests hit the
+  // backend's response cache, and the stats are read from the hourly rollups only
+  const getEndDate = (): Date => {
+    const end = new Date();
+    end.setMinutes(60, 0, 0);
+    return end;
+  };
+
   const getStartDate = (days: number): Date => {
-    const now = new Date();
-    now.setDate(now.getDate() - days);
-    return now;
+    const start = new Date();
+    start.setDate(start.getDate() - days);
+    start.setMinutes(0, 0, 0);
+    return start;
   };
 
   const startDate = getStartDate(dateRanges[selectedRange].days);
-  const endDate = new Date();
+  const endDate = getEndDate();
 
   return (
     <DateRangeContext.Provider
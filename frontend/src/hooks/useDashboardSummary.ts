@@ -0,0 +1,71 @@
+import { useState, useEffect } from "react";
+import { getPreviousRange } from "../utils/time";
+
+interface RangeStats {
+  plays_count: number;
+  minutes_listened: number;
+  artist_count: number;
+}
+
+export interface DashboardSummary extends RangeStats {
+  streak: {
+    streak: number;
+    longest_streak: number;
+  };
+  total_entries: number;
+  // total_entries is the database's row estimate, not an exact count
+  total_entries_estimated: boolean;
+  previous?: RangeStats;
+}
+
+interface UseDashboardSummaryReturn {
+  summary: DashboardSummary | null;
+  loading: boolean;
+  error: string | null;
+}
+
+// Stats of the dashboard for one range (and the previous one) in a single request
+export const useDashboardSummary = (
+  start: string,
+  end: string,
+  timeRange: string
+): UseDashboardSummaryReturn => {
+  const [summary, setSummary] = useState<DashboardSummary | null>(null);
+  const [loading, setLoading] = useState<boolean>(true);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    const fetchSummary = async () => {
+      setLoading(true);
+      setError(null);
+
+      try {
+        const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
+        const previous = getPreviousRange(start, end, timeRange);
+        const params = new URLSearchParams({
+          start,
+          end,
+          previous_start: previous.start,
+          previous_end: previous.end,
+          recent_limit: "0",
+        });
+
+        const response = await fetch(`${API_URL}/dashboard/summary?${params}`, { credentials: "include" });
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        setSummary(await response.json());
+      } catch (err) {
+        console.error("Error fetching dashboard summary:", err);
+        setError("Failed to load dashboard stats");
+      } finally {
+        setLoading(false);
+      }
+    };
+
+    fetchSummary();
+  }, [start, end, timeRange]);
+
+  return { summary, loading, error };
+};
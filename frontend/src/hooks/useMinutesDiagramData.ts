@@ -1,5 +1,17 @@
 import { useState, useEffect } from "react";
 import { useDateRange, dateRanges } from "../context/DateRangeContext";
+import { getBrowserTimeZone } from "../utils/time";
+
+// Server-side bucket size per range, the bars are sums of a few buckets instead of thousands of hours
+const granularities: Record<string, string> = {
+  "1d": "hour",
+  "1w": "day",
+  "4w": "day",
+  "3m": "day",
+  "6m": "day",
+  "1y": "month",
+  alltime: "year",
+};
 
 export interface ChartDataPoint {
   xAxisLabel: string;
@@ -18,7 +30,8 @@ const useMinutesDiagramData = () => {
       setLoading(true);
       
       const buckets: Array<{ label: string; start: Date; end: Date }> = [];
-      const now = new Date(endDate);
+      // endDate is the end of the current hour, the buckets end with the hour it belongs to
+      const now = new Date(endDate.getTime() - 1);
 
       if (selectedRange === "1d") {
         for (let i = 23; i >= 0; i--) {
@@ -78,11 +91,17 @@ const useMinutesDiagramData = () => {
         const params = new URLSearchParams({
           start: buckets[0].start.toISOString(),
           end: buckets[buckets.length - 1].end.toISOString(),
+          granularity: granularities[selectedRange],
         });
+        // The bars are built in the browser's time zone, so are the buckets
+        const browserTimeZone = getBrowserTimeZone();
+        if (browserTimeZone) {
+          params.set("tz", browserTimeZone);
+        }
         
-        const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+        const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
-        const response = await fetch(`${API_URL}/listens/activity?${params.toString()}`);
+        const response = await fetch(`${API_URL}/listens/activity?${params.toString()}`, { credentials: "include" });
         const result = await response.json();
         
         const chartData = buckets.map(bucket => ({
@@ -108,101 +108,103 @@ export const usePlayerDetails = (): UsePlayerReturn => {
   });
 
   useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
-
-        const response = await fetch(`${API_URL}/currently-playing`);
-        
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const data: PlayerData = await response.json();
-
-        if (!data.item) {
-          setStatus({
-            isLoading: false,
-            error: null,
-            data: {
-              playerActive: false,
-              isLoading: false,
-              error: null,
-              isPlaying: false,
-              shuffleState: false,
-              repeatState: 'off',
-              deviceType: data.device?.type || '-',
-              songName: 'Nothing Playing',
-              artistName: '-',
-              imageUrl: '',
-              isExplicit: false,
-              songUrl: '#',
-              contextType: null,
-              contextUrl: null,
-            },
-          });
-          return;
-        }
-
-        const item = data.item;
-        let songName = '';
-        let artistName = '';
-        let imageUrl = '';
-        let isExplicit = false;
-        let songUrl = item.external_urls.spotify;
-
-        if (item.type === 'track') {
-          songName = item.name;
-          artistName = item.artists.map((a) => a.name).join(', ');
-          isExplicit = item.explicit;
-          
-          const targetImage = item.album.images.find(img => img.height === 64) || 
-                              item.album.images.reduce((prev, curr) => 
-                                (prev.height && curr.height && prev.height < curr.height) ? prev : curr
-                              , item.album.images[0]);
-          
-          imageUrl = targetImage?.url || '';
-        } else if (item.type === 'episode') {
-          songName = item.name;
-          artistName = item.show.publisher;
-          isExplicit = false; 
-
-          const targetImage = item.show.images.find(img => img.height === 64) || 
-                              item.show.images.reduce((prev, curr) => 
-                                (prev.height && curr.height && prev.height < curr.height) ? prev : curr
-                              , item.show.images[0]);
-          
-          imageUrl = targetImage?.url || '';
-        }
-
-        let contextType = null;
-        let contextUrl = null;
-
-        if (data.context) {
-          contextType = data.context.type;
-          contextUrl = data.context.external_urls?.spotify || null;
-        }
+    const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
+    const applyData = (data: PlayerData) => {
+      if (!data.item) {
         setStatus({
           isLoading: false,
           error: null,
           data: {
-            playerActive: true,
+            playerActive: false,
             isLoading: false,
             error: null,
-            isPlaying: data.is_playing,
-            shuffleState: data.shuffle_state,
-            repeatState: data.repeat_state,
-            deviceType: data.device?.type || 'Unknown',
-            songName,
-            artistName,
-            imageUrl,
-            isExplicit,
-            songUrl,
-            contextType,
-            contextUrl,
+            isPlaying: false,
+            shuffleState: false,
+            repeatState: 'off',
+            deviceType: data.device?.type || '-',
+            songName: 'Nothing Playing',
+            artistName: '-',
+            imageUrl: '',
+            isExplicit: false,
+            songUrl: '#',
+            contextType: null,
+            contextUrl: null,
           },
         });
+        return;
+      }
+
+      const item = data.item;
+      let songName = '';
+      let artistName = '';
+      let imageUrl = '';
+      let isExplicit = false;
+      let songUrl = item.external_urls.spotify;
+
+      if (item.type === 'track') {
+        songName = item.name;
+        artistName = item.artists.map((a) => a.name).join(', ');
+        isExplicit = item.explicit;
+        
+        const targetImage = item.album.images.find(img => img.height === 64) || 
+                            item.album.images.reduce((prev, curr) => 
+                              (prev.height && curr.height && prev.height < curr.height) ? prev : curr
+                            , item.album.images[0]);
+        
+        imageUrl = targetImage?.url || '';
+      } else if (item.type === 'episode') {
+        songName = item.name;
+        artistName = item.show.publisher;
+        isExplicit = false; 
+
+        const targetImage = item.show.images.find(img => img.height === 64) || 
+                            item.show.images.reduce((prev, curr) => 
+                              (prev.height && curr.height && prev.height < curr.height) ? prev : curr
+                            , item.show.images[0]);
+        
+        imageUrl = targetImage?.url || '';
+      }
+
+      let contextType = null;
+      let contextUrl = null;
+
+      if (data.context) {
+        contextType = data.context.type;
+        contextUrl = data.context.external_urls?.spotify || null;
+      }
+
+      setStatus({
+        isLoading: false,
+        error: null,
+        data: {
+          playerActive: true,
+          isLoading: false,
+          error: null,
+          isPlaying: data.is_playing,
+          shuffleState: data.shuffle_state,
+          repeatState: data.repeat_state,
+          deviceType: data.device?.type || 'Unknown',
+          songName,
+          artistName,
+          imageUrl,
+          isExplicit,
+          songUrl,
+          contextType,
+          contextUrl,
+        },
+      });
+    };
+
+    const fetchData = async () => {
+      try {
+        const response = await fetch(`${API_URL}/currently-playing`, { credentials: "include" });
+        
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        applyData(await response.json());
 
       } catch (err) {
         console.error(err);
@@ -217,9 +219,14 @@ export const usePlayerDetails = (): UsePlayerReturn => {
 
     fetchData();
 
+    // The server pushes every player change, EventSource reconnects on its own
+    const source = new EventSource(`${API_URL}/currently-playing/stream`, { withCredentials: true });
+    source.addEventListener('player', (event) => applyData(JSON.parse((event as MessageEvent).data)));
+
     window.addEventListener('focus', fetchData);
     
     return () => {
+      source.close();
       window.removeEventListener('focus', fetchData);
     };
     
@@ -32,10 +32,11 @@ export const useRecentListens = (
     const fetchRecentListens = async () => {
       setLoading(true);
       try {
-        const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+        const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
         const response = await fetch(
-          `${API_URL}/listens/recent?limit=${limit}`
+          `${API_URL}/listens/recent?limit=${limit}`,
+          { credentials: "include" }
         );
 
         if (!response.ok) {
@@ -77,6 +78,35 @@ export const useRecentListens = (
     };
 
     fetchRecentListens();
+
+    // New listens are pushed as they are ingested, no need to re-fetch the list
+    const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
+    const source = new EventSource(`${API_URL}/listens/stream`, { withCredentials: true });
+    source.addEventListener("listen", (event) => {
+      const item = JSON.parse((event as MessageEvent).data);
+      const listen: Listen = {
+        ...item,
+        formatted_time: new Date(item.played_at).toLocaleTimeString([], {
+          timeZone,
+          hour: "2-digit",
+          minute: "2-digit",
+        }),
+      };
+      setListens((prev) =>
+        prev.some((l) => l.listen_id === listen.listen_id)
+          ? prev
+          : [listen, ...prev]
+              .sort((a, b) => b.played_at.localeCompare(a.played_at))
+              .slice(0, limit)
+      );
+    });
+
+    // Sent when the listens missed while disconnected can't be replayed
+    source.addEventListener("reset", () => {
+      fetchRecentListens();
+    });
+
+    return () => source.close();
   }, [limit, timeZone]);
 
   return { listens, loading, error };
@@ -27,12 +27,13 @@ export const useTopArtists = (
       setLoading(true);
       setError(null);
       try {
-        const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+        const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
         const response = await fetch(
           `${API_URL}/top/top-artists?start=${encodeURIComponent(
             start
-          )}&end=${encodeURIComponent(end)}&limit=${limit}`
+          )}&end=${encodeURIComponent(end)}&limit=${limit}`,
+          { credentials: "include" }
         );
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`);
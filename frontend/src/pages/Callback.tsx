@@ -14,6 +14,7 @@ const Callback = () => {
     if (code) {
       fetch(`${API_URL}/auth/callback`, {
         method: "POST",
+        credentials: "include",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ code }),
       })
@@ -17,6 +17,7 @@ import StatsArtistsBlock from "../components/blocks/StatsArtistsBlock";
 import StatsMinutesBlock from "../components/blocks/StatsMinutesBlock";
 import StatsPlaysBlock from "../components/blocks/StatsPlaysBlock";
 import { usePlayerDetails } from "../hooks/usePlayerDetails";
+import { useDashboardSummary } from "../hooks/useDashboardSummary";
 
 const Dashboard: FC = () => {
   const navigate = useNavigate();
@@ -28,6 +29,9 @@ const Dashboard: FC = () => {
 
   const { playerActive } = usePlayerDetails();
 
+  // One request for all stat blocks
+  const stats = useDashboardSummary(startISO, endISO, selectedRange);
+
   return (
     <div className="container">
       <h1>Dashboard</h1>
@@ -43,30 +47,22 @@ const Dashboard: FC = () => {
       <div className="row mb-3">
         <div className="col d-flex flex-wrap gap-3">
           <div className="stat-sm ">
-            <StatsStreakBlock />
+            <StatsStreakBlock {...stats} />
           </div>
 
           <div className="stat-sm">
-            <StatsPlaysBlock
-              startDate={startISO}
-              endDate={endISO}
-              selectedRange={selectedRange}
-            />
+            <StatsPlaysBlock {...stats} />
           </div>
 
           <div className="stat-sm">
-            <StatsMinutesBlock startDate={startISO} endDate={endISO} />
+            <StatsMinutesBlock {...stats} />
           </div>
 
           <div className="stat-sm">
-            <StatsArtistsBlock
-              startDate={startISO}
-              endDate={endISO}
-              selectedRange={selectedRange}
-            />
+            <StatsArtistsBlock {...stats} />
           </div>
           <div className="stat-lg">
-            <StatsDatabaseEntriesBlock />
+            <StatsDatabaseEntriesBlock {...stats} />
           </div>
 
           <div className="stat-lg">
@@ -9,3 +9,29 @@ export const getBrowserTimeZone = (): string | null => {
 export const toUtcIso = (date: Date): string => {
   return date.toISOString();
 };
+
+// Days to shift a range back by to get the range it is compared with
+const previousRangeDays: Record<string, number> = {
+  "1d": 1,
+  "1w": 7,
+  "4w": 28,
+  "3m": 90,
+  "6m": 182,
+  "1y": 365,
+};
+
+export const getPreviousRange = (
+  start: string,
+  end: string,
+  timeRange: string
+): { start: string; end: string } => {
+  const days = previousRangeDays[timeRange];
+  if (!days) {
+    return { start, end };
+  }
+  const shift = days * 24 * 60 * 60 * 1000;
+  return {
+    start: new Date(new Date(start).getTime() - shift).toISOString(),
+    end: new Date(new Date(end).getTime() - shift).toISOString(),
+  };
+};